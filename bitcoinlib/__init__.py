@@ -21,7 +21,8 @@ import bitcoinlib.encoding
 import bitcoinlib.mnemonic
 import bitcoinlib.keys
 import bitcoinlib.transactions
+import bitcoinlib.blocks
 import bitcoinlib.wallets
 import bitcoinlib.tools
 
-__all__ = ["keys", "transactions", "wallets", "encoding", "mnemonic", "tools"]
+__all__ = ["keys", "transactions", "blocks", "wallets", "encoding", "mnemonic", "tools"]
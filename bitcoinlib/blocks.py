@@ -0,0 +1,678 @@
+# -*- coding: utf-8 -*-
+#
+#    BitcoinLib - Python Cryptocurrency Library
+#    BLOCK class to parse raw blocks and Bitcoin Core blk*.dat files
+#    © 2019 December - 1200 Web Development <http://1200wd.com/>
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+import mmap
+from bitcoinlib.encoding import *
+from bitcoinlib.networks import Network
+from bitcoinlib.transactions import _transaction_deserialize
+
+
+_logger = logging.getLogger(__name__)
+
+
+class BlockError(Exception):
+    """
+    Handle Block class Exceptions
+    """
+
+    def __init__(self, msg=''):
+        self.msg = msg
+        _logger.error(msg)
+
+    def __str__(self):
+        return self.msg
+
+
+def bits_to_target(bits):
+    """
+    Convert compact encoded proof-of-work target from block header to target integer.
+
+    >>> hex(bits_to_target(0x1d00ffff))
+    '0xffff0000000000000000000000000000000000000000000000000000'
+
+    :param bits: Bits field from block header
+    :type bits: int
+
+    :return int:
+    """
+
+    exponent = bits >> 24
+    mantissa = bits & 0x007fffff
+    if exponent <= 3:
+        return mantissa >> (8 * (3 - exponent))
+    return mantissa << (8 * (exponent - 3))
+
+
+def target_to_bits(target):
+    """
+    Convert proof-of-work target integer to the compact encoding used in the bits field of a block header. Reverse
+    of :func:`bits_to_target`, lower bits of the target which do not fit in the encoding are dropped.
+
+    >>> hex(target_to_bits(0xffff << 208))
+    '0x1d00ffff'
+
+    :param target: Proof-of-work target
+    :type target: int
+
+    :return int:
+    """
+
+    size = (target.bit_length() + 7) // 8
+    if size <= 3:
+        mantissa = target << (8 * (3 - size))
+    else:
+        mantissa = target >> (8 * (size - 3))
+    if mantissa & 0x00800000:
+        mantissa >>= 8
+        size += 1
+    return mantissa | (size << 24)
+
+
+# Proof-of-work consensus parameters per network, used by the HeaderChain class to validate headers
+POW_PARAMETERS = {
+    'bitcoin': {
+        'pow_limit': 0x00000000ffffffffffffffffffffffffffffffffffffffffffffffffffffffff,
+        'genesis_hash': '000000000019d6689c085ae165831e934ff763ae46a2a6c172b3f1b60a8ce26f',
+        'retarget_interval': 2016,
+        'target_timespan': 14 * 24 * 60 * 60,
+        'target_spacing': 10 * 60,
+        'min_difficulty_blocks': False,
+    },
+    'testnet': {
+        'pow_limit': 0x00000000ffffffffffffffffffffffffffffffffffffffffffffffffffffffff,
+        'genesis_hash': '000000000933ea01ad0ee984209779baaec3ced90fa3f408719526f8d77f4943',
+        'retarget_interval': 2016,
+        'target_timespan': 14 * 24 * 60 * 60,
+        'target_spacing': 10 * 60,
+        'min_difficulty_blocks': True,
+    },
+}
+
+
+def retarget_bits(bits, first_time, last_time, network=DEFAULT_NETWORK):
+    """
+    Calculate the proof-of-work bits for the first block of a new retarget period. The target of the last block
+    is adjusted by the time the previous period took, limited to a factor 4 in both directions and never above the
+    proof-of-work limit of the network.
+
+    >>> hex(retarget_bits(0x1d00ffff, 1261130161, 1262152739))
+    '0x1d00d86a'
+
+    :param bits: Bits field of the last block of the previous period
+    :type bits: int
+    :param first_time: Timestamp of the first block of the previous period
+    :type first_time: int
+    :param last_time: Timestamp of the last block of the previous period
+    :type last_time: int
+    :param network: Network, leave empty for default
+    :type network: str, Network
+
+    :return int:
+    """
+
+    if isinstance(network, Network):
+        network = network.name
+    if network not in POW_PARAMETERS:
+        raise BlockError("No proof-of-work parameters available for network %s" % network)
+    params = POW_PARAMETERS[network]
+    timespan = params['target_timespan']
+    actual_timespan = min(max(last_time - first_time, timespan // 4), timespan * 4)
+    target = bits_to_target(bits) * actual_timespan // timespan
+    return target_to_bits(min(target, params['pow_limit']))
+
+
+def _transaction_size(raw, cursor=0):
+    """
+    Get size of serialized transaction which starts at position cursor in raw data, without parsing scripts,
+    keys or signatures.
+
+    :param raw: Raw data containing one or more serialized transactions, such as a raw block
+    :type raw: bytes
+    :param cursor: Start position of transaction in raw data
+    :type cursor: int
+
+    :return int: Size of transaction in bytes
+    """
+
+    start = cursor
+    cursor += 4
+    segwit = raw[cursor:cursor + 2] == b'\0\1'
+    if segwit:
+        cursor += 2
+    n_inputs, size = varbyteint_to_int(raw[cursor:cursor + 9])
+    cursor += size
+    for _ in range(n_inputs):
+        cursor += 36
+        script_size, size = varbyteint_to_int(raw[cursor:cursor + 9])
+        cursor += size + script_size + 4
+    n_outputs, size = varbyteint_to_int(raw[cursor:cursor + 9])
+    cursor += size
+    for _ in range(n_outputs):
+        cursor += 8
+        script_size, size = varbyteint_to_int(raw[cursor:cursor + 9])
+        cursor += size + script_size
+    if segwit:
+        for _ in range(n_inputs):
+            n_items, size = varbyteint_to_int(raw[cursor:cursor + 9])
+            cursor += size
+            for _ in range(n_items):
+                item_size, size = varbyteint_to_int(raw[cursor:cursor + 9])
+                cursor += size + item_size
+    cursor += 4
+    if cursor > len(raw):
+        raise BlockError("Transaction at position %d exceeds end of block data" % start)
+    return cursor - start
+
+
+class Block(object):
+    """
+    Block class with header information and transactions of a block.
+
+    Blocks created from raw data only keep the raw transactions in memory. Transactions are parsed one by one when
+    the block is iterated.
+    """
+
+    @classmethod
+    def from_raw(cls, raw, network=DEFAULT_NETWORK):
+        """
+        Create Block object from a raw serialized block or a 80 byte block header. Only the block header is parsed,
+        transactions are parsed when iterating over the block.
+
+        :param raw: Raw block
+        :type raw: bytes, str
+        :param network: Network, leave empty for default
+        :type network: str, Network
+
+        :return Block:
+        """
+
+        if not isinstance(raw, bytes):
+            raw = to_bytes(raw)
+        if len(raw) < 80:
+            raise BlockError("Raw block must be at least 80 bytes, found %d bytes" % len(raw))
+        header = raw[:80]
+        tx_count, size = varbyteint_to_int(raw[80:89]) if len(raw) > 80 else (0, 0)
+        block = cls(double_sha256(header)[::-1], struct.unpack('<L', header[:4])[0], header[4:36][::-1],
+                    header[36:68][::-1], struct.unpack('<L', header[68:72])[0],
+                    struct.unpack('<L', header[72:76])[0], struct.unpack('<L', header[76:80])[0],
+                    tx_count=tx_count, size=len(raw), network=network)
+        block._raw = raw
+        block._tx_offset = 80 + size
+        return block
+
+    def __init__(self, block_hash, version, prev_block, merkle_root, time, bits, nonce, transactions=None,
+                 height=None, tx_count=None, size=None, network=DEFAULT_NETWORK):
+        """
+        Create a new block object
+
+        :param block_hash: Hash of block header
+        :type block_hash: bytes, str
+        :param version: Block version
+        :type version: int
+        :param prev_block: Hash of previous block
+        :type prev_block: bytes, str
+        :param merkle_root: Merkle root of transactions in this block
+        :type merkle_root: bytes, str
+        :param time: Block timestamp in seconds after 1-jan-1970
+        :type time: int
+        :param bits: Encoded proof-of-work target
+        :type bits: int
+        :param nonce: Nonce used for proof-of-work
+        :type nonce: int
+        :param transactions: List of Transaction objects. Leave empty for blocks created from raw data
+        :type transactions: list (Transaction)
+        :param height: Block height, if known
+        :type height: int
+        :param tx_count: Number of transactions in block. Derived from transactions list if not specified
+        :type tx_count: int
+        :param size: Size of serialized block in bytes
+        :type size: int
+        :param network: Network, leave empty for default
+        :type network: str, Network
+        """
+
+        self.block_hash = to_bytes(block_hash)
+        self.version = version
+        self.prev_block = to_bytes(prev_block)
+        self.merkle_root = to_bytes(merkle_root)
+        self.time = time
+        self.bits = bits
+        self.nonce = nonce
+        self.transactions = [] if transactions is None else transactions
+        self.height = height
+        self.tx_count = len(self.transactions) if tx_count is None else tx_count
+        self.size = size
+        self.network = network
+        if not isinstance(network, Network):
+            self.network = Network(network)
+        self._raw = None
+        self._tx_offset = 0
+
+    def __repr__(self):
+        return "<Block(%s, %s, transactions: %d)>" % (to_hexstring(self.block_hash), self.height, self.tx_count)
+
+    def __len__(self):
+        return self.tx_count
+
+    def __iter__(self):
+        """
+        Iterate over transactions in this block. For blocks created from raw data each transaction is deserialized
+        when it is reached, parsed transactions are not stored in the block.
+
+        :return Transaction:
+        """
+
+        if self._raw is None:
+            for t in self.transactions:
+                yield t
+            return
+        cursor = self._tx_offset
+        for _ in range(self.tx_count):
+            tx_size = _transaction_size(self._raw, cursor)
+            t = _transaction_deserialize(self._raw[cursor:cursor + tx_size], network=self.network)
+            t.block_hash = to_hexstring(self.block_hash)
+            t.block_height = self.height
+            yield t
+            cursor += tx_size
+
+    def as_dict(self):
+        """
+        Get block header information as dictionary
+
+        :return dict:
+        """
+
+        return {
+            'block_hash': to_hexstring(self.block_hash),
+            'height': self.height,
+            'version': self.version,
+            'prev_block': to_hexstring(self.prev_block),
+            'merkle_root': to_hexstring(self.merkle_root),
+            'time': self.time,
+            'bits': self.bits,
+            'nonce': self.nonce,
+            'tx_count': self.tx_count,
+            'size': self.size,
+            'network': self.network.name,
+        }
+
+
+def iter_blk_file(path, network=DEFAULT_NETWORK, magic=None):
+    """
+    Iterate over all blocks in a Bitcoin Core blk*.dat file.
+
+    The file is memory mapped and read block by block: every record consists of 4 magic bytes, the block size and
+    the raw block. Transactions of the returned blocks are parsed when the block is iterated, so memory usage is
+    bounded by the size of a single block.
+
+    >>> for block in iter_blk_file('/home/user/.bitcoin/blocks/blk00000.dat'):  # doctest: +SKIP
+    ...     for t in block:
+    ...         print(t.txid)
+
+    :param path: Path to blk*.dat file
+    :type path: str
+    :param network: Network, leave empty for default
+    :type network: str, Network
+    :param magic: Network magic bytes. Leave empty to use the first 4 bytes of the file
+    :type magic: bytes, str
+
+    :return Block:
+    """
+
+    if not isinstance(network, Network):
+        network = Network(network)
+    with open(path, 'rb') as f:
+        if not os.fstat(f.fileno()).st_size:
+            return
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            file_size = len(mm)
+            magic = mm[:4] if magic is None else to_bytes(magic)
+            pos = 0
+            while pos + 8 <= file_size:
+                block_magic = mm[pos:pos + 4]
+                if block_magic == b'\0\0\0\0':  # Start of preallocated empty space at end of file
+                    break
+                if block_magic != magic:
+                    raise BlockError("Unexpected magic bytes %s at position %d in %s" %
+                                     (to_hexstring(block_magic), pos, path))
+                block_size = struct.unpack('<L', mm[pos + 4:pos + 8])[0]
+                pos += 8
+                if pos + block_size > file_size:
+                    raise BlockError("Block at position %d exceeds end of file %s" % (pos, path))
+                yield Block.from_raw(mm[pos:pos + block_size], network=network)
+                pos += block_size
+        finally:
+            mm.close()
+
+
+class HeaderChain(object):
+    """
+    Store of block headers in a file with fixed-width 80 byte records.
+
+    The file is memory mapped, so the header at a certain height is found by offset arithmetic. New headers are
+    checked for a link to the previous header and validated with the proof-of-work consensus rules of the network
+    before they are stored. Use :func:`rollback` to remove headers after a chain reorganisation.
+
+    >>> hc = HeaderChain('/tmp/headers.dat')  # doctest: +SKIP
+    >>> hc.append_many(headers)  # doctest: +SKIP
+    >>> hc.confirmations(t.block_height)  # doctest: +SKIP
+    """
+
+    HEADER_SIZE = 80
+
+    def __init__(self, filename=None, network=DEFAULT_NETWORK, start_height=0, check_pow=True, checkpoint_hash=None):
+        """
+        Open or create a header chain file.
+
+        Proof-of-work validation is only available for networks in :data:`POW_PARAMETERS`, use check_pow=False
+        for other networks.
+
+        :param filename: Path to header file. Default is headers_[network].dat in the database directory
+        :type filename: str
+        :param network: Network, leave empty for default
+        :type network: str, Network
+        :param start_height: Height of first header in file. Use this to start from a checkpoint instead of the genesis block. Choose the first block of a retarget period, so the next difficulty adjustment can be validated
+        :type start_height: int
+        :param check_pow: Validate the proof-of-work target and difficulty adjustments of new headers, and check the first header against the genesis block or checkpoint hash. Default is True
+        :type check_pow: bool
+        :param checkpoint_hash: Block hash of the first header as hexadecimal string. Required to add the first header when check_pow is enabled and the chain does not start at the genesis block
+        :type checkpoint_hash: str
+        """
+
+        self.network = network
+        if not isinstance(network, Network):
+            self.network = Network(network)
+        if filename is None:
+            filename = os.path.join(BCL_DATABASE_DIR, 'headers_%s.dat' % self.network.name)
+        self.filename = filename
+        self.start_height = start_height
+        self.check_pow = check_pow
+        self._pow_params = None
+        if check_pow:
+            if self.network.name not in POW_PARAMETERS:
+                raise BlockError("Proof-of-work validation is not available for network %s, use check_pow=False" %
+                                 self.network.name)
+            self._pow_params = POW_PARAMETERS[self.network.name]
+            if not start_height:
+                checkpoint_hash = self._pow_params['genesis_hash']
+        self.checkpoint_hash = None if not checkpoint_hash else to_hexstring(checkpoint_hash).lower()
+        if not os.path.exists(filename):
+            open(filename, 'wb').close()
+        self._file = open(filename, 'r+b')
+        self._mm = None
+        self._count = 0
+        self._tip_hash = None
+        try:
+            if os.fstat(self._file.fileno()).st_size % self.HEADER_SIZE:
+                raise BlockError("Size of header file %s is not a multiple of %d bytes" %
+                                 (filename, self.HEADER_SIZE))
+            self._map()
+        except Exception:
+            self._file.close()
+            raise
+
+    def __repr__(self):
+        return "<HeaderChain(%s, height: %s)>" % (self.filename, self.height)
+
+    def __len__(self):
+        return self._count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _map(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        size = os.fstat(self._file.fileno()).st_size
+        self._count = size // self.HEADER_SIZE
+        self._tip_hash = None
+        if size:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._tip_hash = double_sha256(self._mm[size - self.HEADER_SIZE:size])
+
+    def close(self):
+        """
+        Close memory map and header file
+        """
+
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        self._file.close()
+
+    @property
+    def height(self):
+        """
+        Height of last header in chain, None if chain is empty
+
+        :return int:
+        """
+
+        if not self._count:
+            return None
+        return self.start_height + self._count - 1
+
+    def raw_header(self, height):
+        """
+        Get raw 80 byte block header at given height
+
+        :param height: Block height
+        :type height: int
+
+        :return bytes:
+        """
+
+        pos = height - self.start_height
+        if not 0 <= pos < self._count:
+            raise BlockError("Height %d not in header chain" % height)
+        return self._mm[pos * self.HEADER_SIZE:(pos + 1) * self.HEADER_SIZE]
+
+    def header(self, height):
+        """
+        Get block header at given height as Block object without transactions
+
+        :param height: Block height
+        :type height: int
+
+        :return Block:
+        """
+
+        block = Block.from_raw(self.raw_header(height), network=self.network)
+        block.height = height
+        return block
+
+    def block_hash(self, height):
+        """
+        Get hash of block at given height
+
+        :param height: Block height
+        :type height: int
+
+        :return bytes:
+        """
+
+        return double_sha256(self.raw_header(height))[::-1]
+
+    def append(self, header):
+        """
+        Validate and add a single block header. See :func:`append_many` for details.
+
+        :param header: Raw 80 byte block header
+        :type header: bytes, str
+
+        :return int: New height of chain
+        """
+
+        return self.append_many([header])
+
+    def append_many(self, headers):
+        """
+        Validate and add a list of block headers to the end of the chain.
+
+        Each header must refer to the hash of the previous header. If check_pow is enabled the following consensus
+        rules are checked as well:
+
+        * The target of the bits field may not exceed the proof-of-work limit of the network
+        * The bits field must be equal to the bits of the previous header, except at the first block of a retarget
+          period, where it must match the difficulty adjustment calculated with :func:`retarget_bits`. On testnet a
+          block more than 20 minutes after the previous block may use the proof-of-work limit.
+        * The block hash must be below the target
+        * The first header of the chain must match the genesis block or the checkpoint hash
+
+        Headers are only written if all headers are valid.
+
+        :param headers: List of raw 80 byte block headers
+        :type headers: list of bytes, str
+
+        :return int: New height of chain
+        """
+
+        tip_hash = self._tip_hash
+        raw_headers = []
+        for header in headers:
+            if not isinstance(header, bytes):
+                header = to_bytes(header)
+            if len(header) != self.HEADER_SIZE:
+                raise BlockError("Block header must be %d bytes, found %d bytes" % (self.HEADER_SIZE, len(header)))
+            block_hash = double_sha256(header)
+            height = self.start_height + self._count + len(raw_headers)
+            if tip_hash is not None and header[4:36] != tip_hash:
+                raise BlockError("Previous block hash of header at height %d does not match block %s" %
+                                 (height, to_hexstring(tip_hash[::-1])))
+            if self.check_pow:
+                bits = struct.unpack('<L', header[72:76])[0]
+                target = bits_to_target(bits)
+                if target > self._pow_params['pow_limit']:
+                    raise BlockError("Target of header at height %d is above the proof-of-work limit" % height)
+                if height != self.start_height:
+                    expected_bits = self._expected_bits(height, header, raw_headers)
+                    if bits != expected_bits:
+                        raise BlockError("Bits of header at height %d should be %08x, found %08x" %
+                                         (height, expected_bits, bits))
+                if int(to_hexstring(block_hash[::-1]), 16) > target:
+                    raise BlockError("Hash of header at height %d does not meet proof-of-work target" % height)
+                if height == self.start_height:
+                    if not self.checkpoint_hash:
+                        raise BlockError("Please specify a checkpoint hash for the header at start height %d" %
+                                         height)
+                    if to_hexstring(block_hash[::-1]) != self.checkpoint_hash:
+                        raise BlockError("Header at height %d does not match genesis block or checkpoint %s" %
+                                         (height, self.checkpoint_hash))
+            raw_headers.append(header)
+            tip_hash = block_hash
+        if raw_headers:
+            self._file.seek(self._count * self.HEADER_SIZE)
+            self._file.write(b''.join(raw_headers))
+            self._file.flush()
+            self._map()
+        return self.height
+
+    def _raw_header_pending(self, height, raw_headers):
+        """
+        Get raw header at given height from the chain or from the list of headers which are not written yet.
+
+        :return bytes:
+        """
+
+        pos = height - self.start_height - self._count
+        if 0 <= pos < len(raw_headers):
+            return raw_headers[pos]
+        return self.raw_header(height)
+
+    def _expected_bits(self, height, header, raw_headers):
+        """
+        Get required bits field for header at given height, see :func:`append_many`.
+
+        :param height: Height of new header
+        :type height: int
+        :param header: New raw header
+        :type header: bytes
+        :param raw_headers: Validated headers which are not written to the chain yet
+        :type raw_headers: list of bytes
+
+        :return int:
+        """
+
+        params = self._pow_params
+        interval = params['retarget_interval']
+        prev_header = self._raw_header_pending(height - 1, raw_headers)
+        prev_bits, = struct.unpack('<L', prev_header[72:76])
+        prev_time, = struct.unpack('<L', prev_header[68:72])
+        if height % interval:
+            if not params['min_difficulty_blocks']:
+                return prev_bits
+            limit_bits = target_to_bits(params['pow_limit'])
+            if struct.unpack('<L', header[68:72])[0] > prev_time + 2 * params['target_spacing']:
+                return limit_bits
+            # Use bits of last block which is not a minimum difficulty block
+            bits = prev_bits
+            prev_height = height - 1
+            while prev_height > self.start_height and prev_height % interval and bits == limit_bits:
+                prev_height -= 1
+                bits, = struct.unpack('<L', self._raw_header_pending(prev_height, raw_headers)[72:76])
+            return bits
+        first_height = height - interval
+        if first_height < self.start_height:
+            raise BlockError("Cannot validate difficulty adjustment at height %d, header at height %d is not in "
+                             "the chain" % (height, first_height))
+        first_time, = struct.unpack('<L', self._raw_header_pending(first_height, raw_headers)[68:72])
+        return retarget_bits(prev_bits, first_time, prev_time, self.network)
+
+    def rollback(self, height):
+        """
+        Remove all headers above given height, for instance after a chain reorganisation.
+
+        :param height: Height of last header to keep
+        :type height: int
+
+        :return int: Number of removed headers
+        """
+
+        keep = max(height - self.start_height + 1, 0)
+        if keep >= self._count:
+            return 0
+        removed = self._count - keep
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        self._file.truncate(keep * self.HEADER_SIZE)
+        self._file.flush()
+        self._map()
+        return removed
+
+    def confirmations(self, block_height):
+        """
+        Get number of confirmations of a transaction included in block at given height. A transaction in the tip of
+        the chain has 1 confirmation.
+
+        :param block_height: Height of block with transaction, i.e. the block_height of a transaction in a wallet
+        :type block_height: int
+
+        :return int: Number of confirmations, 0 if block height is empty, 0 or above the tip of the chain
+        """
+
+        if not block_height or self.height is None or block_height > self.height:
+            return 0
+        return self.height - block_height + 1
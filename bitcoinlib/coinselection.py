@@ -0,0 +1,387 @@
+# -*- coding: utf-8 -*-
+#
+#    BitcoinLib - Python Cryptocurrency Library
+#    COIN SELECTION - Strategies to select unspent outputs as inputs for a transaction
+#    © 2020 - 1200 Web Development <http://1200wd.com/>
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+import math
+import random
+import time
+from bitcoinlib.main import *
+
+_logger = logging.getLogger(__name__)
+
+BNB_TIME_BUDGET = 0.1
+BNB_MAX_TRIES = 100000
+KNAPSACK_ITERATIONS = 1000
+KNAPSACK_MAX_STEPS = 100000
+
+
+def input_size(witness_type='legacy', multisig=False, sigs_required=1, keys_total=1, compressed=True):
+    """
+    Estimate virtual size of a signed input. Uses the same estimates as Transaction.estimate_size()
+
+    :param witness_type: Witness type of input: legacy, p2sh-segwit or segwit
+    :type witness_type: str
+    :param multisig: Is input a multisignature input
+    :type multisig: bool
+    :param sigs_required: Number of signatures required for a multisig input
+    :type sigs_required: int
+    :param keys_total: Number of keys in a multisig input
+    :type keys_total: int
+    :param compressed: Are public keys compressed
+    :type compressed: bool
+
+    :return int: Virtual size in bytes
+    """
+    size = 40
+    if multisig:
+        script_size = 9 + (keys_total * 34) + (sigs_required * 72)
+        if witness_type == 'p2sh-segwit':
+            script_size += 17 * sigs_required
+    else:
+        script_size = 107
+        if not compressed:
+            script_size += 33
+        if witness_type == 'p2sh-segwit':
+            script_size += 24
+    if witness_type == 'legacy':
+        return size + script_size
+    size += 1
+    return int(math.ceil(size + script_size / 4.0))
+
+
+def output_size(witness_type='legacy', multisig=False):
+    """
+    Estimate size of a change output. Uses the same estimates as Transaction.estimate_size()
+
+    :param witness_type: Witness type of the output: legacy, p2sh-segwit or segwit
+    :type witness_type: str
+    :param multisig: Is output a multisignature output
+    :type multisig: bool
+
+    :return int: Size in bytes
+    """
+    if witness_type == 'legacy':
+        return 8 + (24 if multisig else 26)
+    elif witness_type == 'p2sh-segwit':
+        return 8 + 24
+    return 8 + (33 if multisig else 23)
+
+
+def _effective_values(utxos, input_fee):
+    return [(u['value'] - input_fee, u) for u in utxos if u['value'] > input_fee]
+
+
+def waste(selection, amount, input_fee=0, change_fee=0):
+    """
+    Calculate waste of a selection of UTXO's: the fees paid for the inputs plus the cost of creating and later
+    spending a change output, or the excess value which is added to the fee if no change output is created.
+
+    :param selection: List of UTXO dictionaries with a 'value' key
+    :type selection: list of dict
+    :param amount: Amount to pay, excluding the fees for the inputs
+    :type amount: int
+    :param input_fee: Fee for each input at the current fee per kB
+    :type input_fee: int
+    :param change_fee: Fee for a change output at the current fee per kB
+    :type change_fee: int
+
+    :return int: Waste in smallest denominator, or None if selection does not cover the amount
+    """
+    excess = sum([u['value'] - input_fee for u in selection]) - amount
+    if excess < 0:
+        return None
+    cost_of_change = change_fee + input_fee
+    return len(selection) * input_fee + (cost_of_change if excess > cost_of_change else excess)
+
+
+def select_greedy(utxos, amount, input_fee=0, change_fee=0, max_utxos=None):
+    """
+    Select the smallest UTXO which covers the amount, or compose the amount of the largest smaller UTXO's. This is
+    the default strategy of HDWallet.select_inputs()
+
+    :param utxos: List of UTXO dictionaries with a 'value' key
+    :type utxos: list of dict
+    :param amount: Amount to select, excluding the fees for the inputs
+    :type amount: int
+    :param input_fee: Fee for each input at the current fee per kB
+    :type input_fee: int
+    :param change_fee: Fee for a change output at the current fee per kB. Not used by this strategy
+    :type change_fee: int
+    :param max_utxos: Maximum number of UTXO's to select
+    :type max_utxos: int
+
+    :return list of dict: Selected UTXO's or an empty list if amount can not be covered
+    """
+    pool = sorted(_effective_values(utxos, input_fee), key=lambda x: x[0])
+    larger = [u for ev, u in pool if ev >= amount]
+    if larger:
+        return larger[:1]
+    if max_utxos and max_utxos <= 1:
+        return []
+    selection = []
+    total = 0
+    for ev, u in reversed(pool):
+        if total >= amount or (max_utxos is not None and len(selection) >= max_utxos):
+            break
+        selection.append(u)
+        total += ev
+    return selection if total >= amount else []
+
+
+def select_branch_and_bound(utxos, amount, input_fee=0, change_fee=0, max_utxos=None, time_budget=BNB_TIME_BUDGET,
+                            max_tries=BNB_MAX_TRIES):
+    """
+    Search for a selection of UTXO's which pays the amount without creating a change output, so the excess value
+    is smaller then the cost of creating and spending a change output. Of all matches found the one with the
+    lowest waste is returned.
+
+    Depth-first search with the largest UTXO's first, as used in Bitcoin Core. Branches which cannot improve on the
+    best match found are skipped. The search stops when all combinations are tried or when the maximum number of
+    tries or the time budget is reached.
+
+    :param utxos: List of UTXO dictionaries with a 'value' key
+    :type utxos: list of dict
+    :param amount: Amount to select, excluding the fees for the inputs
+    :type amount: int
+    :param input_fee: Fee for each input at the current fee per kB
+    :type input_fee: int
+    :param change_fee: Fee for a change output at the current fee per kB
+    :type change_fee: int
+    :param max_utxos: Maximum number of UTXO's to select
+    :type max_utxos: int
+    :param time_budget: Maximum time to search in seconds
+    :type time_budget: float
+    :param max_tries: Maximum number of search steps
+    :type max_tries: int
+
+    :return list of dict: Selected UTXO's or an empty list if no match without change is found
+    """
+    pool = sorted(_effective_values(utxos, input_fee), key=lambda x: x[0], reverse=True)
+    available = sum([ev for ev, _ in pool])
+    if available < amount:
+        return []
+    upper = amount + change_fee + input_fee
+    start = time.time()
+
+    total = 0
+    selection = []
+    best = []
+    best_waste = None
+    index = 0
+    for tries in range(max_tries):
+        backtrack = False
+        # Input fees of the selection, and of at least one more input if amount is not reached yet, is the lowest
+        # possible waste of this branch
+        min_waste = (len(selection) + (1 if total < amount else 0)) * input_fee
+        if total + available < amount or total > upper or (best_waste is not None and min_waste >= best_waste) or \
+                (max_utxos is not None and len(selection) > max_utxos):
+            backtrack = True
+        elif total >= amount:
+            selection_waste = len(selection) * input_fee + total - amount
+            if best_waste is None or selection_waste < best_waste:
+                best = list(selection)
+                best_waste = selection_waste
+                if not best_waste:
+                    break
+            backtrack = True
+        if not tries % 256 and time.time() - start > time_budget:
+            _logger.info("Branch and bound coin selection stopped after %d tries, time budget exceeded" % tries)
+            break
+
+        if backtrack:
+            if not selection:
+                break
+            # Add omitted UTXO's back to available value and try branch without the last included UTXO
+            index -= 1
+            while index > selection[-1]:
+                available += pool[index][0]
+                index -= 1
+            total -= pool[index][0]
+            selection.pop()
+        else:
+            available -= pool[index][0]
+            # Skip inclusion branch if previous UTXO has the same value and was excluded
+            if not selection or index - 1 == selection[-1] or pool[index][0] != pool[index - 1][0]:
+                selection.append(index)
+                total += pool[index][0]
+        index += 1
+    return [pool[i][1] for i in best]
+
+
+def select_knapsack(utxos, amount, input_fee=0, change_fee=0, max_utxos=None, iterations=KNAPSACK_ITERATIONS,
+                    rng=None):
+    """
+    Select UTXO's with a randomized approximation of the smallest subset which covers the amount, as used in Bitcoin
+    Core before branch and bound. First a subset which matches the amount exactly is searched, and otherwise a
+    subset which leaves enough for a change output. The smallest single UTXO which covers amount and change is
+    used if no better subset is found.
+
+    The search stops when an exact match is found. The number of iterations is reduced for large UTXO sets, so a
+    search never visits more then KNAPSACK_MAX_STEPS UTXO's.
+
+    :param utxos: List of UTXO dictionaries with a 'value' key
+    :type utxos: list of dict
+    :param amount: Amount to select, excluding the fees for the inputs
+    :type amount: int
+    :param input_fee: Fee for each input at the current fee per kB
+    :type input_fee: int
+    :param change_fee: Fee for a change output at the current fee per kB
+    :type change_fee: int
+    :param max_utxos: Maximum number of UTXO's to select
+    :type max_utxos: int
+    :param iterations: Maximum number of random subsets to try
+    :type iterations: int
+    :param rng: Random number generator, default is the random module
+    :type rng: random.Random
+
+    :return list of dict: Selected UTXO's or an empty list if amount can not be covered
+    """
+    rng = rng or random
+    target = amount + change_fee
+    lowest_larger = None
+    lowers = []
+    total_lower = 0
+    for ev, u in _effective_values(utxos, input_fee):
+        if ev == amount:
+            return [u]
+        elif ev < target:
+            lowers.append((ev, u))
+            total_lower += ev
+        elif lowest_larger is None or ev < lowest_larger[0]:
+            lowest_larger = (ev, u)
+    if total_lower < amount or (total_lower < target and lowest_larger):
+        return [lowest_larger[1]] if lowest_larger else []
+    lowers.sort(key=lambda x: x[0], reverse=True)
+    if total_lower <= target and (max_utxos is None or len(lowers) <= max_utxos):
+        return [u for _, u in lowers]
+    # Each iteration visits every UTXO at most twice
+    iterations = max(1, min(iterations, KNAPSACK_MAX_STEPS // (2 * len(lowers))))
+
+    def approximate_best_subset(subset_target):
+        best = [True] * len(lowers)
+        best_value = total_lower
+        if max_utxos is not None and len(lowers) > max_utxos:
+            best_value = None
+        for _ in range(iterations):
+            if best_value == subset_target:
+                break
+            included = [False] * len(lowers)
+            pass_start = [False] * len(lowers)
+            total = 0
+            count = 0
+            reached = False
+            best_cut = None
+            for npass in range(2):
+                if reached:
+                    break
+                if npass:
+                    pass_start = list(included)
+                for i in range(len(lowers)):
+                    if (rng.random() < 0.5) if npass == 0 else not included[i]:
+                        total += lowers[i][0]
+                        count += 1
+                        included[i] = True
+                        if total >= subset_target:
+                            reached = True
+                            if (best_value is None or total < best_value) and \
+                                    (max_utxos is None or count <= max_utxos):
+                                best_value = total
+                                # Later steps of this pass only change UTXO's after i, so copy selection once
+                                best_cut = (i, pass_start)
+                            total -= lowers[i][0]
+                            count -= 1
+                            included[i] = False
+            if best_cut is not None:
+                i, pass_start = best_cut
+                best = included[:i] + [True] + pass_start[i + 1:]
+        if best_value is None:
+            return None, []
+        return best_value, [lowers[i][1] for i in range(len(lowers)) if best[i]]
+
+    best_value, selection = approximate_best_subset(amount)
+    if best_value != amount and total_lower >= target:
+        best_value_change, selection_change = approximate_best_subset(target)
+        if best_value_change is not None:
+            best_value, selection = best_value_change, selection_change
+    if lowest_larger and (best_value is None or (best_value != amount and best_value < target) or
+                          lowest_larger[0] <= best_value):
+        return [lowest_larger[1]]
+    return selection
+
+
+def select_min_waste(utxos, amount, input_fee=0, change_fee=0, max_utxos=None, rng=None):
+    """
+    Run the branch and bound, knapsack and greedy strategies and return the selection with the lowest waste. The
+    waste accounts for the fees of the inputs at the current fee per kB, so selections with less or smaller inputs
+    are preferred.
+
+    :param utxos: List of UTXO dictionaries with a 'value' key
+    :type utxos: list of dict
+    :param amount: Amount to select, excluding the fees for the inputs
+    :type amount: int
+    :param input_fee: Fee for each input at the current fee per kB
+    :type input_fee: int
+    :param change_fee: Fee for a change output at the current fee per kB
+    :type change_fee: int
+    :param max_utxos: Maximum number of UTXO's to select
+    :type max_utxos: int
+    :param rng: Random number generator for the knapsack strategy, default is the random module
+    :type rng: random.Random
+
+    :return list of dict: Selected UTXO's or an empty list if amount can not be covered
+    """
+    best = []
+    best_waste = None
+    for selection in [select_branch_and_bound(utxos, amount, input_fee, change_fee, max_utxos),
+                      select_knapsack(utxos, amount, input_fee, change_fee, max_utxos, rng=rng),
+                      select_greedy(utxos, amount, input_fee, change_fee, max_utxos)]:
+        selection_waste = waste(selection, amount, input_fee, change_fee) if selection else None
+        if selection_waste is not None and (best_waste is None or selection_waste < best_waste):
+            best = selection
+            best_waste = selection_waste
+    return best
+
+
+def select_bnb(utxos, amount, input_fee=0, change_fee=0, max_utxos=None):
+    """
+    Select UTXO's with branch and bound, and use the knapsack strategy if no selection without change is found
+
+    :param utxos: List of UTXO dictionaries with a 'value' key
+    :type utxos: list of dict
+    :param amount: Amount to select, excluding the fees for the inputs
+    :type amount: int
+    :param input_fee: Fee for each input at the current fee per kB
+    :type input_fee: int
+    :param change_fee: Fee for a change output at the current fee per kB
+    :type change_fee: int
+    :param max_utxos: Maximum number of UTXO's to select
+    :type max_utxos: int
+
+    :return list of dict: Selected UTXO's or an empty list if amount can not be covered
+    """
+    return select_branch_and_bound(utxos, amount, input_fee, change_fee, max_utxos) or \
+        select_knapsack(utxos, amount, input_fee, change_fee, max_utxos)
+
+
+COIN_SELECTION_STRATEGIES = {
+    'default': select_greedy,
+    'bnb': select_bnb,
+    'knapsack': select_knapsack,
+    'waste': select_min_waste,
+}
@@ -54,6 +54,8 @@ ALLOW_DATABASE_THREADS = None
 TIMEOUT_REQUESTS = 10
 MAX_TRANSACTIONS = 20
 BLOCK_COUNT_CACHE_TIME = 3
+SERVICE_MAX_WORKERS = 8
+SERVICE_MAX_CONCURRENT_REQUESTS = 4
 
 # Transactions
 SCRIPT_TYPES_LOCKING = {
@@ -92,6 +94,9 @@ SEQUENCE_REPLACE_BY_FEE = 0xFFFFFFFD
 SIGNATURE_VERSION_STANDARD = 0
 SIGNATURE_VERSION_SEGWIT = 1
 
+# Maximum number of parsed scripts kept in memory by script_deserialize, set to 0 to disable cache
+SCRIPT_DESERIALIZE_CACHE_SIZE = 10000
+
 # Mnemonics
 DEFAULT_LANGUAGE = 'english'
 
@@ -202,6 +207,7 @@ def read_config():
     global BCL_INSTALL_DIR, BCL_DATABASE_DIR, DEFAULT_DATABASE, BCL_LOG_DIR, BCL_CONFIG_DIR, BCL_CONFIG_FILE
     global BCL_DATA_DIR, BCL_WORDLIST_DIR, ALLOW_DATABASE_THREADS
     global TIMEOUT_REQUESTS, DEFAULT_LANGUAGE, DEFAULT_NETWORK, LOGLEVEL, DEFAULT_WITNESS_TYPE
+    global SERVICE_MAX_WORKERS, SERVICE_MAX_CONCURRENT_REQUESTS
     global UNITTESTS_FULL_DATABASE_TEST
 
     BCL_CONFIG_DIR = config_get('locations', 'config_dir', fallback='.bitcoinlib/config')
@@ -246,6 +252,9 @@ def read_config():
         BCL_WORDLIST_DIR = os.path.join(BCL_INSTALL_DIR, BCL_WORDLIST_DIR)
 
     TIMEOUT_REQUESTS = int(config_get('common', 'timeout_requests', fallback=TIMEOUT_REQUESTS))
+    SERVICE_MAX_WORKERS = int(config_get('common', 'service_max_workers', fallback=SERVICE_MAX_WORKERS))
+    SERVICE_MAX_CONCURRENT_REQUESTS = int(config_get('common', 'service_max_concurrent_requests',
+                                                     fallback=SERVICE_MAX_CONCURRENT_REQUESTS))
     DEFAULT_LANGUAGE = config_get('common', 'default_language', fallback=DEFAULT_LANGUAGE)
     DEFAULT_NETWORK = config_get('common', 'default_network', fallback=DEFAULT_NETWORK)
     DEFAULT_WITNESS_TYPE = config_get('common', 'default_witness_type', fallback=DEFAULT_WITNESS_TYPE)
@@ -23,16 +23,18 @@ try:
 except ImportError:
     import enum34 as enum
 import datetime
-from sqlalchemy import create_engine
+import struct
+from sqlalchemy import create_engine, event, inspect, func
 from sqlalchemy import (Column, Integer, BigInteger, UniqueConstraint, CheckConstraint, String, Boolean, Sequence,
-                        ForeignKey, DateTime, Numeric, Text)
+                        ForeignKey, DateTime, Numeric, Text, LargeBinary)
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import sessionmaker, relationship, column_property
 try:
     from urllib.parse import urlparse
 except ImportError:
     from urlparse import urlparse
 from bitcoinlib.main import *
+from bitcoinlib.encoding import int_to_varbyteint, varbyteint_to_int
 
 _logger = logging.getLogger(__name__)
 _logger.info("Using Database %s" % DEFAULT_DATABASE)
@@ -58,21 +60,31 @@ class DbInit:
             db_uri += "check_same_thread=False"
         self.engine = create_engine(db_uri, isolation_level='READ UNCOMMITTED')
         Session = sessionmaker(bind=self.engine)
+        event.listen(Session, 'before_flush', _transaction_cache_update)
+        event.listen(Session, 'before_flush', _balance_ledger_update)
 
         Base.metadata.create_all(self.engine)
-        self._import_config_data(Session)
-
         self.session = Session()
+        # Read version before it is overwritten by the config data of this library version
+        version_db = None
+        try:
+            version_db = self.session.query(DbConfig.value).filter_by(variable='version').scalar()
+        except Exception as e:
+            _logger.warning("Error when reading database version: %s" % e)
+        self.session.rollback()
+        self._import_config_data(Session)
 
         # VERIFY AND UPDATE DATABASE
         # Just a very simple database update script, without any external libraries for now
         #
         try:
-            version_db = self.session.query(DbConfig.value).filter_by(variable='version').scalar()
-            if BITCOINLIB_VERSION != version_db:
+            if version_db and BITCOINLIB_VERSION != version_db:
                 _logger.warning("BitcoinLib database (%s) is from different version then library code (%s). "
                                 "Let's try to update database." % (version_db, BITCOINLIB_VERSION))
 
+                if 'cache' not in [c['name'] for c in inspect(self.engine).get_columns('transactions')]:
+                    add_column(self.engine, 'transactions', Column('cache', LargeBinary))
+                    _logger.info("Added transaction cache column to BitcoinLib database")
                 if version_db == '0.4.10' and BITCOINLIB_VERSION == '0.4.11':
                     column = Column('latest_txid', String(32))
                     add_column(self.engine, 'keys', column)
@@ -274,6 +286,8 @@ class DbTransaction(Base):
     network = relationship("DbNetwork")
     raw = Column(Text())
     verified = Column(Boolean, default=False)
+    cache = Column(LargeBinary, doc="Compact binary record with raw transaction and wallet annotations, used to list "
+                                    "transactions without reading the inputs and outputs tables")
 
     __table_args__ = (
         UniqueConstraint('wallet_id', 'hash', name='constraint_wallet_transaction_hash_unique'),
@@ -328,17 +342,195 @@ class DbTransactionOutput(Base):
     transaction_id = Column(Integer, ForeignKey('transactions.id'), primary_key=True)
     transaction = relationship("DbTransaction", back_populates='outputs')
     output_n = Column(BigInteger, primary_key=True)
-    key_id = Column(Integer, ForeignKey('keys.id'), index=True)
+    # Previous values of key_id, value and spent are always loaded when changed to update the balance ledger
+    key_id = column_property(Column(Integer, ForeignKey('keys.id'), index=True), active_history=True)
     key = relationship("DbKey", back_populates="transaction_outputs")
     script = Column(Text)
     script_type = Column(String(20), default='p2pkh')
-    value = Column(Numeric(25, 0, asdecimal=False), default=0)
-    spent = Column(Boolean(), default=False)
+    value = column_property(Column(Numeric(25, 0, asdecimal=False), default=0), active_history=True)
+    spent = column_property(Column(Boolean(), default=False), active_history=True)
 
     __table_args__ = (CheckConstraint(script_type.in_(['', 'p2pkh',  'multisig', 'p2sh', 'p2pk', 'nulldata',
                                                        'unknown', 'p2wpkh', 'p2wsh']),
                                       name='transactionoutput_constraint_script_types_allowed'),)
 
 
+class DbBalance(Base):
+    """
+    Balance per network and account of a wallet
+
+    Balance ledger which is updated incrementally when unspent outputs are added, spent or removed, together with
+    the balance of the keys.
+
+    """
+    __tablename__ = 'balances'
+    id = Column(Integer, Sequence('balance_id_seq'), primary_key=True)
+    wallet_id = Column(Integer, ForeignKey('wallets.id'), index=True)
+    network_name = Column(String(20), ForeignKey('networks.name'))
+    account_id = Column(Integer)
+    balance = Column(Numeric(25, 0, asdecimal=False), default=0)
+
+    __table_args__ = (
+        UniqueConstraint('wallet_id', 'network_name', 'account_id', name='constraint_wallet_network_account_unique'),
+    )
+
+    def __repr__(self):
+        return "<DbBalance(wallet_id='%s', network_name='%s', account_id='%s', balance='%s'>" % \
+               (self.wallet_id, self.network_name, self.account_id, self.balance)
+
+
+# Version of the compact transaction record format stored in DbTransaction.cache
+TRANSACTION_CACHE_VERSION = b'\x01'
+
+
+def transaction_cache_serialize(rawtx, inputs, outputs):
+    """
+    Create compact binary record of a wallet transaction for the DbTransaction.cache field. Contains the raw
+    transaction and the wallet annotations which are not part of the raw transaction.
+
+    Format: version byte, raw transaction with varint length, number of inputs as varint, per input the key ID + 1
+    as varint (0 if unknown), the value as 8 byte integer and a flags byte (double spend), number of outputs as
+    varint, per output the key ID + 1 as varint and a flags byte (spent)
+
+    :param rawtx: Raw transaction
+    :type rawtx: bytes
+    :param inputs: List of tuples with key ID, value and double spend for each input
+    :type inputs: list of tuple
+    :param outputs: List of tuples with key ID and spent for each output
+    :type outputs: list of tuple
+
+    :return bytes:
+    """
+    record = [TRANSACTION_CACHE_VERSION, int_to_varbyteint(len(rawtx)), rawtx, int_to_varbyteint(len(inputs))]
+    for key_id, value, double_spend in inputs:
+        record += [int_to_varbyteint(key_id + 1 if key_id else 0),
+                   struct.pack('<QB', int(value or 0), bool(double_spend))]
+    record.append(int_to_varbyteint(len(outputs)))
+    for key_id, spent in outputs:
+        record += [int_to_varbyteint(key_id + 1 if key_id else 0), struct.pack('B', bool(spent))]
+    return b''.join(record)
+
+
+def transaction_cache_deserialize(record):
+    """
+    Parse compact binary transaction record created with :func:`transaction_cache_serialize`
+
+    :param record: Compact transaction record
+    :type record: bytes
+
+    :return tuple: Raw transaction, list of (key ID, value, double spend) for each input, list of (key ID, spent) for each output. None if record version is unknown
+    """
+    if record[:1] != TRANSACTION_CACHE_VERSION:
+        return None
+    size, cursor = varbyteint_to_int(record[1:10])
+    cursor += 1
+    rawtx = record[cursor:cursor + size]
+    cursor += size
+    n_inputs, size = varbyteint_to_int(record[cursor:cursor + 9])
+    cursor += size
+    inputs = []
+    for _ in range(n_inputs):
+        key_id, size = varbyteint_to_int(record[cursor:cursor + 9])
+        value, double_spend = struct.unpack('<QB', record[cursor + size:cursor + size + 9])
+        inputs.append((key_id - 1 if key_id else None, value, bool(double_spend)))
+        cursor += size + 9
+    n_outputs, size = varbyteint_to_int(record[cursor:cursor + 9])
+    cursor += size
+    outputs = []
+    for _ in range(n_outputs):
+        key_id, size = varbyteint_to_int(record[cursor:cursor + 9])
+        spent = struct.unpack('B', record[cursor + size:cursor + size + 1])[0]
+        outputs.append((key_id - 1 if key_id else None, bool(spent)))
+        cursor += size + 1
+    return rawtx, inputs, outputs
+
+
+def _transaction_cache_update(session, flush_context, instances):
+    """
+    Update key IDs, values and spent flags in the compact records of transactions of which inputs or outputs are
+    added or changed. The record is removed if the input or output is not part of the raw transaction.
+    """
+    changed = {}
+    for item in list(session.new) + list(session.dirty):
+        if isinstance(item, (DbTransactionInput, DbTransactionOutput)) and item.transaction_id and \
+                (item in session.new or session.is_modified(item)):
+            changed.setdefault(item.transaction_id, []).append(item)
+    if not changed:
+        return
+    for db_tx in session.query(DbTransaction).filter(DbTransaction.id.in_(list(changed.keys()))):
+        if db_tx.cache is None:
+            continue
+        items = changed[db_tx.id]
+        cache = transaction_cache_deserialize(db_tx.cache)
+        if cache is None:
+            db_tx.cache = None
+            continue
+        rawtx, inputs, outputs = cache
+        for item in items:
+            if isinstance(item, DbTransactionInput) and item.index_n < len(inputs):
+                inputs[item.index_n] = (item.key_id, item.value, item.double_spend)
+            elif isinstance(item, DbTransactionOutput) and item.output_n < len(outputs):
+                outputs[item.output_n] = (item.key_id, item.spent)
+            else:
+                db_tx.cache = None
+                break
+        else:
+            db_tx.cache = transaction_cache_serialize(rawtx, inputs, outputs)
+
+
+def _balance_ledger_update(session, flush_context, instances):
+    """
+    Adjust the balance of keys and the DbBalance rows of their wallet, network and account when unspent outputs are
+    added, spent or removed, or when their value or key changes.
+    """
+    deltas = {}
+
+    def add_delta(key_id, value, spent, sign):
+        if key_id and value and not spent:
+            deltas[key_id] = deltas.get(key_id, 0) + sign * value
+
+    for item in session.new:
+        if isinstance(item, DbTransactionOutput):
+            add_delta(item.key_id, item.value, item.spent, 1)
+    for item in list(session.dirty) + list(session.deleted):
+        if not isinstance(item, DbTransactionOutput):
+            continue
+        if item in session.dirty and not session.is_modified(item):
+            continue
+        state = inspect(item)
+        old_values = []
+        for attr in ['key_id', 'value', 'spent']:
+            history = state.attrs[attr].history
+            if history.deleted:
+                old_values.append(history.deleted[0])
+            elif history.added:
+                old_values.append(None)
+            else:
+                old_values.append(getattr(item, attr))
+        add_delta(*(old_values + [-1]))
+        if item not in session.deleted:
+            add_delta(item.key_id, item.value, item.spent, 1)
+
+    deltas = dict([(key_id, delta) for key_id, delta in deltas.items() if delta])
+    if not deltas:
+        return
+    nw_acc_deltas = {}
+    for key in session.query(DbKey).filter(DbKey.id.in_(list(deltas.keys()))):
+        if key in session.deleted:
+            continue
+        key.balance = func.coalesce(DbKey.balance, 0) + deltas[key.id]
+        nw_acc = (key.wallet_id, key.network_name, key.account_id)
+        nw_acc_deltas[nw_acc] = nw_acc_deltas.get(nw_acc, 0) + deltas[key.id]
+    balances = {}
+    wallet_ids = list(set([nw_acc[0] for nw_acc in nw_acc_deltas]))
+    for db_balance in session.query(DbBalance).filter(DbBalance.wallet_id.in_(wallet_ids)):
+        balances[(db_balance.wallet_id, db_balance.network_name, db_balance.account_id)] = db_balance
+    for nw_acc, delta in nw_acc_deltas.items():
+        if nw_acc in balances:
+            balances[nw_acc].balance = DbBalance.balance + delta
+        else:
+            session.add(DbBalance(wallet_id=nw_acc[0], network_name=nw_acc[1], account_id=nw_acc[2], balance=delta))
+
+
 if __name__ == '__main__':
     DbInit()
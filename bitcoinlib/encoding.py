@@ -324,7 +324,88 @@ def int_to_varbyteint(inp):
         return struct.pack('<cQ', b'\xff', inp)
 
 
-def convert_der_sig(signature, as_hex=True):
+def _bytes_to_int(data):
+    """
+    Convert big endian bytes to integer
+
+    :param data: Bytes in big endian order
+    :type data: bytes, bytearray
+
+    :return int:
+    """
+    if PY3:
+        return int.from_bytes(data, 'big')
+    return int(binascii.hexlify(data), 16) if data else 0
+
+
+def _int_to_bytes(value, length=None):
+    """
+    Convert integer to big endian bytes
+
+    :param value: Positive integer
+    :type value: int
+    :param length: Output length, pad with zero bytes on the left. Leave empty for shortest representation
+    :type length: int
+
+    :return bytes:
+    """
+    if length is None:
+        length = (value.bit_length() + 7) // 8
+    if PY3:
+        return value.to_bytes(length, 'big')
+    return binascii.unhexlify('%0*x' % (length * 2, value)) if length else b''
+
+
+def _der_integer(value):
+    data = _int_to_bytes(value)
+    if not data or ord(data[:1]) & 0x80:
+        data = b'\0' + data
+    return b'\x02' + struct.pack('B', len(data)) + data
+
+
+def der_decode_sig(signature, strict=False):
+    """
+    Get r and s value from DER encoded signature.
+
+    The signature must not include the hash type byte. Lengths are always checked. If strict is True the encoding
+    must also follow the strict DER rules of BIP66: a maximum length of 72 bytes, no negative numbers and no
+    unnecessary zero padding. Signatures in blocks before BIP66 do not always follow these rules, so parsing is
+    lenient by default.
+
+    >>> der_decode_sig(to_bytes('3006020104020102'))
+    (4, 2)
+
+    :param signature: DER encoded signature
+    :type signature: bytes
+    :param strict: Check for strict BIP66 DER encoding. Default is False
+    :type strict: bool
+
+    :return tuple: r and s value as integers
+    """
+    sig = bytearray(signature)
+    sig_len = len(sig)
+    if sig_len < 8 or sig[0] != 0x30 or sig[1] != sig_len - 2:
+        raise EncodingError("Invalid DER signature: wrong sequence header or length")
+    if strict and sig_len > 72:
+        raise EncodingError("Invalid DER signature: signature is longer than 72 bytes")
+    r_len = sig[3]
+    if sig[2] != 0x02 or not r_len or r_len + 7 > sig_len:
+        raise EncodingError("Invalid DER signature: wrong r value header or length")
+    s_len = sig[r_len + 5]
+    if sig[r_len + 4] != 0x02 or not s_len or r_len + s_len + 6 != sig_len:
+        raise EncodingError("Invalid DER signature: wrong s value header or length")
+    r = sig[4:r_len + 4]
+    s = sig[r_len + 6:]
+    if strict:
+        for name, value in (('r', r), ('s', s)):
+            if value[0] & 0x80:
+                raise EncodingError("Invalid DER signature: negative %s value" % name)
+            if len(value) > 1 and not value[0] and not value[1] & 0x80:
+                raise EncodingError("Invalid DER signature: %s value has unnecessary zero padding" % name)
+    return _bytes_to_int(r), _bytes_to_int(s)
+
+
+def convert_der_sig(signature, as_hex=True, strict=False):
     """
     Convert DER encoded signature to signature string
 
@@ -332,31 +413,28 @@ def convert_der_sig(signature, as_hex=True):
     :type signature: bytes
     :param as_hex: Output as hexstring
     :type as_hex: bool
+    :param strict: Check for strict BIP66 DER encoding. Default is False
+    :type strict: bool
 
     :return bytes, str: Signature
     """
 
     if not signature:
         return ""
-    if USE_FASTECDSA:
-        r, s = DEREncoder.decode_signature(bytes(signature))
-    else:
-        sg, junk = ecdsa.der.remove_sequence(signature)
-        if junk != b'':
-            raise EncodingError("Junk found in encoding sequence %s" % junk)
-        r, sg = ecdsa.der.remove_integer(sg)
-        s, sg = ecdsa.der.remove_integer(sg)
-    sig = '%064x%064x' % (r, s)
+    r, s = der_decode_sig(signature, strict=strict)
     if as_hex:
-        return sig
+        return '%064x%064x' % (r, s)
     else:
-        return binascii.unhexlify(sig)
+        return _int_to_bytes(r, 32) + _int_to_bytes(s, 32)
 
 
 def der_encode_sig(r, s):
     """
     Create DER encoded signature string with signature r and s value
 
+    >>> to_hexstring(der_encode_sig(4, 130))
+    '300702010402020082'
+
     :param r: r value of signature
     :type r: int
     :param s: s value of signature
@@ -364,12 +442,9 @@ def der_encode_sig(r, s):
 
     :return bytes:
     """
-    if USE_FASTECDSA:
-        return DEREncoder.encode_signature(r, s)
-    else:
-        rb = ecdsa.der.encode_integer(r)
-        sb = ecdsa.der.encode_integer(s)
-        return ecdsa.der.encode_sequence(rb, sb)
+    rb = _der_integer(r)
+    sb = _der_integer(s)
+    return b'\x30' + struct.pack('B', len(rb) + len(sb)) + rb + sb
 
 
 def addr_to_pubkeyhash(address, as_hex=False, encoding='base58'):
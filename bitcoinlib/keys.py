@@ -42,6 +42,7 @@ if 'scrypt' not in sys.modules:
 from bitcoinlib.networks import Network, DEFAULT_NETWORK, network_by_value, wif_prefix_search
 from bitcoinlib.config.secp256k1 import *
 from bitcoinlib.encoding import *
+from bitcoinlib.encoding import _bytes_to_int, _int_to_bytes
 from bitcoinlib.mnemonic import Mnemonic
 
 rfc6979_warning_given = False
@@ -655,16 +656,11 @@ class Key(object):
 
         :return: Key object
         """
-        self.public_hex = None
-        self.public_uncompressed_hex = None
-        self.public_compressed_hex = None
+        # Other public key formats and the y coordinate are derived from public_byte when used
         self.public_byte = None
-        self.public_uncompressed_byte = None
-        self.public_compressed_byte = None
+        self._public_y = None
         self.private_byte = None
         self.private_hex = None
-        self._x = None
-        self._y = None
         self.secret = None
         self.compressed = compressed
         self._hash160 = None
@@ -695,7 +691,8 @@ class Key(object):
                 self.network = Network(network)
             network_name = self.network.name
         network = check_network_and_key(import_key, network_name, networks_extracted)
-        self.network = Network(network)
+        if network != network_name:
+            self.network = Network(network)
 
         if self.key_format == "wif_protected":
             # TODO: return key as byte (?)
@@ -704,38 +701,8 @@ class Key(object):
 
         if not self.is_private:
             self.secret = None
-            pub_key = to_hexstring(import_key)
-            if len(pub_key) == 130:
-                self.public_uncompressed_hex = pub_key
-                self._x = pub_key[2:66]
-                self._y = pub_key[66:130]
-                self.compressed = False
-                if int(self._y, 16) % 2:
-                    prefix = '03'
-                else:
-                    prefix = '02'
-                self.public_hex = prefix + self._x
-                self.public_compressed_hex = prefix + self._x
-            else:
-                self.public_hex = pub_key
-                self._x = pub_key[2:66]
-                self.compressed = True
-                # Calculate y from x with y=x^3 + 7 function
-                sign = pub_key[:2] == '03'
-                x = int(self._x, 16)
-                ys = pow(x, 3, secp256k1_p) + 7 % secp256k1_p
-                y = mod_sqrt(ys)
-                if y & 1 != sign:
-                    y = secp256k1_p - y
-                self._y = change_base(y, 10, 16, 64)
-                self.public_uncompressed_hex = '04' + self._x + self._y
-                self.public_compressed_hex = pub_key
-            self.public_compressed_byte = binascii.unhexlify(self.public_hex)
-            self.public_uncompressed_byte = binascii.unhexlify(self.public_uncompressed_hex)
-            if self.compressed:
-                self.public_byte = self.public_compressed_byte
-            else:
-                self.public_byte = self.public_uncompressed_byte
+            self.public_byte = binascii.unhexlify(to_hexstring(import_key))
+            self.compressed = len(self.public_byte) != 65
         elif self.is_private and self.key_format == 'decimal':
             self.secret = import_key
             self.private_hex = change_base(import_key, 10, 16, 64)
@@ -803,20 +770,13 @@ class Key(object):
             else:
                 point_x = p.x()
                 point_y = p.y()
-            self._x = change_base(point_x, 10, 16, 64)
-            self._y = change_base(point_y, 10, 16, 64)
-            if point_y % 2:
-                prefix = '03'
+            x = change_base(point_x, 10, 16, 64)
+            self._public_y = change_base(point_y, 10, 16, 64)
+            if self.compressed:
+                prefix = '03' if point_y % 2 else '02'
+                self.public_byte = binascii.unhexlify(prefix + x)
             else:
-                prefix = '02'
-
-            self.public_compressed_hex = prefix + self._x
-            self.public_uncompressed_hex = '04' + self._x + self._y
-            self.public_hex = self.public_compressed_hex if self.compressed else self.public_uncompressed_hex
-
-            self.public_byte = binascii.unhexlify(self.public_hex)
-            self.public_compressed_byte = binascii.unhexlify(self.public_compressed_hex)
-            self.public_uncompressed_byte = binascii.unhexlify(self.public_uncompressed_hex)
+                self.public_byte = binascii.unhexlify('04' + x + self._public_y)
         self._address_obj = None
         self._wif = None
         self._wif_prefix = None
@@ -1024,6 +984,74 @@ class Key(object):
         """
         return self.public_uncompressed_hex
 
+    @property
+    def public_hex(self):
+        """
+        Public key as hexadecimal string in the format of public_byte
+
+        :return str:
+        """
+        return self.public_byte and to_hexstring(self.public_byte)
+
+    @property
+    def public_compressed_byte(self):
+        """
+        Compressed public key as bytes, derived from public_byte
+
+        :return bytes:
+        """
+        if not self.public_byte or len(self.public_byte) != 65:
+            return self.public_byte
+        return (b'\x03' if ord(self.public_byte[64:65]) & 1 else b'\x02') + self.public_byte[1:33]
+
+    @property
+    def public_compressed_hex(self):
+        """
+        Compressed public key as hexadecimal string
+
+        :return str:
+        """
+        return self.public_byte and to_hexstring(self.public_compressed_byte)
+
+    @property
+    def public_uncompressed_byte(self):
+        """
+        Uncompressed public key as bytes. The y coordinate is calculated when needed.
+
+        :return bytes:
+        """
+        if not self.public_byte or len(self.public_byte) == 65:
+            return self.public_byte
+        return b'\x04' + self.public_byte[1:33] + binascii.unhexlify(self._y)
+
+    @property
+    def public_uncompressed_hex(self):
+        """
+        Uncompressed public key as hexadecimal string
+
+        :return str:
+        """
+        return self.public_byte and to_hexstring(self.public_uncompressed_byte)
+
+    @property
+    def _x(self):
+        return self.public_byte and to_hexstring(self.public_byte[1:33])
+
+    @property
+    def _y(self):
+        if self._public_y is None and self.public_byte:
+            if len(self.public_byte) == 65:
+                return to_hexstring(self.public_byte[33:])
+            # Calculate y from x with y=x^3 + 7 function
+            sign = self.public_byte[:1] == b'\x03'
+            x = int(self._x, 16)
+            ys = pow(x, 3, secp256k1_p) + 7 % secp256k1_p
+            y = mod_sqrt(ys)
+            if y & 1 != sign:
+                y = secp256k1_p - y
+            self._public_y = change_base(y, 10, 16, 64)
+        return self._public_y
+
     def public_point(self):
         """
         Get public key point on Elliptic curve
@@ -1821,7 +1849,7 @@ class Signature(object):
     """
 
     @staticmethod
-    def from_str(signature, public_key=None):
+    def from_str(signature, public_key=None, strict=False):
         """
         Create a signature from signature string with r and s part. Signature length must be 64 bytes or 128 
         character hexstring 
@@ -1830,23 +1858,26 @@ class Signature(object):
         :type signature: bytes, str
         :param public_key: Public key as HDKey or Key object or any other string accepted by HDKey object
         :type public_key: HDKey, Key, str, hexstring, bytes
+        :param strict: Require strict BIP66 encoding for DER signatures. Default is False, so signatures from blocks before BIP66 can be parsed
+        :type strict: bool
         
         :return Signature: 
         """
 
-        der_signature = ''
         signature = to_bytes(signature)
         if len(signature) > 64 and signature.startswith(b'\x30'):
-            der_signature = signature
-            if der_signature.endswith(b'\x01'):
-                der_signature = der_signature[:-1]
-            signature = convert_der_sig(signature[:-1], as_hex=False)
-        signature = to_hexstring(signature)
-        if len(signature) != 128:
+            # Length of DER sequence is in second byte, remaining bytes are the hash type
+            der_signature = signature[:ord(signature[1:2]) + 2]
+            try:
+                r, s = der_decode_sig(der_signature, strict=strict)
+            except EncodingError as e:
+                raise BKeyError(str(e))
+            return Signature(r, s, der_signature=der_signature, public_key=public_key)
+        if len(signature) != 64:
             raise BKeyError("Signature length must be 64 bytes or 128 character hexstring")
-        r = int(signature[:64], 16)
-        s = int(signature[64:], 16)
-        return Signature(r, s, signature=signature, der_signature=der_signature, public_key=public_key)
+        r = _bytes_to_int(signature[:32])
+        s = _bytes_to_int(signature[32:])
+        return Signature(r, s, signature=signature, public_key=public_key)
 
     @staticmethod
     def create(tx_hash, private, use_rfc6979=True, k=None):
@@ -1903,12 +1934,11 @@ class Signature(object):
             sk = ecdsa.SigningKey.from_string(private.private_byte, curve=ecdsa.SECP256k1)
             tx_hash_bytes = to_bytes(tx_hash)
             sig_der = sk.sign_digest(tx_hash_bytes, sigencode=ecdsa.util.sigencode_der, k=k)
-            signature = convert_der_sig(sig_der)
-            r = int(signature[:64], 16)
-            s = int(signature[64:], 16)
+            r, s = der_decode_sig(sig_der)
             if s > secp256k1_n / 2:
                 s = secp256k1_n - s
-            return Signature(r, s, tx_hash, secret, public_key=pub_key, der_signature=sig_der, signature=signature, k=k)
+                sig_der = None
+            return Signature(r, s, tx_hash, secret, public_key=pub_key, der_signature=sig_der, k=k)
 
     def __init__(self, r, s, tx_hash=None, secret=None, signature=None, der_signature=None, public_key=None, k=None):
         """
@@ -1943,7 +1973,10 @@ class Signature(object):
         self._tx_hash = None
         self.tx_hash = tx_hash
         self.secret = None if not secret else int(secret)
-        self._der_encoded = to_bytes(der_signature)
+        if isinstance(der_signature, bytes) and der_signature.startswith(b'\x30'):
+            self._der_encoded = der_signature
+        else:
+            self._der_encoded = to_bytes(der_signature)
         self._signature = to_bytes(signature)
         self._public_key = None
         self.public_key = public_key
@@ -2005,12 +2038,12 @@ class Signature(object):
         """
 
         if not self._signature:
-            self._signature = to_bytes('%064x%064x' % (self.r, self.s))
+            self._signature = _int_to_bytes(self.r, 32) + _int_to_bytes(self.s, 32)
         return self._signature
 
     def as_der_encoded(self, as_hex=False):
         """
-        Get DER encoded signature
+        Get DER encoded signature. Encoded on first request and cached.
 
         :param as_hex: Output as hexstring
         :type as_hex: bool
@@ -2104,10 +2137,11 @@ def sign(tx_hash, private, use_rfc6979=True, k=None):
     return Signature.create(tx_hash, private, use_rfc6979, k)
 
 
-def verify(tx_hash, signature, public_key=None):
+def verify(tx_hash, signature, public_key=None, strict=True):
     """
     Verify provided signature with tx_hash message. If provided signature is no Signature object a new object will
-    be created for verification.
+    be created for verification. DER encoded signatures must follow the strict BIP66 encoding, unless strict is
+    set to False.
 
     :param tx_hash: Transaction hash
     :type tx_hash: bytes, hexstring
@@ -2115,13 +2149,15 @@ def verify(tx_hash, signature, public_key=None):
     :type signature: str, bytes
     :param public_key: Public key P. If not provided it will be derived from provided Signature object or raise an error if not available
     :type public_key: HDKey, Key, str, hexstring, bytes
+    :param strict: Require strict BIP66 encoding for DER signatures. Default is True
+    :type strict: bool
 
     :return bool: 
     """
     if not isinstance(signature, Signature):
         if not public_key:
             raise BKeyError("No public key provided, cannot verify")
-        signature = Signature.from_str(signature, public_key=public_key)
+        signature = Signature.from_str(signature, public_key=public_key, strict=strict)
     return signature.verify(tx_hash, public_key)
 
 
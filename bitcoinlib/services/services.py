@@ -23,7 +23,10 @@ import logging
 import json
 import random
 import time
-from bitcoinlib.config.config import BLOCK_COUNT_CACHE_TIME
+import copy
+import threading
+from multiprocessing.pool import ThreadPool
+from bitcoinlib.config.config import BLOCK_COUNT_CACHE_TIME, SERVICE_MAX_WORKERS, SERVICE_MAX_CONCURRENT_REQUESTS
 from bitcoinlib.main import BCL_DATA_DIR, BCL_CONFIG_DIR, TYPE_TEXT, MAX_TRANSACTIONS, TIMEOUT_REQUESTS
 from bitcoinlib import services
 from bitcoinlib.networks import DEFAULT_NETWORK, Network
@@ -32,6 +35,27 @@ from bitcoinlib.encoding import to_hexstring
 
 _logger = logging.getLogger(__name__)
 
+_provider_semaphores = {}
+_provider_semaphores_lock = threading.Lock()
+
+
+def _provider_semaphore(name, provider):
+    """
+    Get semaphore which limits the number of simultaneous requests to a service provider from all threads.
+
+    :param name: Provider name as used in provider definitions
+    :type name: str
+    :param provider: Provider definition
+    :type provider: dict
+
+    :return threading.BoundedSemaphore:
+    """
+    with _provider_semaphores_lock:
+        if name not in _provider_semaphores:
+            limit = provider.get('max_concurrent_requests') or SERVICE_MAX_CONCURRENT_REQUESTS
+            _provider_semaphores[name] = threading.BoundedSemaphore(limit)
+        return _provider_semaphores[name]
+
 
 class ServiceError(Exception):
     def __init__(self, msg=''):
@@ -137,7 +161,8 @@ class Service(object):
                 if not hasattr(pc_instance, method):
                     continue
                 providermethod = getattr(pc_instance, method)
-                res = providermethod(*arguments)
+                with _provider_semaphore(sp, self.providers[sp]):
+                    res = providermethod(*arguments)
                 if res is False:  # pragma: no cover
                     self.errors.update(
                         {sp: 'Received empty response'}
@@ -170,6 +195,53 @@ class Service(object):
             return False
         return list(self.results.values())[0]
 
+    def _execute_many(self, method, arguments_list, workers=None):
+        """
+        Call a method of this Service object for each item in a list of arguments using a pool of threads.
+
+        Every call uses its own copy of this object so results of calls do not mix. Afterwards errors of all calls are
+        merged in this object and complete is only True if all calls were complete. The number of simultaneous
+        requests per provider is limited by the 'max_concurrent_requests' provider setting or
+        SERVICE_MAX_CONCURRENT_REQUESTS.
+
+        :param method: Name of method, i.e. 'getutxos'
+        :type method: str
+        :param arguments_list: List of tuples with arguments for each call
+        :type arguments_list: list of tuple
+        :param workers: Number of threads, default is SERVICE_MAX_WORKERS
+        :type workers: int
+
+        :return list: Results in same order as arguments list
+        """
+        if workers is None:
+            workers = SERVICE_MAX_WORKERS
+        services = [copy.copy(self) for _ in arguments_list]
+
+        def execute(i):
+            return getattr(services[i], method)(*arguments_list[i])
+
+        workers = min(workers, len(arguments_list))
+        if workers > 1:
+            pool = ThreadPool(workers)
+            try:
+                results = pool.map(execute, range(len(arguments_list)))
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            results = [execute(i) for i in range(len(arguments_list))]
+
+        self.results = {}
+        self.errors = {}
+        self.resultcount = 0
+        self.complete = True
+        for srv in services:
+            self.errors.update(srv.errors)
+            self.resultcount += srv.resultcount
+            if srv.complete is False:
+                self.complete = False
+        return results
+
     def getbalance(self, addresslist, addresses_per_request=5):
         """
         Get total balance for address or list of addresses
@@ -218,6 +290,26 @@ class Service(object):
             self.complete = False
         return utxos
 
+    def getutxos_many(self, addresses, after_txids=None, max_txs=MAX_TRANSACTIONS, workers=None):
+        """
+        Get list of unspent outputs (UTXO's) for a list of addresses. Requests to service providers are made
+        concurrently, see getutxos() for details.
+
+        :param addresses: List of address strings
+        :type addresses: list of str
+        :param after_txids: List with last known transaction ID for each address. Default: Leave empty to return all utxos.
+        :type after_txids: list of str
+        :param max_txs: Maximum number of utxo's to return per address
+        :type max_txs: int
+        :param workers: Number of threads, default is SERVICE_MAX_WORKERS
+        :type workers: int
+
+        :return list: List of UTXO's for each address, in order of the addresses list. False if no provider gave a response for an address
+        """
+        if after_txids is None:
+            after_txids = [''] * len(addresses)
+        return self._execute_many('getutxos', [(a, t, max_txs) for a, t in zip(addresses, after_txids)], workers)
+
     def gettransaction(self, txid):
         """
         Get a transaction by its transaction hash. Convert to Bitcoinlib transaction object.
@@ -257,6 +349,27 @@ class Service(object):
             self.complete = False
         return txs
 
+    def gettransactions_many(self, addresses, after_txids=None, max_txs=MAX_TRANSACTIONS, workers=None):
+        """
+        Get all transactions for a list of addresses. Requests to service providers are made concurrently, see
+        gettransactions() for details.
+
+        :param addresses: List of address strings
+        :type addresses: list of str
+        :param after_txids: List with last known transaction ID for each address. Default: Leave empty to return all transactions.
+        :type after_txids: list of str
+        :param max_txs: Maximum number of transactions to return per address
+        :type max_txs: int
+        :param workers: Number of threads, default is SERVICE_MAX_WORKERS
+        :type workers: int
+
+        :return list: List of Transaction objects for each address, in order of the addresses list
+        """
+        if after_txids is None:
+            after_txids = [''] * len(addresses)
+        return self._execute_many('gettransactions', [(a, t, max_txs) for a, t in zip(addresses, after_txids)],
+                                  workers)
+
     def getrawtransaction(self, txid):
         """
         Get a raw transaction by its transaction hash
@@ -51,6 +51,9 @@ def parse_args():
                               help="Update unspent transaction outputs (UTXO's) for this wallet")
     group_wallet.add_argument('--update-transactions', '-u', action='store_true',
                               help="Update all transactions and UTXO's for this wallet")
+    group_wallet.add_argument('--check-balances', action='store_true',
+                              help="Check if stored balances of this wallet match its unspent outputs and rebuild "
+                                   "them if not")
     group_wallet.add_argument('--wallet-recreate', '-z', action='store_true',
                               help="Delete all keys and transactions and recreate wallet, except for the masterkey(s)."
                                    " Use when updating fails or other errors occur. Please backup your database and "
@@ -294,6 +297,15 @@ def main():
         wlt.utxos_update()
     if args.update_transactions:
         wlt.scan(scan_gap_limit=5)
+    if args.check_balances:
+        differences = wlt.balance_ledger_check(fix=True)
+        for d in differences:
+            if 'key_id' in d:
+                item = "key %d" % d['key_id']
+            else:
+                item = "network %s account %s" % (d['network'], d['account_id'])
+            print("Fixed balance of %s: %s, expected %s" % (item, d['balance'], d['expected']))
+        print("Wallet balances checked, %d difference(s) found" % len(differences))
 
     if args.export_private:
         if wlt.scheme == 'multisig':
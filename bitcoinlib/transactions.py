@@ -19,6 +19,10 @@
 #
 
 from datetime import datetime
+from collections import OrderedDict
+from itertools import islice
+import multiprocessing
+import threading
 import json
 
 from bitcoinlib.encoding import *
@@ -42,18 +46,195 @@ class TransactionError(Exception):
         return self.msg
 
 
-def _transaction_deserialize(rawtx, network=DEFAULT_NETWORK):
+class _TransactionItemList(list):
+    """
+    List of transaction inputs or outputs. Used by the Transaction class to clear its cached serialization data
+    whenever an item is added, removed or replaced.
+    """
+
+    def __init__(self, items=None, transaction=None):
+        self._transaction = transaction
+        list.__init__(self, [] if items is None else items)
+        self._link(self)
+
+    def _link(self, items):
+        # Let inputs and outputs clear the cache of this transaction when one of their serialized fields changes
+        transaction = getattr(self, '_transaction', None)
+        if transaction is None:
+            return
+        for item in items:
+            if isinstance(item, (Input, Output)):
+                item._transaction = transaction
+
+    def _changed(self):
+        transaction = getattr(self, '_transaction', None)
+        if transaction is not None:
+            transaction._cache_clear()
+
+    def append(self, item):
+        list.append(self, item)
+        self._link([item])
+        self._changed()
+
+    def extend(self, items):
+        items = list(items)
+        list.extend(self, items)
+        self._link(items)
+        self._changed()
+
+    def insert(self, index, item):
+        list.insert(self, index, item)
+        self._link([item])
+        self._changed()
+
+    def remove(self, item):
+        list.remove(self, item)
+        self._changed()
+
+    def pop(self, *args):
+        item = list.pop(self, *args)
+        self._changed()
+        return item
+
+    def clear(self):
+        del self[:]
+
+    def sort(self, *args, **kwargs):
+        list.sort(self, *args, **kwargs)
+        self._changed()
+
+    def reverse(self):
+        list.reverse(self)
+        self._changed()
+
+    def __setitem__(self, index, item):
+        if isinstance(index, slice):
+            item = list(item)
+        list.__setitem__(self, index, item)
+        self._link(item if isinstance(index, slice) else [item])
+        self._changed()
+
+    def __delitem__(self, index):
+        list.__delitem__(self, index)
+        self._changed()
+
+    def __setslice__(self, i, j, items):
+        items = list(items)
+        list.__setslice__(self, i, j, items)
+        self._link(items)
+        self._changed()
+
+    def __delslice__(self, i, j):
+        list.__delslice__(self, i, j)
+        self._changed()
+
+    def __iadd__(self, items):
+        self.extend(items)
+        return self
+
+    def __imul__(self, n):
+        list.__imul__(self, n)
+        self._changed()
+        return self
+
+
+class _SerializedField(object):
+    """
+    Attribute of an Input or Output which is part of the serialized transaction. The value is stored in the instance
+    with an underscore prefix. Assigning a new value clears the cached serialization data of the transaction the
+    input or output belongs to.
+    """
+
+    def __init__(self, name, signatures_only=False):
+        self.name = '_' + name
+        self.signatures_only = signatures_only
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        return getattr(obj, self.name)
+
+    def __set__(self, obj, value):
+        obj.__dict__[self.name] = value
+        if obj._transaction is not None:
+            obj._transaction._cache_clear(signatures_only=self.signatures_only)
+
+
+def _input_add_witnesses(inp, witnesses):
+    """
+    Create a new Input from a deserialized input and its witnesses. Determines signatures, keys and script type of
+    segwit and p2sh-segwit inputs.
+
+    :param inp: Input deserialized from raw transaction
+    :type inp: Input
+    :param witnesses: List of witness items with size bytes, or b'\0' for an empty item
+    :type witnesses: list of bytes
+
+    :return Input:
+    """
+
+    script_type = inp.script_type
+    witness_script_type = 'sig_pubkey'
+    signatures = []
+    keys = []
+    sigs_required = 1
+    public_hash = b''
+    for witness in witnesses:
+        if witness == b'\0':
+            continue
+        item_size, size = varbyteint_to_int(witness)
+        if 70 <= item_size <= 74 and witness[1:2] == b'\x30':  # witness is DER encoded signature
+            signatures.append(witness[1:])
+        elif item_size == 33 and len(witness) == 33 + size and len(signatures) == 1:  # key from sig_pk
+            keys.append(witness[1:])
+        elif len(witness) == item_size + size:  # Redeemscript
+            rsds = script_deserialize(witness, script_types=['multisig'])
+            if not rsds['script_type'] == 'multisig':
+                raise TransactionError("Could not parse witnesses in transaction. Multisig redeemscript "
+                                       "expected")
+            # FIXME: Do not mixup naming signatures and keys
+            keys = rsds['signatures']
+            sigs_required = rsds['number_of_sigs_m']
+            witness_script_type = 'p2sh'
+            script_type = 'p2sh_multisig'
+        else:
+            raise TransactionError("Could not parse witnesses in transaction")
+
+    inp_witness_type = inp.witness_type
+    usd = script_deserialize(inp.unlocking_script, locking_script=True)
+
+    if usd['script_type'] == "p2wpkh" and witness_script_type == 'sig_pubkey':
+        inp_witness_type = 'p2sh-segwit'
+        script_type = 'p2sh_p2wpkh'
+    elif usd['script_type'] == "p2wsh" and witness_script_type == 'p2sh':
+        inp_witness_type = 'p2sh-segwit'
+        script_type = 'p2sh_p2wsh'
+    return Input(prev_hash=inp.prev_hash, output_n=inp.output_n, keys=keys,
+                 unlocking_script_unsigned=inp.unlocking_script_unsigned,
+                 unlocking_script=inp.unlocking_script, sigs_required=sigs_required,
+                 signatures=signatures, witness_type=inp_witness_type, script_type=script_type,
+                 sequence=inp.sequence, index_n=inp.index_n, public_hash=public_hash, value=inp.value,
+                 network=inp.network)
+
+
+def _transaction_deserialize(rawtx, network=DEFAULT_NETWORK, lazy=False):
     """
     Deserialize a raw transaction
     
     Returns a dictionary with list of input and output objects, locktime and version.
     
     Will raise an error if wrong number of inputs are found or if there are no output found.
+
+    With lazy=True inputs and outputs only store the fields read directly from the raw transaction. Scripts, keys,
+    signatures and addresses are parsed when one of these attributes is accessed for the first time, so errors in
+    scripts or witnesses are raised at that moment instead of during import.
     
     :param rawtx: Raw transaction as String, Byte or Bytearray
     :type rawtx: str, bytes, bytearray
     :param network: Network code, i.e. 'bitcoin', 'testnet', 'litecoin', etc. Leave emtpy for default network
     :type network: str, Network
+    :param lazy: Postpone parsing of scripts, keys and addresses until they are used. Default is False
+    :type lazy: bool
 
     :return Transaction:
     """
@@ -69,11 +250,13 @@ def _transaction_deserialize(rawtx, network=DEFAULT_NETWORK):
         if flag == b'\1':
             witness_type = 'segwit'
         cursor += 2
+    body_start = cursor
     n_inputs, size = varbyteint_to_int(rawtx[cursor:cursor+9])
     cursor += size
     inputs = []
     if not isinstance(network, Network):
         network = Network(network)
+    input_class = Input._lazy_create if lazy else Input
     for n in range(0, n_inputs):
         inp_hash = rawtx[cursor:cursor + 32][::-1]
         if not len(inp_hash):
@@ -91,8 +274,8 @@ def _transaction_deserialize(rawtx, network=DEFAULT_NETWORK):
         cursor += unlocking_script_size
         sequence_number = rawtx[cursor:cursor + 4]
         cursor += 4
-        inputs.append(Input(prev_hash=inp_hash, output_n=output_n, unlocking_script=unlocking_script,
-                            witness_type=inp_type, sequence=sequence_number, index_n=n, network=network))
+        inputs.append(input_class(prev_hash=inp_hash, output_n=output_n, unlocking_script=unlocking_script,
+                                  witness_type=inp_type, sequence=sequence_number, index_n=n, network=network))
     if len(inputs) != n_inputs:
         raise TransactionError("Error parsing inputs. Number of tx specified %d but %d found" % (n_inputs, len(inputs)))
 
@@ -100,6 +283,7 @@ def _transaction_deserialize(rawtx, network=DEFAULT_NETWORK):
     n_outputs, size = varbyteint_to_int(rawtx[cursor:cursor + 9])
     cursor += size
     output_total = 0
+    output_class = Output._lazy_create if lazy else Output
     for n in range(0, n_outputs):
         value = change_base(rawtx[cursor:cursor + 8][::-1], 256, 10)
         cursor += 8
@@ -107,10 +291,11 @@ def _transaction_deserialize(rawtx, network=DEFAULT_NETWORK):
         cursor += size
         lock_script = rawtx[cursor:cursor + lock_script_size]
         cursor += lock_script_size
-        outputs.append(Output(value=value, lock_script=lock_script, network=network, output_n=n))
+        outputs.append(output_class(value=value, lock_script=lock_script, network=network, output_n=n))
         output_total += value
     if not outputs:
         raise TransactionError("Error no outputs found in this transaction")
+    body_end = cursor
     if witness_type == 'segwit':
         for n in range(0, len(inputs)):
             n_items, size = varbyteint_to_int(rawtx[cursor:cursor + 9])
@@ -124,60 +309,147 @@ def _transaction_deserialize(rawtx, network=DEFAULT_NETWORK):
                 cursor += item_size + size
                 witnesses.append(witness)
             if witnesses and not coinbase:
-                script_type = inputs[n].script_type
-                witness_script_type = 'sig_pubkey'
-                signatures = []
-                keys = []
-                sigs_required = 1
-                public_hash = b''
-                for witness in witnesses:
-                    if witness == b'\0':
-                        continue
-                    item_size, size = varbyteint_to_int(witness)
-                    if 70 <= item_size <= 74 and witness[1:2] == b'\x30':  # witness is DER encoded signature
-                        signatures.append(witness[1:])
-                    elif item_size == 33 and len(witness) == 33 + size and len(signatures) == 1:  # key from sig_pk
-                        keys.append(witness[1:])
-                    elif len(witness) == item_size + size:  # Redeemscript
-                        rsds = script_deserialize(witness, script_types=['multisig'])
-                        if not rsds['script_type'] == 'multisig':
-                            raise TransactionError("Could not parse witnesses in transaction. Multisig redeemscript "
-                                                   "expected")
-                        # FIXME: Do not mixup naming signatures and keys
-                        keys = rsds['signatures']
-                        sigs_required = rsds['number_of_sigs_m']
-                        witness_script_type = 'p2sh'
-                        script_type = 'p2sh_multisig'
-                    else:
-                        raise TransactionError("Could not parse witnesses in transaction")
-
-                inp_witness_type = inputs[n].witness_type
-                usd = script_deserialize(inputs[n].unlocking_script, locking_script=True)
-
-                if usd['script_type'] == "p2wpkh" and witness_script_type == 'sig_pubkey':
-                    inp_witness_type = 'p2sh-segwit'
-                    script_type = 'p2sh_p2wpkh'
-                elif usd['script_type'] == "p2wsh" and witness_script_type == 'p2sh':
-                    inp_witness_type = 'p2sh-segwit'
-                    script_type = 'p2sh_p2wsh'
-                inputs[n] = Input(prev_hash=inputs[n].prev_hash, output_n=inputs[n].output_n, keys=keys,
-                                  unlocking_script_unsigned=inputs[n].unlocking_script_unsigned,
-                                  unlocking_script=inputs[n].unlocking_script, sigs_required=sigs_required,
-                                  signatures=signatures, witness_type=inp_witness_type, script_type=script_type,
-                                  sequence=inputs[n].sequence, index_n=inputs[n].index_n, public_hash=public_hash,
-                                  network=inputs[n].network)
+                if lazy:
+                    inputs[n]._lazy['witnesses'] = witnesses
+                else:
+                    inputs[n] = _input_add_witnesses(inputs[n], witnesses)
     if len(rawtx[cursor:]) != 4:
         raise TransactionError("Error when deserializing raw transaction, bytes left for locktime must be 4 not %d" %
                                len(rawtx[cursor:]))
     locktime = change_base(rawtx[cursor:cursor + 4][::-1], 256, 10)
 
-    return Transaction(inputs, outputs, locktime, version, network, size=len(rawtx), output_total=output_total,
-                       coinbase=coinbase, flag=flag, witness_type=witness_type, rawtx=to_hexstring(rawtx))
+    t = Transaction(inputs, outputs, locktime, version, network, size=len(rawtx), output_total=output_total,
+                    coinbase=coinbase, flag=flag, witness_type=witness_type, rawtx=rawtx)
+    if lazy:
+        # Serialize from the raw transaction, so txid, size and weight do not parse the inputs and outputs
+        r_witness = rawtx[body_end:cursor] if witness_type == 'segwit' else b'\0' * n_inputs
+        t._raw_sections_cache = (rawtx[body_start:body_end], r_witness)
+    return t
+
+
+# Standard locking scripts with a fixed length and layout, by script length and first byte:
+# (script_type, prefix, suffix, data field)
+_SCRIPT_PATTERNS_STANDARD = {
+    (25, b'\x76'): ('p2pkh', b'\x76\xa9\x14', b'\x88\xac', 'hashes'),
+    (23, b'\xa9'): ('p2sh', b'\xa9\x14', b'\x87', 'hashes'),
+    (22, b'\x00'): ('p2wpkh', b'\x00\x14', b'', 'hashes'),
+    (34, b'\x00'): ('p2wsh', b'\x00\x20', b'', 'hashes'),
+    (35, b'\x21'): ('p2pk', b'\x21', b'\xac', 'keys'),
+    (67, b'\x41'): ('p2pk', b'\x41', b'\xac', 'keys'),
+}
+_SIG_PUBKEY_SIZES = {b'\x46': 70, b'\x47': 71, b'\x48': 72, b'\x49': 73}
+_PUBKEY_SIZES = {b'\x21': 33, b'\x41': 65}
+
+
+def _script_deserialize_standard(script, locking_script=None):
+    """
+    Recognise standard scripts with fixed offsets: p2pkh, p2sh, p2wpkh, p2wsh and p2pk locking scripts and
+    sig_pubkey unlocking scripts. Used by :func:`script_deserialize` to skip the generic script template parser.
+
+    :param script: Raw script without size byte
+    :type script: bytes
+    :param locking_script: Only check locking scripts if True, only unlocking scripts if False, both if None
+    :type locking_script: bool
+
+    :return tuple: (script_type, {field: [value]}) or None if script is not a standard script
+    """
+
+    if locking_script is not False:
+        pattern = _SCRIPT_PATTERNS_STANDARD.get((len(script), script[:1]))
+        if pattern and script.startswith(pattern[1]) and script.endswith(pattern[2]):
+            return pattern[0], {pattern[3]: [script[len(pattern[1]):len(script) - len(pattern[2])]]}
+    if locking_script is not True:
+        sig_size = _SIG_PUBKEY_SIZES.get(script[:1])
+        if sig_size:
+            key_size = _PUBKEY_SIZES.get(script[sig_size + 1:sig_size + 2])
+            if key_size and len(script) == sig_size + key_size + 2:
+                return 'sig_pubkey', {'signatures': [script[1:sig_size + 1]], 'keys': [script[sig_size + 2:]]}
+    return None
+
+
+class _ScriptCache(object):
+    """
+    Least recently used cache of parsed scripts with hit and miss counters. Values are stored as copies and
+    returned as copies, so callers can modify the returned dictionary. Thread safe, scripts are deserialized
+    concurrently by the worker threads of the Service class.
+    """
+
+    def __init__(self, maxsize=SCRIPT_DESERIALIZE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _copy(data):
+        return dict([(k, list(v) if isinstance(v, list) else v) for k, v in data.items()])
+
+    def get(self, key):
+        with self._lock:
+            data = self._items.pop(key, None)
+            if data is None:
+                self.misses += 1
+                return None
+            self._items[key] = data
+            self.hits += 1
+        # Stored values are never modified, so they can be copied outside the lock
+        return self._copy(data)
+
+    def set(self, key, data):
+        if not self.maxsize:
+            return
+        data = self._copy(data)
+        with self._lock:
+            self._items[key] = data
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self):
+        with self._lock:
+            hits, misses, size = self.hits, self.misses, len(self._items)
+        lookups = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / float(lookups) if lookups else 0.0,
+            'size': size,
+            'maxsize': self.maxsize,
+        }
+
+
+_script_cache = _ScriptCache()
+
+
+def script_deserialize_cache_info():
+    """
+    Get statistics of the cache of parsed scripts used by :func:`script_deserialize`
+
+    :return dict: Dictionary with hits, misses, hit_rate, size and maxsize
+    """
+
+    return _script_cache.info()
+
+
+def script_deserialize_cache_clear():
+    """
+    Remove all parsed scripts from the :func:`script_deserialize` cache and reset the statistics
+    """
+
+    _script_cache.clear()
 
 
 def script_deserialize(script, script_types=None, locking_script=None, size_bytes_check=True):
     """
     Deserialize a script: determine type, number of signatures and script data.
+
+    Results are kept in a bounded least recently used cache, see :func:`script_deserialize_cache_info`.
     
     :param script: Raw script
     :type script: str, bytes, bytearray
@@ -191,6 +463,21 @@ def script_deserialize(script, script_types=None, locking_script=None, size_byte
     :return list: With this items: [script_type, data, number_of_sigs_n, number_of_sigs_m] 
     """
 
+    key = (bytes(script) if isinstance(script, bytearray) else script,
+           tuple(script_types) if isinstance(script_types, (list, dict)) else script_types,
+           locking_script, size_bytes_check)
+    data = _script_cache.get(key)
+    if data is None:
+        data = _script_deserialize(script, script_types, locking_script, size_bytes_check)
+        _script_cache.set(key, data)
+    return data
+
+
+def _script_deserialize(script, script_types=None, locking_script=None, size_bytes_check=True):
+    """
+    Deserialize a script without using the cache. See :func:`script_deserialize` for details.
+    """
+
     def _parse_data(scr, max_items=None, redeemscript_expected=False, item_length=0):
         scr = to_bytes(scr)
         items = []
@@ -363,6 +650,13 @@ def script_deserialize(script, script_types=None, locking_script=None, size_byte
         data.update({'result': 'Empty script'})
         return data
 
+    if script_types is None:
+        standard = _script_deserialize_standard(script, locking_script)
+        if standard:
+            data.update(standard[1])
+            data.update({'script_type': standard[0], 'locktime_cltv': 0, 'locktime_csv': 0})
+            return data
+
     # Check if script starts with size byte
     if size_bytes_check:
         script_size, size = varbyteint_to_int(script[0:9])
@@ -512,10 +806,11 @@ def _p2sh_multisig_unlocking_script(sigs, redeemscript, hash_type=None, as_list=
             usu.append(s)
         else:
             usu += varstr(s)
-    rs_size = b''
-    
-    if not as_list:
-        rs_size = int_to_varbyteint(len(redeemscript))
+    if as_list:
+        # Witness items are serialized with their length only, so no push data opcode is needed
+        usu.append(redeemscript)
+        return usu
+    rs_size = int_to_varbyteint(len(redeemscript))
     size_byte = b''
     if len(redeemscript) >= 76:
         if len(rs_size) == 1:
@@ -524,11 +819,7 @@ def _p2sh_multisig_unlocking_script(sigs, redeemscript, hash_type=None, as_list=
             size_byte = b'\x4d'
         else:
             size_byte = b'\x4e'
-    redeemscript_str = size_byte + rs_size + redeemscript
-    if as_list:
-        usu.append(redeemscript_str)
-    else:
-        usu += redeemscript_str
+    usu += size_byte + rs_size + redeemscript
     return usu
 
 
@@ -577,6 +868,185 @@ def get_unlocking_script_type(locking_script_type, witness_type='legacy', multis
         raise TransactionError("Unknown locking script type %s" % locking_script_type)
 
 
+# Largest DER encoded signature including hash type byte and push opcode
+_MAX_SIG_PUSH_SIZE = 74
+
+# Worst case serialized size of unlocking script (including length prefix) and witness data (including item count) for
+# unsigned inputs, by script type, witness type and compressed keys. Multisig entries are added on first use.
+_INPUT_SIZE_ESTIMATES = {
+    ('sig_pubkey', 'legacy', True): (1 + _MAX_SIG_PUSH_SIZE + 34, 1),
+    ('sig_pubkey', 'legacy', False): (1 + _MAX_SIG_PUSH_SIZE + 66, 1),
+    ('sig_pubkey', 'segwit', True): (1, 1 + _MAX_SIG_PUSH_SIZE + 34),
+    ('sig_pubkey', 'segwit', False): (1, 1 + _MAX_SIG_PUSH_SIZE + 66),
+    ('sig_pubkey', 'p2sh-segwit', True): (24, 1 + _MAX_SIG_PUSH_SIZE + 34),
+    ('sig_pubkey', 'p2sh-segwit', False): (24, 1 + _MAX_SIG_PUSH_SIZE + 66),
+    ('signature', 'legacy', True): (1 + _MAX_SIG_PUSH_SIZE, 1),
+    ('signature', 'legacy', False): (1 + _MAX_SIG_PUSH_SIZE, 1),
+}
+
+# Size of locking script of a change output by witness type of the first input and multisig or not
+_CHANGE_LOCK_SCRIPT_SIZES = {
+    ('legacy', False): 25,
+    ('legacy', True): 23,
+    ('p2sh-segwit', False): 23,
+    ('p2sh-segwit', True): 23,
+    ('segwit', False): 22,
+    ('segwit', True): 34,
+}
+
+
+def _input_size_estimate(inp):
+    """
+    Get worst case size of the unlocking script and witness data of an unsigned input from the
+    _INPUT_SIZE_ESTIMATES table.
+
+    :param inp: Transaction input
+    :type inp: Input
+
+    :return tuple: Unlocking script size, witness size. None if script type is unknown
+    """
+
+    if inp.script_type != 'p2sh_multisig':
+        return _INPUT_SIZE_ESTIMATES.get((inp.script_type, inp.witness_type, bool(inp.compressed)))
+
+    if inp.keys:
+        redeemscript_size = 3 + sum([1 + len(k.public_byte) for k in inp.keys])
+    elif inp.redeemscript:
+        redeemscript_size = len(inp.redeemscript)
+    else:
+        return None
+    sigs_required = inp.sigs_required or 1
+    key = (inp.script_type, inp.witness_type, redeemscript_size, sigs_required)
+    if key not in _INPUT_SIZE_ESTIMATES:
+        if inp.witness_type == 'legacy':
+            push_size = 1 if redeemscript_size < 76 else 2 if redeemscript_size < 256 else 3
+            script_size = 1 + sigs_required * _MAX_SIG_PUSH_SIZE + push_size + redeemscript_size
+            _INPUT_SIZE_ESTIMATES[key] = (len(int_to_varbyteint(script_size)) + script_size, 1)
+        else:
+            witness_size = len(int_to_varbyteint(sigs_required + 2)) + 1 + sigs_required * _MAX_SIG_PUSH_SIZE + \
+                len(int_to_varbyteint(redeemscript_size)) + redeemscript_size
+            _INPUT_SIZE_ESTIMATES[key] = (36 if inp.witness_type == 'p2sh-segwit' else 1, witness_size)
+    return _INPUT_SIZE_ESTIMATES[key]
+
+
+def _merkle_hash(tx_hash):
+    """
+    Convert transaction or merkle node hash as displayed (hexstring or bytes) to internal byte order
+
+    :param tx_hash: Transaction ID or node hash
+    :type tx_hash: str, bytes
+
+    :return bytes:
+    """
+
+    if not isinstance(tx_hash, bytes) or len(tx_hash) != 32:
+        tx_hash = to_bytes(tx_hash)
+    if len(tx_hash) != 32:
+        raise TransactionError("Merkle tree hash must be 32 bytes, found %d bytes" % len(tx_hash))
+    return tx_hash[::-1]
+
+
+def merkle_root(txids, as_hex=True):
+    """
+    Calculate merkle root of a list of transaction IDs, as used in the block header.
+
+    Hashes of each level are kept in a single byte buffer, so every pair is hashed from a 64 byte slice.
+
+    >>> merkle_root(['8c14f0db3df150123e6f3dbbf30f8b955a8249b62ac1d1ff16284aefa3d06d87',
+    ...              'fff2525b8931402dd09222c50775608f75787bd2b87e56995a7bdd30f79702c4',
+    ...              '6359f0868171b1d194cbee1af2f16ea598ae8fad666d9b012c8ed2b79a236ec4',
+    ...              'e9a66845e05d5abc0ad04ec80f774a7e585c6e8db975962d069a522137b80c1d'])
+    'f3e94742aca4b5ef85488dc37c06c3282295ffec960994b2c0d5ac2a25a95766'
+
+    :param txids: List of transaction IDs in block order
+    :type txids: list of str, bytes
+    :param as_hex: Return merkle root as hexadecimal string. Default is True
+    :type as_hex: bool
+
+    :return str, bytes:
+    """
+
+    if not txids:
+        raise TransactionError("Cannot calculate merkle root of empty transaction list")
+    level = b''.join([_merkle_hash(txid) for txid in txids])
+    n = len(txids)
+    while n > 1:
+        if n % 2:
+            level += level[-32:]
+            n += 1
+        level = b''.join([double_sha256(level[i:i + 64]) for i in range(0, n * 32, 64)])
+        n //= 2
+    root = level[::-1]
+    return to_hexstring(root) if as_hex else root
+
+
+def merkle_proof(txids, index):
+    """
+    Get merkle branch of transaction at position index in a list of transaction IDs. The branch can be checked
+    against the merkle root with :func:`verify_merkle_proofs_batch`.
+
+    :param txids: List of transaction IDs in block order
+    :type txids: list of str, bytes
+    :param index: Position of transaction in block
+    :type index: int
+
+    :return list of str: List of sibling hashes as hexadecimal strings, from leaf to root
+    """
+
+    if not 0 <= index < len(txids):
+        raise TransactionError("Transaction index %d not in list of %d transactions" % (index, len(txids)))
+    level = [_merkle_hash(txid) for txid in txids]
+    branch = []
+    while len(level) > 1:
+        if len(level) % 2:
+            level.append(level[-1])
+        branch.append(to_hexstring(level[index ^ 1][::-1]))
+        level = [double_sha256(level[i] + level[i + 1]) for i in range(0, len(level), 2)]
+        index //= 2
+    return branch
+
+
+def verify_merkle_proofs_batch(proofs, merkle_roots=None):
+    """
+    Verify a list of merkle proofs. Each proof is a tuple (txid, branch, index, merkle_root) with the merkle branch
+    and position of a transaction in a block, as returned by Electrum servers or :func:`merkle_proof`.
+
+    Intermediate hashes are shared between proofs, so proofs of transactions in the same block only hash each node
+    once.
+
+    Instead of a transaction ID a Transaction object can be specified. If merkle_root is None the root is looked up
+    in the merkle_roots dictionary by the block_hash of the transaction.
+
+    :param proofs: List of (txid, branch, index, merkle_root) tuples
+    :type proofs: list of tuple
+    :param merkle_roots: Dictionary with block hash as key and merkle root as value
+    :type merkle_roots: dict
+
+    :return list of bool: Verification result for each proof
+    """
+
+    merkle_roots = merkle_roots or {}
+    nodes = {}
+    results = []
+    for txid, branch, index, root in proofs:
+        if isinstance(txid, Transaction):
+            if root is None:
+                root = merkle_roots.get(txid.block_hash)
+            txid = txid.txid
+        if root is None:
+            results.append(False)
+            continue
+        node = _merkle_hash(txid)
+        for sibling in branch:
+            data = _merkle_hash(sibling) + node if index & 1 else node + _merkle_hash(sibling)
+            node = nodes.get(data)
+            if node is None:
+                node = nodes[data] = double_sha256(data)
+            index >>= 1
+        results.append(not index and node == _merkle_hash(root))
+    return results
+
+
 class Input(object):
     """
     Transaction Input class, used by Transaction class
@@ -585,8 +1055,22 @@ class Input(object):
     To spent the UTXO an unlocking script can be included to prove ownership.
     
     Inputs are verified by the Transaction class.
+
+    Assigning a new value to a field which is part of the serialized transaction clears the cached serialization
+    data of the transaction. Lists such as witnesses are not watched, so assign a new list instead of changing it in
+    place, i.e. use inp.witnesses = inp.witnesses + [item] instead of inp.witnesses.append(item).
     """
 
+    # Transaction this input belongs to, set by the Transaction class
+    _transaction = None
+    prev_hash = _SerializedField('prev_hash')
+    output_n = _SerializedField('output_n')
+    sequence = _SerializedField('sequence')
+    index_n = _SerializedField('index_n')
+    unlocking_script = _SerializedField('unlocking_script', signatures_only=True)
+    witnesses = _SerializedField('witnesses', signatures_only=True)
+    witness_type = _SerializedField('witness_type', signatures_only=True)
+
     def __init__(self, prev_hash, output_n, keys=None, signatures=None, public_hash=b'', unlocking_script=b'',
                  unlocking_script_unsigned=None, script_type=None, address='',
                  sequence=0xffffffff, compressed=None, sigs_required=None, sort=False, index_n=0,
@@ -762,6 +1246,7 @@ class Input(object):
             self.compressed = True
         if self.sort:
             self.keys.sort(key=lambda k: k.public_byte)
+        der_signatures = set([x.as_der_encoded() for x in self.signatures])
         for sig in signatures:
             if not isinstance(sig, Signature):
                 try:
@@ -769,10 +1254,67 @@ class Input(object):
                 except Exception as e:
                     _logger.error("Could not parse signature %s in Input. Error: %s" % (to_hexstring(sig), e))
                     continue
-            if sig.as_der_encoded() not in [x.as_der_encoded() for x in self.signatures]:
+            der_signature = sig.as_der_encoded()
+            if der_signature not in der_signatures:
+                der_signatures.add(der_signature)
                 self.signatures.append(sig)
         self.update_scripts()
 
+    # Attributes of lazy inputs which are read directly from the raw transaction
+    _LAZY_FIELDS = ('_prev_hash', '_output_n', 'output_n_int', '_unlocking_script', '_sequence', '_index_n', 'value',
+                    'network')
+
+    @classmethod
+    def _lazy_create(cls, prev_hash, output_n, unlocking_script=b'', witness_type=None, sequence=b'\xff\xff\xff\xff',
+                     index_n=0, network=DEFAULT_NETWORK):
+        """
+        Create an Input with only the fields read from a raw transaction. The unlocking script and witnesses are
+        parsed and keys and signatures are created when another attribute is accessed for the first time.
+
+        :return Input:
+        """
+
+        inp = cls.__new__(cls)
+        inp.prev_hash = prev_hash
+        inp.output_n = output_n
+        inp.output_n_int = struct.unpack('>I', output_n)[0]
+        inp.unlocking_script = unlocking_script
+        inp.sequence = struct.unpack('<I', sequence)[0]
+        inp.index_n = index_n
+        inp.value = 0
+        inp.network = network
+        inp._lazy = {'witness_type': witness_type, 'witnesses': None}
+        return inp
+
+    def __getattr__(self, name):
+        if name.startswith('__') or '_lazy' not in self.__dict__:
+            raise AttributeError("'%s' object has no attribute '%s'" % (self.__class__.__name__, name))
+        self._materialize()
+        return getattr(self, name)
+
+    def _materialize(self):
+        """
+        Parse scripts and witnesses of a lazy input created with :func:`_lazy_create`. Attributes set after creation
+        are kept. If parsing fails the input stays lazy, so the error is raised again on the next access.
+        """
+
+        state = dict(self.__dict__)
+        lazy = self.__dict__.pop('_lazy')
+        saved = dict([(k, v) for k, v in self.__dict__.items() if k not in self._LAZY_FIELDS])
+        # Parsing does not change the serialized fields, so keep the cache of the transaction
+        self.__dict__.pop('_transaction', None)
+        try:
+            self.__init__(self.prev_hash, self.output_n, unlocking_script=self.unlocking_script,
+                          witness_type=lazy['witness_type'], sequence=self.sequence, index_n=self.index_n,
+                          value=self.value, network=self.network)
+            if lazy['witnesses']:
+                self.__dict__.update(_input_add_witnesses(self, lazy['witnesses']).__dict__)
+        except Exception:
+            self.__dict__.clear()
+            self.__dict__.update(state)
+            raise
+        self.__dict__.update(saved)
+
     # TODO: Remove / replace?
     # def sequence_timelock_blocks(self, blocks):
     #     if blocks > SEQUENCE_LOCKTIME_MASK:
@@ -819,8 +1361,12 @@ class Input(object):
                                    script_type=self.script_type, witness_type=self.witness_type).address
             self.witnesses = []
             if self.signatures and self.keys:
-                self.witnesses = [self.signatures[0].as_der_encoded() + struct.pack('B', hash_type), self.keys[0].public_byte]
-                unlock_script = b''.join([bytes(varstr(w)) for w in self.witnesses])
+                items = [self.signatures[0].as_der_encoded() + struct.pack('B', hash_type), self.keys[0].public_byte]
+                # Only segwit inputs keep the signature and key as witnesses
+                if self.witness_type == 'legacy':
+                    unlock_script = b''.join([bytes(varstr(w)) for w in items])
+                else:
+                    self.witnesses = items
             if self.witness_type == 'p2sh-segwit':
                 self.unlocking_script = varstr(b'\0' + varstr(self.public_hash))
             elif self.witness_type == 'segwit':
@@ -946,6 +1492,11 @@ class Output(object):
     Contains the amount and destination of a transaction.
     """
 
+    # Transaction this output belongs to, set by the Transaction class
+    _transaction = None
+    value = _SerializedField('value')
+    lock_script = _SerializedField('lock_script')
+
     def __init__(self, value, address='', public_hash=b'', public_key=b'', lock_script=b'', spent=False,
                  output_n=0, script_type=None, encoding=None, network=DEFAULT_NETWORK):
         """
@@ -1080,6 +1631,52 @@ class Output(object):
         #     raise TransactionError("Output to %s must be more then dust amount %d" %
         #                            (self.address, self.network.dust_amount))
 
+    # Attributes of lazy outputs which are read directly from the raw transaction
+    _LAZY_FIELDS = ('_value', '_lock_script', 'output_n', 'network', 'spent')
+
+    @classmethod
+    def _lazy_create(cls, value, lock_script, output_n=0, network=DEFAULT_NETWORK):
+        """
+        Create an Output with only the value and locking script read from a raw transaction. The locking script is
+        parsed and the address is created when another attribute is accessed for the first time.
+
+        :return Output:
+        """
+
+        outp = cls.__new__(cls)
+        outp.value = value
+        outp.lock_script = lock_script
+        outp.output_n = output_n
+        outp.network = network
+        outp.spent = False
+        outp._lazy = {}
+        return outp
+
+    def __getattr__(self, name):
+        if name.startswith('__') or '_lazy' not in self.__dict__:
+            raise AttributeError("'%s' object has no attribute '%s'" % (self.__class__.__name__, name))
+        self._materialize()
+        return getattr(self, name)
+
+    def _materialize(self):
+        """
+        Parse locking script of a lazy output created with :func:`_lazy_create`. Attributes set after creation are
+        kept. If parsing fails the output stays lazy, so the error is raised again on the next access.
+        """
+
+        state = dict(self.__dict__)
+        del self.__dict__['_lazy']
+        saved = dict([(k, v) for k, v in self.__dict__.items() if k not in self._LAZY_FIELDS])
+        self.__dict__.pop('_transaction', None)
+        try:
+            self.__init__(self.value, lock_script=self.lock_script, spent=self.spent, output_n=self.output_n,
+                          network=self.network)
+        except Exception:
+            self.__dict__.clear()
+            self.__dict__.update(state)
+            raise
+        self.__dict__.update(saved)
+
     def as_dict(self):
         """
         Get transaction output information in json format
@@ -1102,6 +1699,23 @@ class Output(object):
         return "<Output(value=%d, address=%s, type=%s)>" % (self.value, self.address, self.script_type)
 
 
+def _transaction_import_raw_worker(args):
+    """
+    Parse a raw transaction in a worker process of :func:`Transaction.import_raw_many`
+
+    :param args: Tuple with raw transaction, network name and as_dict flag
+    :type args: tuple
+
+    :return Transaction, dict:
+    """
+
+    rawtx, network, as_dict = args
+    t = Transaction.import_raw(rawtx, network=network)
+    if as_dict:
+        return t.as_dict()
+    return t
+
+
 class Transaction(object):
     """
     Transaction Class
@@ -1118,23 +1732,79 @@ class Transaction(object):
     """
 
     @staticmethod
-    def import_raw(rawtx, network=DEFAULT_NETWORK):
+    def import_raw(rawtx, network=DEFAULT_NETWORK, lazy=False):
         """
         Import a raw transaction and create a Transaction object
         
         Uses the _transaction_deserialize method to parse the raw transaction and then calls the init method of
         this transaction class to create the transaction object
+
+        Use lazy=True if you only need values, previous outputs or the txid of many transactions: scripts, keys and
+        addresses of inputs and outputs are then parsed when they are accessed for the first time.
         
         :param rawtx: Raw transaction string
         :type rawtx: bytes, str
         :param network: Network, leave empty for default
         :type network: str, Network
+        :param lazy: Postpone parsing of scripts, keys and addresses until they are used. Default is False
+        :type lazy: bool
 
         :return Transaction:
         """
 
         rawtx = to_bytes(rawtx)
-        return _transaction_deserialize(rawtx, network=network)
+        return _transaction_deserialize(rawtx, network=network, lazy=lazy)
+
+    @staticmethod
+    def import_raw_many(rawtxs, network=DEFAULT_NETWORK, workers=None, as_dict=True, chunksize=50):
+        """
+        Import a list or iterator of raw transactions using a pool of worker processes.
+
+        Transactions are returned through a generator in the same order as the raw transactions. Raw transactions
+        are read from the iterator in batches, so memory usage stays bounded when importing large streams of
+        transactions.
+
+        By default workers return the compact dictionary of :func:`as_dict`. Unpickling these in the calling
+        process costs about a tenth of unpickling Transaction objects, which would otherwise take a large part of
+        the parsing time.
+
+        >>> for t in Transaction.import_raw_many(rawtxs, workers=4):  # doctest: +SKIP
+        ...     print(t['hash'])
+
+        :param rawtxs: List or iterator of raw transactions
+        :type rawtxs: list of bytes, str
+        :param network: Network, leave empty for default
+        :type network: str, Network
+        :param workers: Number of worker processes. Default is the number of CPU's, use 1 to parse in this process
+        :type workers: int
+        :param as_dict: Return transactions as dictionary, which is much cheaper to send back from worker processes. Default is True, use False to get Transaction objects
+        :type as_dict: bool
+        :param chunksize: Number of transactions sent to a worker at once
+        :type chunksize: int
+
+        :return Transaction, dict: Generator of Transaction objects or dictionaries
+        """
+
+        if isinstance(network, Network):
+            network = network.name
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+        tasks = ((rawtx, network, as_dict) for rawtx in rawtxs)
+        if workers <= 1:
+            for task in tasks:
+                yield _transaction_import_raw_worker(task)
+            return
+        pool = multiprocessing.Pool(workers)
+        try:
+            while True:
+                batch = list(islice(tasks, workers * chunksize * 4))
+                if not batch:
+                    break
+                for t in pool.imap(_transaction_import_raw_worker, batch, chunksize):
+                    yield t
+        finally:
+            pool.terminate()
+            pool.join()
 
     def __init__(self, inputs=None, outputs=None, locktime=0, version=1, network=DEFAULT_NETWORK,
                  fee=None, fee_per_kb=None, size=None, hash='', date=None, confirmations=None,
@@ -1193,8 +1863,7 @@ class Transaction(object):
         self.coinbase = coinbase
         self.inputs = []
         if inputs is not None:
-            for inp in inputs:
-                self.inputs.append(inp)
+            self.inputs.extend(inputs)
             if not input_total:
                 input_total = sum([i.value for i in inputs])
         id_list = [i.index_n for i in self.inputs]
@@ -1229,7 +1898,7 @@ class Transaction(object):
         self.fee = fee
         self.fee_per_kb = fee_per_kb
         self.size = size
-        self.vsize = size
+        self._vsize = None
         self.change = 0
         self.hash = hash
         self.date = date
@@ -1244,8 +1913,127 @@ class Transaction(object):
         self.witness_type = witness_type
         if self.witness_type not in ['legacy', 'segwit']:
             raise TransactionError("Please specify a valid witness type: legacy or segwit")
-        if not self.hash:
-            self.hash = to_hexstring(self.signature_hash()[::-1])
+
+    @property
+    def inputs(self):
+        return self._inputs
+
+    @inputs.setter
+    def inputs(self, value):
+        self._inputs = _TransactionItemList(value, self)
+        self._cache_clear()
+
+    @property
+    def outputs(self):
+        return self._outputs
+
+    @outputs.setter
+    def outputs(self, value):
+        self._outputs = _TransactionItemList(value, self)
+        self._cache_clear()
+
+    @property
+    def rawtx(self):
+        """
+        Raw transaction as provided when creating or importing this transaction, as hexadecimal string. It is stored
+        as bytes, which takes half the memory of a hexadecimal string.
+
+        :return str:
+        """
+        return to_hexstring(self._rawtx)
+
+    @rawtx.setter
+    def rawtx(self, value):
+        self._rawtx = to_bytes(value) if value else b''
+
+    def _cache_clear(self, signatures_only=False):
+        """
+        Clear cached serialization data such as the serialized transaction sections, transaction hashes and the
+        signature hash midstates. Called automatically when inputs or outputs are added, removed or replaced.
+
+        :param signatures_only: Only clear data which depends on unlocking scripts and witnesses, used after signing
+        :type signatures_only: bool
+        """
+        self._raw_sections_cache = None
+        self._tx_hashes = {}
+        self._size_estimates = {}
+        self._vsize = None
+        if not signatures_only:
+            self._sighash_midstates = {}
+            self._sighash_legacy_skeleton = None
+
+    @property
+    def hash(self):
+        """
+        Transaction hash as hexadecimal string. Returns the hash provided when creating the transaction or set
+        afterwards, otherwise the current txid.
+
+        :return str:
+        """
+        return self._hash if self._hash else self.txid
+
+    @hash.setter
+    def hash(self, value):
+        self._hash = value
+
+    @property
+    def txid(self):
+        """
+        Transaction ID: double SHA256 hash of the transaction serialized without witnesses, as hexadecimal string.
+
+        Calculated when requested and cached until inputs, outputs or signatures change.
+
+        :return str:
+        """
+        return self._serialized_hash('legacy')
+
+    @property
+    def wtxid(self):
+        """
+        Witness transaction ID as hexadecimal string: double SHA256 hash of the transaction including witnesses as
+        defined in BIP141. Equal to txid for legacy transactions.
+
+        :return str:
+        """
+        return self._serialized_hash(self.witness_type)
+
+    def _serialized_hash(self, witness_type):
+        key = (witness_type, self.version, self.locktime)
+        if key not in self._tx_hashes:
+            self._tx_hashes[key] = to_hexstring(double_sha256(self._raw_join(witness_type))[::-1])
+        return self._tx_hashes[key]
+
+    @property
+    def weight(self):
+        """
+        Transaction weight as defined in BIP141: size without witnesses * 3 + total size.
+
+        Calculated from the current serialization, so for unsigned transactions the weight of the signatures is not
+        included. Use the estimate_weight() method to estimate the weight of unsigned transactions.
+
+        :return int:
+        """
+        r_body, r_witness = self._raw_sections()
+        base_size = len(r_body) + 8
+        total_size = base_size
+        if self.witness_type == 'segwit':
+            total_size += 2 + len(r_witness)
+        return base_size * 3 + total_size
+
+    @property
+    def vsize(self):
+        """
+        Virtual transaction size: weight / 4 rounded up. Equal to the size for legacy transactions.
+
+        :return int:
+        """
+        if self._vsize is not None:
+            return self._vsize
+        return (self.weight + 3) // 4
+
+    @vsize.setter
+    def vsize(self, value):
+        self._vsize = value
 
     def __repr__(self):
         return "<Transaction(input_count=%d, output_count=%d, status=%s, network=%s)>" % \
@@ -1405,41 +2193,50 @@ class Transaction(object):
         else:
             raise TransactionError("Witness_type %s not supported" % self.witness_type)
 
-    def signature_segwit(self, sign_id, hash_type=SIGHASH_ALL):
+    def _signature_segwit_midstates(self, hash_type=SIGHASH_ALL):
         """
-        Serialize transaction signature for segregated witness transaction
+        Get the BIP143 hashPrevouts, hashSequence and hashOutputs values for this transaction.
+
+        These hashes are the same for every input, so they are calculated once per hash type and cached until the
+        inputs or outputs of this transaction are changed.
 
-        :param sign_id: Index of input to sign
-        :type sign_id: int
         :param hash_type: Specific hash type, default is SIGHASH_ALL
         :type hash_type: int
 
-        :return bytes: Segwit transaction signature
+        :return tuple: hash_prevouts, hash_sequence and hash_outputs as bytes
         """
-        assert(self.witness_type == 'segwit')
-        prevouts_serialized = b''
-        sequence_serialized = b''
-        outputs_serialized = b''
+        if hash_type in self._sighash_midstates:
+            return self._sighash_midstates[hash_type]
+
         hash_prevouts = b'\0' * 32
         hash_sequence = b'\0' * 32
         hash_outputs = b'\0' * 32
-
-        for i in self.inputs:
-            prevouts_serialized += i.prev_hash[::-1] + i.output_n[::-1]
-            sequence_serialized += struct.pack('<L', i.sequence)
         if not hash_type & SIGHASH_ANYONECANPAY:
-            hash_prevouts = double_sha256(prevouts_serialized)
+            hash_prevouts = double_sha256(b''.join([i.prev_hash[::-1] + i.output_n[::-1] for i in self.inputs]))
             if (hash_type & 0x1f) != SIGHASH_SINGLE and (hash_type & 0x1f) != SIGHASH_NONE:
-                hash_sequence = double_sha256(sequence_serialized)
+                hash_sequence = double_sha256(b''.join([struct.pack('<L', i.sequence) for i in self.inputs]))
         if (hash_type & 0x1f) != SIGHASH_SINGLE and (hash_type & 0x1f) != SIGHASH_NONE:
-            for o in self.outputs:
-                outputs_serialized += struct.pack('<Q', int(o.value))
-                outputs_serialized += varstr(o.lock_script)
-            hash_outputs = double_sha256(outputs_serialized)
-        elif (hash_type & 0x1f) != SIGHASH_SINGLE and sign_id < len(self.outputs):
-            outputs_serialized += struct.pack('<Q', int(self.outputs[sign_id].value))
-            outputs_serialized += varstr(self.outputs[sign_id].lock_script)
-            hash_outputs = double_sha256(outputs_serialized)
+            hash_outputs = double_sha256(b''.join([struct.pack('<Q', int(o.value)) + varstr(o.lock_script)
+                                                   for o in self.outputs]))
+        self._sighash_midstates[hash_type] = (hash_prevouts, hash_sequence, hash_outputs)
+        return self._sighash_midstates[hash_type]
+
+    def signature_segwit(self, sign_id, hash_type=SIGHASH_ALL):
+        """
+        Serialize transaction signature for segregated witness transaction
+
+        :param sign_id: Index of input to sign
+        :type sign_id: int
+        :param hash_type: Specific hash type, default is SIGHASH_ALL
+        :type hash_type: int
+
+        :return bytes: Segwit transaction signature
+        """
+        assert(self.witness_type == 'segwit')
+        hash_prevouts, hash_sequence, hash_outputs = self._signature_segwit_midstates(hash_type)
+        if (hash_type & 0x1f) == SIGHASH_NONE and sign_id < len(self.outputs):
+            hash_outputs = double_sha256(struct.pack('<Q', int(self.outputs[sign_id].value)) +
+                                         varstr(self.outputs[sign_id].lock_script))
 
         if not self.inputs[sign_id].value:
             raise TransactionError("Need value of input %d to create transaction signature, value can not be 0" %
@@ -1480,45 +2277,95 @@ class Transaction(object):
 
         if witness_type is None:
             witness_type = self.witness_type
+        if sign_id is not None:
+            return self._raw_sign_legacy(sign_id, hash_type)
 
-        r = self.version[::-1]
-        if sign_id is None and witness_type == 'segwit':
-            r += b'\x00'  # marker (BIP 141)
-            r += b'\x01'  # flag (BIP 141)
+        r = self._raw_join(witness_type)
+        if not (self.size and b'' in [i.unlocking_script for i in self.inputs]):
+            self.size = len(r)
+        return r
+
+    def _raw_join(self, witness_type):
+        r_body, r_witness = self._raw_sections()
+        if witness_type == 'segwit':
+            return b''.join([self.version[::-1], b'\x00\x01', r_body, r_witness, struct.pack('<L', self.locktime)])
+        return b''.join([self.version[::-1], r_body, struct.pack('<L', self.locktime)])
+
+    def _raw_sections(self):
+        """
+        Serialize the inputs and outputs section and the witness section of this transaction. Both are stored in a
+        list of parts and joined once, and the result is cached until the inputs, outputs or signatures change.
 
-        r += int_to_varbyteint(len(self.inputs))
-        r_witness = b''
+        The complete raw transaction is the version, optionally the segwit marker and flag, both sections and the
+        locktime.
+
+        :return tuple: Serialized inputs and outputs, serialized witnesses
+        """
+        if self._raw_sections_cache is not None:
+            return self._raw_sections_cache
+
+        r = [int_to_varbyteint(len(self.inputs))]
+        r_witness = []
         for i in self.inputs:
-            r += i.prev_hash[::-1] + i.output_n[::-1]
+            r += [i.prev_hash[::-1], i.output_n[::-1], varstr(i.unlocking_script), struct.pack('<L', i.sequence)]
             if i.witnesses and i.witness_type != 'legacy':
-                r_witness += int_to_varbyteint(len(i.witnesses)) + b''.join([bytes(varstr(w)) for w in i.witnesses])
-            else:
-                r_witness += b'\0'
-            if sign_id is None:
-                r += varstr(i.unlocking_script)
-            elif sign_id == i.index_n:
-                r += varstr(i.unlocking_script_unsigned)
+                r_witness.append(int_to_varbyteint(len(i.witnesses)))
+                r_witness += [varstr(w) for w in i.witnesses]
             else:
-                r += b'\0'
-            r += struct.pack('<L', i.sequence)
+                r_witness.append(b'\0')
+        r.append(int_to_varbyteint(len(self.outputs)))
+        for o in self.outputs:
+            if o.value < 0:
+                raise TransactionError("Output value < 0 not allowed")
+            r += [struct.pack('<Q', int(o.value)), varstr(o.lock_script)]
+        self._raw_sections_cache = (b''.join(r), b''.join(r_witness))
+        return self._raw_sections_cache
+
+    def _raw_sign_legacy_skeleton(self):
+        """
+        Serialize the parts of a legacy signature hash preimage which are the same for every input: the inputs with
+        empty scripts and the outputs. The result is cached until inputs or outputs are changed.
 
-        r += int_to_varbyteint(len(self.outputs))
+        :return tuple: Serialized inputs, serialized outputs and a dictionary with script byte positions and list indexes per input index_n
+        """
+        if self._sighash_legacy_skeleton is not None:
+            return self._sighash_legacy_skeleton
+
+        r_inputs = [int_to_varbyteint(len(self.inputs))]
+        script_positions = {}
+        pos = len(r_inputs[0])
+        for n, i in enumerate(self.inputs):
+            r_inputs.append(i.prev_hash[::-1] + i.output_n[::-1] + b'\0' + struct.pack('<L', i.sequence))
+            script_positions.setdefault(i.index_n, []).append((pos + 36, n))
+            pos += 41
+        r_outputs = [int_to_varbyteint(len(self.outputs))]
         for o in self.outputs:
             if o.value < 0:
                 raise TransactionError("Output value < 0 not allowed")
-            r += struct.pack('<Q', int(o.value))
-            r += varstr(o.lock_script)
+            r_outputs.append(struct.pack('<Q', int(o.value)) + varstr(o.lock_script))
+        self._sighash_legacy_skeleton = (b''.join(r_inputs), b''.join(r_outputs), script_positions)
+        return self._sighash_legacy_skeleton
 
-        if sign_id is None and witness_type == 'segwit':
-            r += r_witness
+    def _raw_sign_legacy(self, sign_id, hash_type=SIGHASH_ALL):
+        """
+        Serialize transaction for a legacy signature of input with index sign_id. Uses the cached serialized inputs
+        and outputs and only inserts the unsigned unlocking script of the input to sign.
 
-        r += struct.pack('<L', self.locktime)
-        if sign_id is not None:
-            r += struct.pack('<L', hash_type)
-        else:
-            if not (self.size and b'' in [i.unlocking_script for i in self.inputs]):
-                self.size = len(r)
-        return r
+        :param sign_id: Index of input to sign
+        :type sign_id: int
+        :param hash_type: Specific hash type, default is SIGHASH_ALL
+        :type hash_type: int
+
+        :return bytes:
+        """
+        r_inputs, r_outputs, script_positions = self._raw_sign_legacy_skeleton()
+        parts = [self.version[::-1]]
+        cursor = 0
+        for pos, n in script_positions.get(sign_id, []):
+            parts += [r_inputs[cursor:pos], varstr(self.inputs[n].unlocking_script_unsigned)]
+            cursor = pos + 1
+        parts += [r_inputs[cursor:], r_outputs, struct.pack('<L', self.locktime), struct.pack('<L', hash_type)]
+        return b''.join(parts)
 
     def raw_hex(self, sign_id=None, hash_type=SIGHASH_ALL, witness_type=None):
         """
@@ -1582,6 +2429,23 @@ class Transaction(object):
         self.verified = True
         return True
 
+    def verify_merkle_proof(self, branch, index, merkle_root):
+        """
+        Verify if this transaction is included in the block with given merkle root, i.e. the block with
+        this transaction's block_hash.
+
+        :param branch: Merkle branch: list of sibling hashes from leaf to root
+        :type branch: list of str, bytes
+        :param index: Position of transaction in block
+        :type index: int
+        :param merkle_root: Merkle root from block header
+        :type merkle_root: str, bytes
+
+        :return bool:
+        """
+
+        return verify_merkle_proofs_batch([(self.txid, branch, index, merkle_root)])[0]
+
     def sign(self, keys=None, tid=None, multisig_key_n=None, hash_type=SIGHASH_ALL):
         """
         Sign the transaction input with provided private key
@@ -1665,6 +2529,7 @@ class Transaction(object):
             self.inputs[tid].signatures = [s for s in sig_domain if s != '']
 
         self.inputs[tid].update_scripts(hash_type)
+        self._cache_clear(signatures_only=True)
 
     def add_input(self, prev_hash, output_n, keys=None, signatures=None, public_hash=b'', unlocking_script=b'',
                   unlocking_script_unsigned=None, script_type=None, address='',
@@ -1793,6 +2658,11 @@ class Transaction(object):
         :return int: Estimated transaction size
         """
 
+        key = ('size', add_change_output, self.witness_type)
+        if key in self._size_estimates:
+            self.size, vsize = self._size_estimates[key]
+            return vsize
+
         # if self.input_total and self.output_total + self.fee == self.input_total:
         #     add_change_output = False
         est_size = 10
@@ -1845,24 +2715,81 @@ class Transaction(object):
             else:
                 est_size += 33 if is_multisig else 23
         self.size = est_size
-        self.vsize = est_size
         if self.witness_type == 'legacy':
-            return est_size
+            vsize = est_size
         else:
-            self.vsize = math.ceil(((est_size-witness_size) * 3 + est_size) / 4)
-            return self.vsize
+            vsize = math.ceil(((est_size-witness_size) * 3 + est_size) / 4)
+        self._size_estimates[key] = (est_size, vsize)
+        return vsize
+
+    def estimate_weight(self, add_change_output=False):
+        """
+        Get weight of this transaction as defined in BIP141, with the worst case size of the signatures of unsigned
+        inputs included.
+
+        Starts with the exact weight of the current serialization. For every input without enough signatures the
+        size of the current unlocking script and witnesses is replaced by the size from a table of worst case sizes
+        per script type. For a fully signed transaction the result is equal to the weight property.
+
+        The result is cached until inputs, outputs or signatures change, so it can be called repeatedly while
+        selecting inputs and calculating fees. Use (weight + 3) // 4 to get the virtual size.
+
+        :param add_change_output: Assume an extra change output will be created but has not been created yet.
+        :type add_change_output: bool
+
+        :return int: Estimated transaction weight
+        """
+
+        key = ('weight', add_change_output, self.witness_type)
+        if key in self._size_estimates:
+            return self._size_estimates[key]
+
+        segwit = self.witness_type == 'segwit'
+        weight = self.weight
+        for inp in self.inputs:
+            if inp.signatures and len(inp.signatures) >= (inp.sigs_required or 1):
+                continue
+            estimate = _input_size_estimate(inp)
+            if estimate is None:
+                if inp.unlocking_script or inp.witnesses:
+                    continue
+                raise TransactionError("Unknown input script type %s cannot estimate transaction weight" %
+                                       inp.script_type)
+            script_size, witness_size = estimate
+            weight += (script_size - len(varstr(inp.unlocking_script))) * 4
+            if segwit:
+                if inp.witnesses and inp.witness_type != 'legacy':
+                    witness_size -= len(int_to_varbyteint(len(inp.witnesses))) + \
+                        sum([len(varstr(w)) for w in inp.witnesses])
+                else:
+                    witness_size -= 1
+                weight += witness_size
+        if not self.inputs:
+            # If nothing is known assume 1 p2pkh or p2wpkh input
+            script_size, witness_size = _INPUT_SIZE_ESTIMATES[('sig_pubkey', self.witness_type, True)]
+            weight += (40 + script_size) * 4 + (witness_size if segwit else 0)
+        if add_change_output:
+            witness_type = self.inputs[0].witness_type if self.inputs else self.witness_type
+            is_multisig = bool(self.inputs) and self.inputs[0].script_type == 'p2sh_multisig'
+            lock_script_size = _CHANGE_LOCK_SCRIPT_SIZES[(witness_type, is_multisig)]
+            n_outputs = len(self.outputs)
+            weight += (8 + 1 + lock_script_size + len(int_to_varbyteint(n_outputs + 1)) -
+                       len(int_to_varbyteint(n_outputs))) * 4
+        self._size_estimates[key] = weight
+        return weight
 
     def calculate_fee(self):
         """
-        Get fee for this transaction in smallest denominator (i.e. Satoshi) based on its size and the
-        transaction.fee_per_kb value
+        Get fee for this transaction in smallest denominator (i.e. Satoshi) based on its estimated virtual size and
+        the transaction.fee_per_kb value
 
         :return int: Estimated transaction fee
         """
 
         if not self.fee_per_kb:
             raise TransactionError("Cannot calculate transaction fees: transaction.fee_per_kb is not set")
-        return int(self.estimate_size()/1024.0 * self.fee_per_kb)
+        vsize = (self.estimate_weight() + 3) // 4
+        return int(vsize / 1024.0 * self.fee_per_kb)
 
     def update_totals(self):
         """
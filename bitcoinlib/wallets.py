@@ -21,9 +21,9 @@ import json
 import numbers
 import random
 import warnings
-from itertools import groupby
-from operator import itemgetter
+from bisect import bisect_left, bisect_right
 
+from bitcoinlib.coinselection import COIN_SELECTION_STRATEGIES, input_size, output_size
 from bitcoinlib.db import *
 from bitcoinlib.encoding import EncodingError, to_bytes, to_hexstring
 from bitcoinlib.keys import Address, BKeyError, HDKey, check_network_and_key, path_expand
@@ -33,6 +33,7 @@ from bitcoinlib.services.services import Service
 from bitcoinlib.transactions import (Input, Output, Transaction, get_unlocking_script_type,
                                      serialize_multisig_redeemscript)
 from sqlalchemy import func, or_
+from sqlalchemy.orm import joinedload
 
 _logger = logging.getLogger(__name__)
 
@@ -184,6 +185,7 @@ def wallet_delete(wallet, db_uri=None, force=False):
 
     # Delete transactions from this wallet (remove wallet_id)
     session.query(DbTransaction).filter_by(wallet_id=wallet_id).update({DbTransaction.wallet_id: None})
+    session.query(DbBalance).filter_by(wallet_id=wallet_id).delete()
 
     res = w.delete()
     session.commit()
@@ -227,6 +229,7 @@ def wallet_empty(wallet, db_uri=None):
 
     # Delete transactions from this wallet (remove wallet_id)
     session.query(DbTransaction).filter_by(wallet_id=wallet_id).update({DbTransaction.wallet_id: None})
+    session.query(DbBalance).filter_by(wallet_id=wallet_id).delete()
 
     session.commit()
     session.close()
@@ -601,11 +604,14 @@ class HDWalletTransaction(Transaction):
         self.pushed = False
         self.error = None
         self.response_dict = None
+        outgoing_tx = kwargs.pop('outgoing_tx', None)
         witness_type = 'legacy'
         if hdwallet.witness_type in ['segwit', 'p2sh-segwit']:
             witness_type = 'segwit'
         Transaction.__init__(self, witness_type=witness_type, *args, **kwargs)
-        self.outgoing_tx = bool([i.address for i in self.inputs if i.address in hdwallet.addresslist()])
+        if outgoing_tx is None:
+            outgoing_tx = any([i.address in hdwallet._address_set() for i in self.inputs])
+        self.outgoing_tx = outgoing_tx
 
     def __repr__(self):
         return "<HDWalletTransaction(input_count=%d, output_count=%d, status=%s, network=%s)>" % \
@@ -641,68 +647,176 @@ class HDWalletTransaction(Transaction):
 
         :return HDWalletClass:
 
+        """
+        wts = cls.from_txids(hdwallet, [txid])
+        return wts[0] if wts else None
+
+    @classmethod
+    def from_txids(cls, hdwallet, txids):
+        """
+        Read list of transactions from database with given transaction IDs / transaction hashes.
+
+        Transactions, inputs, outputs and the wallet keys they refer to are read with a few queries for the whole
+        list, instead of separate queries for every transaction, input and output.
+
+        :param hdwallet: HDWallet object
+        :type hdwallet: HDWallet
+        :param txids: List of transaction hashes as hexadecimal strings
+        :type txids: list of str
+
+        :return list of HDWalletTransaction: Transactions in order of the txids list, unknown transactions are skipped
         """
         sess = hdwallet._session
-        # If tx_hash is unknown add it to database, else update
-        db_tx_query = sess.query(DbTransaction). \
-            filter(DbTransaction.wallet_id == hdwallet.wallet_id, DbTransaction.hash == txid)
-        db_tx = db_tx_query.scalar()
-        if not db_tx:
-            return
+        db_txs = {}
+        for i in range(0, len(txids), 500):
+            qr = sess.query(DbTransaction).\
+                filter(DbTransaction.wallet_id == hdwallet.wallet_id, DbTransaction.hash.in_(txids[i:i + 500]))
+            db_txs.update(dict([(db_tx.hash, db_tx) for db_tx in qr.all()]))
+        if not db_txs:
+            return []
+
+        tx_ids = [db_tx.id for db_tx in db_txs.values()]
+        db_inputs = {}
+        db_outputs = {}
+        for i in range(0, len(tx_ids), 500):
+            for inp in sess.query(DbTransactionInput).\
+                    filter(DbTransactionInput.transaction_id.in_(tx_ids[i:i + 500])).\
+                    order_by(DbTransactionInput.index_n).all():
+                db_inputs.setdefault(inp.transaction_id, []).append(inp)
+            for out in sess.query(DbTransactionOutput).\
+                    filter(DbTransactionOutput.transaction_id.in_(tx_ids[i:i + 500])).\
+                    order_by(DbTransactionOutput.output_n).all():
+                db_outputs.setdefault(out.transaction_id, []).append(out)
+
+        key_ids = set([inp.key_id for inps in db_inputs.values() for inp in inps if inp.key_id] +
+                      [out.key_id for outs in db_outputs.values() for out in outs if out.key_id])
+        key_ids = list(key_ids)
+        db_keys = {}
+        for i in range(0, len(key_ids), 500):
+            qr = sess.query(DbKey).filter(DbKey.wallet_id == hdwallet.wallet_id, DbKey.id.in_(key_ids[i:i + 500]))
+            if hdwallet.purpose:
+                qr = qr.filter(DbKey.purpose == hdwallet.purpose)
+            qr = qr.options(joinedload(DbKey.multisig_children).joinedload(DbKeyMultisigChildren.child_key))
+            db_keys.update(dict([(db_key.id, db_key) for db_key in qr.all()]))
+        for key_id in key_ids:
+            if key_id not in db_keys:
+                raise WalletError("Key '%s' not found" % key_id)
+
+        hdkeys = {}
+
+        def _key_object(key_id):
+            # HDKey object or list of public keys for multisig keys, created once per key
+            if key_id not in hdkeys:
+                db_key = db_keys[key_id]
+                if db_key.key_type == 'multisig':
+                    hdkeys[key_id] = [ck.child_key.public for ck in db_key.multisig_children]
+                elif db_key.wif:
+                    hdkeys[key_id] = HDKey(import_key=db_key.wif, network=db_key.network_name)
+                else:
+                    hdkeys[key_id] = None
+            return hdkeys[key_id]
+
+        networks = {hdwallet.network.name: hdwallet.network}
+        wts = []
+        for txid in txids:
+            db_tx = db_txs.get(txid)
+            if db_tx is None:
+                continue
+            fee_per_kb = None
+            if db_tx.fee and db_tx.size:
+                fee_per_kb = int((db_tx.fee / db_tx.size) * 1024)
+            if db_tx.network_name not in networks:
+                networks[db_tx.network_name] = Network(db_tx.network_name)
+            network = networks[db_tx.network_name]
+
+            inputs = []
+            for inp in db_inputs.get(db_tx.id, []):
+                sequence = 0xffffffff
+                if inp.sequence:
+                    sequence = inp.sequence
+                inp_keys = []
+                if inp.key_id:
+                    inp_keys = _key_object(inp.key_id)
+                    if isinstance(inp_keys, list):
+                        # Input adds the keys of the unlocking script to this list, so do not pass the shared list
+                        inp_keys = list(inp_keys)
+                inputs.append(Input(
+                    prev_hash=inp.prev_hash, output_n=inp.output_n, keys=inp_keys, unlocking_script=inp.script,
+                    script_type=inp.script_type, sequence=sequence, index_n=inp.index_n, value=inp.value,
+                    double_spend=inp.double_spend, witness_type=inp.witness_type, network=network))
+            # TODO / FIXME: Field in Input object, but not in database:
+            # def __init__(signatures=None, public_hash=b'',
+            #              unlocking_script_unsigned=None, compressed=None, sigs_required=None, sort=False,
+            #              locktime_cltv=None, locktime_csv=None, key_path='',
+            #              encoding=None, network=DEFAULT_NETWORK):
+
+            outputs = []
+            for out in db_outputs.get(db_tx.id, []):
+                address = ''
+                public_key = b''
+                if out.key_id:
+                    address = db_keys[out.key_id].address
+                    hdkey = _key_object(out.key_id)
+                    if db_keys[out.key_id].key_type != 'multisig' and hdkey and not isinstance(hdkey, Address):
+                        public_key = hdkey.public_hex
+                outputs.append(Output(value=out.value, address=address, public_key=public_key,
+                                      lock_script=out.script, spent=out.spent, output_n=out.output_n,
+                                      script_type=out.script_type, network=network))
+
+            # TODO / FIXME: Field in Output object, but not in database:
+            # def __init__(address, public_hex, public_hash=b'', encoding=None, network=DEFAULT_NETWORK):
+
+            wts.append(cls(hdwallet=hdwallet, inputs=inputs, outputs=outputs, locktime=db_tx.locktime,
+                           version=db_tx.version, network=network, fee=db_tx.fee, fee_per_kb=fee_per_kb,
+                           size=db_tx.size, hash=txid, date=db_tx.date, confirmations=db_tx.confirmations,
+                           block_height=db_tx.block_height, block_hash=db_tx.block_hash,
+                           input_total=db_tx.input_total, output_total=db_tx.output_total, rawtx=db_tx.raw,
+                           status=db_tx.status, coinbase=db_tx.coinbase, verified=db_tx.verified))  # flag=db_tx.flag
+        return wts
+
+    @classmethod
+    def from_cache(cls, hdwallet, db_tx):
+        """
+        Create HDWalletTransaction object from the compact transaction record in the cache field of a database
+        transaction. Inputs and outputs are created from the raw transaction and are only parsed when used, no
+        other database records are read.
+
+        Records are only available for confirmed and unconfirmed transactions saved with the :func:`save` method.
+        Use :func:`from_txid` to read a transaction with the wallet keys of the inputs, for instance to sign it.
+
+        :param hdwallet: HDWallet object
+        :type hdwallet: HDWallet
+        :param db_tx: Database transaction or query result with the DbTransaction fields
+        :type db_tx: DbTransaction
+
+        :return HDWalletTransaction:
+        """
+        cache = transaction_cache_deserialize(db_tx.cache)
+        if cache is None:
+            return cls.from_txid(hdwallet, db_tx.hash)
+        rawtx, inputs_info, outputs_info = cache
+        network = hdwallet.network if db_tx.network_name == hdwallet.network.name else Network(db_tx.network_name)
+        t = Transaction.import_raw(rawtx, network=network, lazy=True)
+        for inp, (_, value, double_spend) in zip(t.inputs, inputs_info):
+            inp.value = value
+            if double_spend:
+                inp.double_spend = True
+        for outp, (key_id, spent) in zip(t.outputs, outputs_info):
+            outp.key_id = key_id
+            outp.spent = spent
 
         fee_per_kb = None
         if db_tx.fee and db_tx.size:
             fee_per_kb = int((db_tx.fee / db_tx.size) * 1024)
-        network = Network(db_tx.network_name)
-
-        inputs = []
-        for inp in db_tx.inputs:
-            sequence = 0xffffffff
-            if inp.sequence:
-                sequence = inp.sequence
-            inp_keys = []
-            if inp.key_id:
-                key = hdwallet.key(inp.key_id)
-                if key.key_type == 'multisig':
-                    db_key = sess.query(DbKey).filter_by(id=key.key_id).scalar()
-                    for ck in db_key.multisig_children:
-                        inp_keys.append(ck.child_key.public)
-
-                else:
-                    inp_keys = key.key()
-            inputs.append(Input(
-                prev_hash=inp.prev_hash, output_n=inp.output_n, keys=inp_keys, unlocking_script=inp.script,
-                script_type=inp.script_type, sequence=sequence, index_n=inp.index_n, value=inp.value,
-                double_spend=inp.double_spend, witness_type=inp.witness_type, network=network))
-        # TODO / FIXME: Field in Input object, but not in database:
-        # def __init__(signatures=None, public_hash=b'',
-        #              unlocking_script_unsigned=None, compressed=None, sigs_required=None, sort=False,
-        #              locktime_cltv=None, locktime_csv=None, key_path='',
-        #              encoding=None, network=DEFAULT_NETWORK):
-
-        outputs = []
-        for out in db_tx.outputs:
-            address = ''
-            public_key = b''
-            if out.key_id:
-                key = hdwallet.key(out.key_id)
-                address = key.address
-                if key.key_type != 'multisig':
-                    if key.key() and not isinstance(key.key(), Address):
-                        public_key = key.key().public_hex
-            outputs.append(Output(value=out.value, address=address, public_key=public_key,
-                                  lock_script=out.script, spent=out.spent, output_n=out.output_n,
-                                  script_type=out.script_type, network=network))
-
-        # TODO / FIXME: Field in Output object, but not in database:
-        # def __init__(address, public_hex, public_hash=b'', encoding=None, network=DEFAULT_NETWORK):
-
-        return cls(hdwallet=hdwallet, inputs=inputs, outputs=outputs, locktime=db_tx.locktime,
-                   version=db_tx.version, network=network, fee=db_tx.fee, fee_per_kb=fee_per_kb,
-                   size=db_tx.size, hash=txid, date=db_tx.date, confirmations=db_tx.confirmations,
-                   block_height=db_tx.block_height, block_hash=db_tx.block_hash, input_total=db_tx.input_total,
-                   output_total=db_tx.output_total, rawtx=db_tx.raw, status=db_tx.status, coinbase=db_tx.coinbase,
-                   verified=db_tx.verified)  # flag=db_tx.flag
+        wt = cls(hdwallet=hdwallet, inputs=t.inputs, outputs=t.outputs, locktime=t.locktime, version=t.version,
+                 network=network, fee=db_tx.fee, fee_per_kb=fee_per_kb, size=db_tx.size, hash=db_tx.hash,
+                 date=db_tx.date, confirmations=db_tx.confirmations, block_height=db_tx.block_height,
+                 block_hash=db_tx.block_hash, input_total=db_tx.input_total, output_total=db_tx.output_total,
+                 rawtx=db_tx.raw, status=db_tx.status, coinbase=db_tx.coinbase, verified=db_tx.verified,
+                 outgoing_tx=any([key_id for key_id, _, _ in inputs_info]))
+        if wt.witness_type == t.witness_type:
+            wt._raw_sections_cache = t._raw_sections_cache
+        return wt
 
     def sign(self, keys=None, index_n=0, multisig_key_n=None, hash_type=SIGHASH_ALL):
         """
@@ -791,7 +905,9 @@ class HDWalletTransaction(Transaction):
                     u.spent = True
 
             self.hdwallet._session.commit()
-            self.hdwallet._balance_update(network=self.network.name)
+            self.hdwallet._utxo_index_remove([(to_hexstring(inp.prev_hash), inp.output_n_int)
+                                              for inp in self.inputs])
+            self.hdwallet._balances_load()
             return None
         self.error = "Transaction not send, unknown response from service providers"
 
@@ -802,86 +918,7 @@ class HDWalletTransaction(Transaction):
         :return int: Transaction ID
         """
 
-        sess = self.hdwallet._session
-        # If tx_hash is unknown add it to database, else update
-        db_tx_query = sess.query(DbTransaction). \
-            filter(DbTransaction.wallet_id == self.hdwallet.wallet_id, DbTransaction.hash == self.hash)
-        db_tx = db_tx_query.scalar()
-        if not db_tx:
-            db_tx_query = sess.query(DbTransaction). \
-                filter(DbTransaction.wallet_id.is_(None), DbTransaction.hash == self.hash)
-            db_tx = db_tx_query.first()
-            if db_tx:
-                db_tx.wallet_id = self.hdwallet.wallet_id
-
-        if not db_tx:
-            new_tx = DbTransaction(
-                wallet_id=self.hdwallet.wallet_id, hash=self.hash, block_height=self.block_height,
-                size=self.size, confirmations=self.confirmations, date=self.date, fee=self.fee, status=self.status,
-                input_total=self.input_total, output_total=self.output_total, network_name=self.network.name,
-                block_hash=self.block_hash, raw=self.rawtx, verified=self.verified)
-            sess.add(new_tx)
-            sess.commit()
-            tx_id = new_tx.id
-        else:
-            tx_id = db_tx.id
-            db_tx.block_height = self.block_height if self.block_height else db_tx.block_height
-            db_tx.confirmations = self.confirmations if self.confirmations else db_tx.confirmations
-            db_tx.date = self.date if self.date else db_tx.date
-            db_tx.fee = self.fee if self.fee else db_tx.fee
-            db_tx.status = self.status if self.status else db_tx.status
-            db_tx.input_total = self.input_total if self.input_total else db_tx.input_total
-            db_tx.output_total = self.output_total if self.output_total else db_tx.output_total
-            db_tx.network_name = self.network.name if self.network.name else db_tx.name
-            db_tx.raw = self.rawtx if self.rawtx else db_tx.raw
-            db_tx.verified = self.verified
-            sess.commit()
-
-        assert tx_id
-        for ti in self.inputs:
-            tx_key = sess.query(DbKey).filter_by(wallet_id=self.hdwallet.wallet_id, address=ti.address).scalar()
-            key_id = None
-            if tx_key:
-                key_id = tx_key.id
-                tx_key.used = True
-            tx_input = sess.query(DbTransactionInput). \
-                filter_by(transaction_id=tx_id, index_n=ti.index_n).scalar()
-            if not tx_input:
-                new_tx_item = DbTransactionInput(
-                    transaction_id=tx_id, output_n=ti.output_n_int, key_id=key_id, value=ti.value,
-                    prev_hash=to_hexstring(ti.prev_hash), index_n=ti.index_n, double_spend=ti.double_spend,
-                    script=to_hexstring(ti.unlocking_script), script_type=ti.script_type)
-                sess.add(new_tx_item)
-            elif key_id:
-                tx_input.key_id = key_id
-                if ti.value:
-                    tx_input.value = ti.value
-                if ti.prev_hash:
-                    tx_input.prev_hash = to_hexstring(ti.prev_hash)
-                if ti.unlocking_script:
-                    tx_input.script = to_hexstring(ti.unlocking_script)
-
-            sess.commit()
-        for to in self.outputs:
-            tx_key = sess.query(DbKey).\
-                filter_by(wallet_id=self.hdwallet.wallet_id, address=to.address).scalar()
-            key_id = None
-            if tx_key:
-                key_id = tx_key.id
-                tx_key.used = True
-            spent = to.spent
-            tx_output = sess.query(DbTransactionOutput). \
-                filter_by(transaction_id=tx_id, output_n=to.output_n).scalar()
-            if not tx_output:
-                new_tx_item = DbTransactionOutput(
-                    transaction_id=tx_id, output_n=to.output_n, key_id=key_id, value=to.value, spent=spent,
-                    script=to_hexstring(to.lock_script), script_type=to.script_type)
-                sess.add(new_tx_item)
-            elif key_id:
-                tx_output.key_id = key_id
-                tx_output.spent = spent if spent is not None else tx_output.spent
-            sess.commit()
-        return tx_id
+        return self.hdwallet.transactions_save_many([self])[0]
 
     def info(self):
         """
@@ -908,7 +945,7 @@ class HDWalletTransaction(Transaction):
         :return list:
         """
         mut_list = []
-        wlt_addresslist = self.hdwallet.addresslist()
+        wlt_addresslist = self.hdwallet._address_set()
         if self.outgoing_tx:
             for o in self.outputs:
                 if o.address in wlt_addresslist and skip_change:
@@ -1285,6 +1322,8 @@ class HDWallet(object):
             self.scheme = db_wlt.scheme
             self._balance = None
             self._balances = []
+            self._utxo_indexes = {}
+            self._addresses = None
             self.main_key_id = db_wlt.main_key_id
             self.main_key = None
             self._default_account_id = db_wlt.default_account_id
@@ -1321,6 +1360,7 @@ class HDWallet(object):
                     self.depth_public_master = self.key_path.index(hardened_keys[-1])
                 self.key_depth = len(self.key_path) - 1
             self.last_updated = None
+            self._balances_load()
         else:
             raise WalletError("Wallet '%s' not found, please specify correct wallet ID or name." % wallet)
 
@@ -1525,6 +1565,7 @@ class HDWallet(object):
             account_id=account_id, purpose=self.purpose, key_type='bip32', witness_type=self.witness_type)
         self.main_key_id = self.main_key.key_id
         self._key_objects.update({self.main_key_id: self.main_key})
+        self._addresses = None
         self._session.query(DbWallet).filter(DbWallet.id == self.wallet_id).\
             update({DbWallet.main_key_id: self.main_key_id})
 
@@ -1605,6 +1646,7 @@ class HDWallet(object):
                 account_id=account_id, purpose=purpose, session=self._session, path=ik_path,
                 witness_type=self.witness_type)
             self._key_objects.update({mk.key_id: mk})
+            self._addresses = None
             if mk.key_id == self.main_key.key_id:
                 self.main_key = mk
             return mk
@@ -1643,6 +1685,7 @@ class HDWallet(object):
             key_type='multisig', network_name=network)
         self._session.add(multisig_key)
         self._session.commit()
+        self._addresses = None
         for child_id in public_key_ids:
             self._session.add(DbKeyMultisigChildren(key_order=public_key_ids.index(child_id), parent_id=multisig_key.id,
                                                     child_id=int(child_id)))
@@ -1765,13 +1808,14 @@ class HDWallet(object):
         # Update already known transactions
         srv = Service(network=network, providers=self.providers)
         current_block_height = srv.blockcount()
-        for t in self.transactions(account_id=account_id, network=network):
+        known_txs = self.transactions(account_id=account_id, network=network)
+        for t in known_txs:
             if not t.block_height or t.block_height <= 0 or not t.confirmations:
                 new_t = srv.gettransaction(t.hash)
                 t.block_height = new_t.block_height
             if t.block_height:
                 t.confirmations = current_block_height - t.block_height
-            t.save()
+        self.transactions_save_many(known_txs)
 
         # Scan each key address, stop when no new transactions are found after set scan gap limit
         if change is None:
@@ -2061,6 +2105,7 @@ class HDWallet(object):
                                           encoding=self.encoding, witness_type=self.witness_type,
                                           cosigner_id=cosigner_id, network=network, session=self._session)
                 self._key_objects.update({nk.key_id: nk})
+                self._addresses = None
                 parent_id = nk.key_id
             return nk
 
@@ -2274,6 +2319,19 @@ class HDWallet(object):
             addresslist.append(key.address)
         return addresslist
 
+    def _address_set(self):
+        """
+        Get addresses of this wallet as returned by addresslist() with default arguments. The set is cached and reset
+        when keys are added to this wallet, so checking if an address belongs to this wallet does not need a
+        database query.
+
+        :return frozenset: Set of address strings
+        """
+        if self._addresses is None:
+            self._addresses = frozenset([address for address, in self._session.query(DbKey.address).
+                                        filter(DbKey.wallet_id == self.wallet_id, DbKey.depth == self.key_depth)])
+        return self._addresses
+
     def key(self, term):
         """
         Return single key with given ID or name as HDWalletKey object
@@ -2433,6 +2491,9 @@ class HDWallet(object):
         """
         Get total of unspent outputs
 
+        Balances are kept up to date when unspent outputs are added or spent, so this is a single read from the
+        balance ledger. Use balance_ledger_check() to verify the ledger.
+
         :param account_id: Account ID filter
         :type account_id: int
         :param network: Network name. Leave empty for default network
@@ -2443,21 +2504,76 @@ class HDWallet(object):
         :return float, str: Key balance
         """
 
-        self._balance_update(account_id, network)
         network, account_id, _ = self._get_account_defaults(network, account_id)
 
-        balance = 0
-        b_res = [b['balance'] for b in self._balances if b['account_id'] == account_id and b['network'] == network]
-        if len(b_res):
-            balance = b_res[0]
+        balance = self._session.query(DbBalance.balance).\
+            filter_by(wallet_id=self.wallet_id, network_name=network, account_id=account_id).scalar() or 0
         if as_string:
             return Network(network).print_value(balance)
         else:
             return float(balance)
 
+    def _balances_load(self):
+        """
+        Read balances per network and account of this wallet from the balance ledger. The ledger is built from the
+        unspent outputs in the database if it is missing, for instance for wallets created with an older version.
+
+        :return list: List of balances as dictionary with network, account_id and balance
+        """
+        db_balances = self._session.query(DbBalance).filter_by(wallet_id=self.wallet_id).\
+            order_by(DbBalance.network_name, DbBalance.account_id).all()
+        if not db_balances and self._session.query(DbTransactionOutput).join(DbTransaction).join(DbKey).\
+                filter(DbTransactionOutput.spent.is_(False), DbTransaction.wallet_id == self.wallet_id).first():
+            return self._balance_update()
+        self._balances = [{'network': b.network_name, 'account_id': b.account_id, 'balance': b.balance}
+                          for b in db_balances]
+        self._balance = sum([b['balance'] for b in self._balances if b['network'] == self.network.name])
+        return self._balances
+
+    def _balances_calculate(self, account_id=None, network=None, key_id=None, min_confirms=0):
+        """
+        Calculate balances of keys and per network and account from the unspent outputs in the database.
+
+        With min_confirms=0 outputs of transactions with an unknown number of confirmations (NULL) are included, like
+        in the balance ledger which is updated when outputs are added or spent.
+
+        :param account_id: Account ID filter
+        :type account_id: int
+        :param network: Network name filter
+        :type network: str
+        :param key_id: Key ID Filter
+        :type key_id: int
+        :param min_confirms: Minimal confirmations needed to include in balance
+        :type min_confirms: int
+
+        :return tuple: Dictionary with balance per key ID and dictionary with balance per (network, account_id)
+        """
+        qr = self._session.query(DbTransactionOutput.key_id, func.sum(DbTransactionOutput.value), DbKey.network_name,
+                                 DbKey.account_id).\
+            join(DbTransaction).join(DbKey). \
+            filter(DbTransactionOutput.spent.is_(False),
+                   DbTransaction.wallet_id == self.wallet_id)
+        if min_confirms:
+            qr = qr.filter(DbTransaction.confirmations >= min_confirms)
+        if account_id is not None:
+            qr = qr.filter(DbKey.account_id == account_id)
+        if network is not None:
+            qr = qr.filter(DbKey.network_name == network)
+        if key_id is not None:
+            qr = qr.filter(DbKey.id == key_id)
+        key_balances = {}
+        nw_acc_balances = {}
+        for kb_key_id, kb_balance, kb_network, kb_account_id in \
+                qr.group_by(DbTransactionOutput.key_id, DbKey.network_name, DbKey.account_id):
+            key_balances[kb_key_id] = kb_balance
+            nw_acc_balances.setdefault((kb_network, kb_account_id), 0)
+            nw_acc_balances[(kb_network, kb_account_id)] += kb_balance
+        return key_balances, nw_acc_balances
+
     def _balance_update(self, account_id=None, network=None, key_id=None, min_confirms=0):
         """
-        Update balance from UTXO's in database. To get most recent balance update UTXO's first.
+        Rebuild balances from UTXO's in database. Balances are normally updated when unspent outputs are added or
+        spent, so this is only needed to repair the balance ledger. To get most recent balance update UTXO's first.
 
         Also updates balance of wallet and keys in this wallet for the specified account or all accounts if
         no account is specified.
@@ -2474,77 +2590,74 @@ class HDWallet(object):
         :return: Updated balance
         """
 
-        qr = self._session.query(DbTransactionOutput, func.sum(DbTransactionOutput.value), DbKey.network_name,
-                                 DbKey.account_id).\
-            join(DbTransaction).join(DbKey). \
-            filter(DbTransactionOutput.spent.is_(False),
-                   DbTransaction.wallet_id == self.wallet_id,
-                   DbTransaction.confirmations >= min_confirms)
+        key_balances, nw_acc_balances = self._balances_calculate(account_id, network, key_id, min_confirms)
+        key_balance_list = [{'id': kid, 'balance': balance} for kid, balance in key_balances.items()]
+
+        # Set balance of keys with no UTXO's to 0
+        utxo_key_ids = self._session.query(DbTransactionOutput.key_id).join(DbTransaction).\
+            filter(DbTransactionOutput.spent.is_(False), DbTransactionOutput.key_id.isnot(None),
+                   DbTransaction.wallet_id == self.wallet_id)
+        if min_confirms:
+            utxo_key_ids = utxo_key_ids.filter(DbTransaction.confirmations >= min_confirms)
+        utxo_key_ids = utxo_key_ids.subquery()
+        qr = self._session.query(DbKey).\
+            filter(DbKey.wallet_id == self.wallet_id, DbKey.balance != 0, DbKey.id.notin_(utxo_key_ids))
         if account_id is not None:
             qr = qr.filter(DbKey.account_id == account_id)
+            if self.scheme == 'bip32':
+                qr = qr.filter(DbKey.depth >= 3)
         if network is not None:
             qr = qr.filter(DbKey.network_name == network)
         if key_id is not None:
             qr = qr.filter(DbKey.id == key_id)
-        utxos = qr.group_by(
-            DbTransactionOutput.key_id,
-            DbTransactionOutput.transaction_id,
-            DbTransactionOutput.output_n,
-            DbKey.network_name,
-            DbKey.account_id
-        ).all()
-
-        key_values = [
-            {
-                'id': utxo[0].key_id,
-                'network': utxo[2],
-                'account_id': utxo[3],
-                'balance': utxo[1]
-            }
-            for utxo in utxos
-        ]
-
-        grouper = itemgetter("id", "network", "account_id")
-        key_balance_list = []
-        for key, grp in groupby(sorted(key_values, key=grouper), grouper):
-            nw_acc_dict = dict(zip(["id", "network", "account_id"], key))
-            nw_acc_dict["balance"] = sum(item["balance"] for item in grp)
-            key_balance_list.append(nw_acc_dict)
-
-        grouper = itemgetter("network", "account_id")
-        balance_list = []
-        for key, grp in groupby(sorted(key_balance_list, key=grouper), grouper):
-            nw_acc_dict = dict(zip(["network", "account_id"], key))
-            nw_acc_dict["balance"] = sum(item["balance"] for item in grp)
-            balance_list.append(nw_acc_dict)
-
-        # Add keys with no UTXO's with 0 balance
-        for key in self.keys(account_id=account_id, network=network, key_id=key_id):
-            if key.id not in [utxo[0].key_id for utxo in utxos]:
-                key_balance_list.append({
-                    'id': key.id,
-                    'network': network,
-                    'account_id': key.account_id,
-                    'balance': 0
-                })
+        qr.update({DbKey.balance: 0}, synchronize_session=False)
 
+        # Replace balances per network and account in ledger
         if not key_id:
-            for bl in balance_list:
-                bl_item = [b for b in self._balances if
-                           b['network'] == bl['network'] and b['account_id'] == bl['account_id']]
-                if not bl_item:
-                    self._balances.append(bl)
-                    continue
-                lx = self._balances.index(bl_item[0])
-                self._balances[lx].update(bl)
-
-        self._balance = sum([b['balance'] for b in balance_list if b['network'] == self.network.name])
+            qr = self._session.query(DbBalance).filter(DbBalance.wallet_id == self.wallet_id)
+            if account_id is not None:
+                qr = qr.filter(DbBalance.account_id == account_id)
+            if network is not None:
+                qr = qr.filter(DbBalance.network_name == network)
+            qr.delete(synchronize_session='fetch')
+            for (nw, acc), balance in nw_acc_balances.items():
+                self._session.add(DbBalance(wallet_id=self.wallet_id, network_name=nw, account_id=acc,
+                                            balance=balance))
 
         # Bulk update database
         self._session.bulk_update_mappings(DbKey, key_balance_list)
         self._session.commit()
         _logger.info("Got balance for %d key(s)" % len(key_balance_list))
-        return self._balances
+        return self._balances_load()
+
+    def balance_ledger_check(self, fix=False):
+        """
+        Check if the balances of the keys of this wallet and the balances per network and account, which are updated
+        when unspent outputs are added or spent, still match the unspent outputs in the database.
+
+        :param fix: Rebuild the balance ledger from the unspent outputs if differences are found. Default is False
+        :type fix: bool
+
+        :return list: List of differences as dictionaries with 'key_id' or 'network' and 'account_id', the 'balance' in the ledger and the 'expected' balance. Empty list if ledger is correct.
+        """
+        key_balances, nw_acc_balances = self._balances_calculate()
+        differences = []
+        for kid, balance in self._session.query(DbKey.id, DbKey.balance).filter(DbKey.wallet_id == self.wallet_id).\
+                order_by(DbKey.id):
+            if (balance or 0) != key_balances.get(kid, 0):
+                differences.append({'key_id': kid, 'balance': balance, 'expected': key_balances.get(kid, 0)})
+        ledger = {}
+        for b in self._session.query(DbBalance).filter_by(wallet_id=self.wallet_id):
+            ledger[(b.network_name, b.account_id)] = b.balance
+        for nw_acc in list(ledger.keys()) + [k for k in nw_acc_balances if k not in ledger]:
+            if (ledger.get(nw_acc) or 0) != nw_acc_balances.get(nw_acc, 0):
+                differences.append({'network': nw_acc[0], 'account_id': nw_acc[1], 'balance': ledger.get(nw_acc),
+                                    'expected': nw_acc_balances.get(nw_acc, 0)})
+        if differences:
+            _logger.warning("Balance ledger of wallet %s differs from unspent outputs: %s" % (self.name, differences))
+            if fix:
+                self._balance_update()
+        return differences
 
     def utxos_update(self, account_id=None, used=None, networks=None, key_id=None, depth=None, change=None,
                      utxos=None, update_balance=True, max_utxos=MAX_TRANSACTIONS, rescan_all=True):
@@ -2601,19 +2714,9 @@ class HDWallet(object):
         elif len(networks) != 1 and utxos is not None:
             raise WalletError("Please specify maximum 1 network when passing utxo's")
 
-        # Remove current UTXO's
-        if rescan_all:
-            cur_utxos = self._session.query(DbTransactionOutput).\
-                join(DbTransaction).join(DbKey). \
-                filter(DbTransactionOutput.spent.is_(False),
-                       DbKey.account_id == account_id,
-                       DbTransaction.wallet_id == self.wallet_id).all()
-            for u in cur_utxos:
-                self._session.query(DbTransactionOutput).filter_by(
-                    transaction_id=u.transaction_id, output_n=u.output_n).update({DbTransactionOutput.spent: True})
-            self._session.commit()
-
-        count_utxos = 0
+        # Get UTXO's for all networks and accounts first, fetching keys and addresses closes the session
+        rescan_account_id = account_id
+        account_utxos = []
         for network in networks:
             if account_id is None and not self.multisig:
                 accounts = self.accounts(network=network)
@@ -2628,27 +2731,37 @@ class HDWallet(object):
                                                    change=change, depth=depth)
                     random.shuffle(addresslist)
                     srv = Service(network=network, providers=self.providers)
+                    after_txids = None
+                    if not rescan_all:
+                        after_txids = [self.utxo_last(address) for address in addresslist]
                     utxos = []
-                    for address in addresslist:
-                        if rescan_all:
-                            last_txid = ''
-                        else:
-                            last_txid = self.utxo_last(address)
-                        utxos += srv.getutxos(address, after_txid=last_txid, max_txs=max_utxos)
-                        if utxos is False:
+                    for address_utxos in srv.getutxos_many(addresslist, after_txids, max_txs=max_utxos):
+                        if address_utxos is False:
                             raise WalletError("No response from any service provider, could not update UTXO's. "
                                               "Errors: %s" % srv.errors)
+                        utxos += address_utxos
                     if srv.complete:
                         self.last_updated = datetime.datetime.now()
                     elif utxos and 'date' in utxos[-1:][0]:
                         self.last_updated = utxos[-1:][0]['date']
+                account_utxos.append((network, account_id, utxos))
+                utxos = None
+
+        # Update database in one transaction, so all UTXO's are restored when the update fails. Other connections
+        # may see uncommitted changes, as the database engine uses the READ UNCOMMITTED isolation level, so outputs
+        # which are spent since the last update are marked at the end instead of removing all UTXO's first
+        count_utxos = 0
+        try:
+            if key_id:
+                single_key = self._session.query(DbKey).filter_by(id=key_id).scalar()
+            for network, account_id, utxos in account_utxos:
+                # Load known keys, transactions, outputs and spending inputs at once and compare in memory
+                keys, db_txs, db_outputs, spent_outputs = self._utxos_known(utxos)
+                script_type = script_type_default(self.witness_type, multisig=self.multisig, locking_script=True)
 
                 # If UTXO is new, add to database otherwise update depth (confirmation count)
                 for utxo in utxos:
-                    key = single_key
-                    if not single_key:
-                        key = self._session.query(DbKey).\
-                            filter_by(wallet_id=self.wallet_id, address=utxo['address']).scalar()
+                    key = single_key or keys.get(utxo['address'])
                     if not key:
                         raise WalletError("Key with address %s not found in this wallet" % utxo['address'])
                     key.used = True
@@ -2657,60 +2770,118 @@ class HDWallet(object):
                         status = 'confirmed'
 
                     # Update confirmations in db if utxo was already imported
-                    transaction_in_db = self._session.query(DbTransaction).\
-                        filter_by(wallet_id=self.wallet_id, hash=utxo['tx_hash'], network_name=self.network.name)
-                    utxo_in_db = self._session.query(DbTransactionOutput).join(DbTransaction).\
-                        filter(DbTransaction.wallet_id == self.wallet_id,
-                               DbTransaction.hash == utxo['tx_hash'],
-                               DbTransactionOutput.output_n == utxo['output_n'])
-                    spent_in_db = self._session.query(DbTransactionInput).join(DbTransaction).\
-                        filter(DbTransaction.wallet_id == self.wallet_id,
-                               DbTransactionInput.prev_hash == utxo['tx_hash'],
-                               DbTransactionInput.output_n == utxo['output_n'])
-                    if utxo_in_db.count():
-                        utxo_record = utxo_in_db.scalar()
+                    transaction_record = db_txs.get(utxo['tx_hash'])
+                    utxo_record = db_outputs.get((utxo['tx_hash'], utxo['output_n']))
+                    spent = (utxo['tx_hash'], utxo['output_n']) in spent_outputs
+                    if utxo_record is not None:
                         if not utxo_record.key_id:
                             count_utxos += 1
                         utxo_record.key_id = key.id
-                        utxo_record.spent = bool(spent_in_db.count())
-                        if transaction_in_db.count():
-                            transaction_record = transaction_in_db.scalar()
+                        utxo_record.spent = spent
+                        if transaction_record is not None:
                             transaction_record.confirmations = utxo['confirmations']
                             transaction_record.status = status
                     else:
                         # Add transaction if not exist and then add output
-                        if not transaction_in_db.count():
-                            block_height = None
-                            if block_height in utxo and utxo['block_height']:
-                                block_height = utxo['block_height']
-                            new_tx = DbTransaction(wallet_id=self.wallet_id, hash=utxo['tx_hash'], status=status,
-                                                   block_height=block_height,
-                                                   confirmations=utxo['confirmations'], network_name=self.network.name)
-                            self._session.add(new_tx)
-                            self._session.commit()
-                            tid = new_tx.id
-                        else:
-                            tid = transaction_in_db.scalar().id
-
-                        script_type = script_type_default(self.witness_type, multisig=self.multisig,
-                                                          locking_script=True)
-                        new_utxo = DbTransactionOutput(transaction_id=tid,  output_n=utxo['output_n'],
+                        if transaction_record is None:
+                            transaction_record = DbTransaction(
+                                wallet_id=self.wallet_id, hash=utxo['tx_hash'], status=status,
+                                block_height=utxo.get('block_height') or None, confirmations=utxo['confirmations'],
+                                network_name=self.network.name)
+                            self._session.add(transaction_record)
+                            db_txs[utxo['tx_hash']] = transaction_record
+                        new_utxo = DbTransactionOutput(transaction=transaction_record, output_n=utxo['output_n'],
                                                        value=utxo['value'], key_id=key.id,
                                                        script=to_hexstring(utxo['script']),
-                                                       script_type=script_type,
-                                                       spent=bool(spent_in_db.count()))
+                                                       script_type=script_type, spent=spent)
                         self._session.add(new_utxo)
+                        db_outputs[(utxo['tx_hash'], utxo['output_n'])] = new_utxo
                         count_utxos += 1
 
-                    self._session.commit()
-
                 _logger.info("Got %d new UTXOs for account %s" % (count_utxos, account_id))
-                self._session.commit()
-                if update_balance:
-                    self._balance_update(account_id=account_id, network=network, key_id=key_id, min_confirms=0)
-                utxos = None
+            if rescan_all:
+                self._utxos_mark_spent(rescan_account_id, [utxo for _, _, utxos in account_utxos for utxo in utxos])
+            self._session.commit()
+        except Exception:
+            self._session.rollback()
+            raise
+        # UTXO's and their confirmations are reconciled in bulk, so reload index of unspent outputs when needed
+        self._utxo_indexes = {}
+
+        if update_balance:
+            self._balances_load()
         return count_utxos
 
+    def _utxos_mark_spent(self, account_id, utxos):
+        """
+        Mark unspent outputs of given account which are not in the given list of UTXO's as spent. Used by
+        utxos_update() to remove outputs which are spent since the last update, changes are not committed.
+
+        Outputs which are still unspent are not touched, and the spent outputs are updated as database objects in the
+        same flush as the new UTXO's. So other connections never see a wallet with all outputs spent and the balance
+        ledger and transaction cache are updated by the flush hooks.
+
+        :param account_id: Account ID
+        :type account_id: int
+        :param utxos: List of current unspent outputs in dictionary format as used by utxos_update()
+        :type utxos: list of dict
+
+        :return int: Number of outputs marked as spent
+        """
+        current = set([(utxo['tx_hash'], utxo['output_n']) for utxo in utxos])
+        with self._session.no_autoflush:
+            qr = self._session.query(DbTransactionOutput.transaction_id, DbTransactionOutput.output_n,
+                                     DbTransaction.hash).\
+                join(DbTransaction).join(DbKey, DbTransactionOutput.key_id == DbKey.id).\
+                filter(DbTransactionOutput.spent.is_(False), DbTransaction.wallet_id == self.wallet_id,
+                       DbKey.wallet_id == self.wallet_id, DbKey.account_id == account_id)
+            spent_outputs = set([(tx_id, output_n) for tx_id, output_n, tx_hash in qr
+                                 if (tx_hash, output_n) not in current])
+            tx_ids = list(set([tx_id for tx_id, _ in spent_outputs]))
+            for i in range(0, len(tx_ids), 500):
+                for output in self._session.query(DbTransactionOutput).\
+                        filter(DbTransactionOutput.transaction_id.in_(tx_ids[i:i + 500]),
+                               DbTransactionOutput.spent.is_(False)):
+                    if (output.transaction_id, output.output_n) in spent_outputs:
+                        output.spent = True
+        return len(spent_outputs)
+
+    def _utxos_known(self, utxos):
+        """
+        Load keys, transactions, outputs and spending inputs from the database related to given list of UTXO's with a
+        few IN queries, so utxos_update() can compare them in memory.
+
+        :param utxos: List of unspent outputs in dictionary format as used by utxos_update()
+        :type utxos: list of dict
+
+        :return tuple: Dictionary with keys by address, transactions by hash, outputs by (hash, output_n) and set of (hash, output_n) of spent outputs
+        """
+        addresses = list(set([u['address'] for u in utxos]))
+        tx_hashes = list(set([u['tx_hash'] for u in utxos]))
+        keys = {}
+        db_txs = {}
+        db_outputs = {}
+        spent_outputs = set()
+        for i in range(0, len(addresses), 500):
+            for key in self._session.query(DbKey).\
+                    filter(DbKey.wallet_id == self.wallet_id, DbKey.address.in_(addresses[i:i + 500])):
+                keys[key.address] = key
+        for i in range(0, len(tx_hashes), 500):
+            chunk = tx_hashes[i:i + 500]
+            for db_tx in self._session.query(DbTransaction).\
+                    filter(DbTransaction.wallet_id == self.wallet_id, DbTransaction.hash.in_(chunk),
+                           DbTransaction.network_name == self.network.name):
+                db_txs[db_tx.hash] = db_tx
+            for db_output, tx_hash in self._session.query(DbTransactionOutput, DbTransaction.hash).\
+                    join(DbTransaction).filter(DbTransaction.wallet_id == self.wallet_id,
+                                               DbTransaction.hash.in_(chunk)):
+                db_outputs[(tx_hash, db_output.output_n)] = db_output
+            for prev_hash, output_n in self._session.query(DbTransactionInput.prev_hash, DbTransactionInput.output_n).\
+                    join(DbTransaction).filter(DbTransaction.wallet_id == self.wallet_id,
+                                               DbTransactionInput.prev_hash.in_(chunk)):
+                spent_outputs.add((prev_hash, output_n))
+        return keys, db_txs, db_outputs, spent_outputs
+
     def utxos(self, account_id=None, network=None, min_confirms=0, key_id=None):
         """
         Get UTXO's (Unspent Outputs) from database. Use utxos_update method first for updated values
@@ -2825,9 +2996,9 @@ class HDWallet(object):
 
         # TODO: Avoid duplicate code in this method and transaction_update()
         utxo_set = set()
-        for t in txs:
-            wt = HDWalletTransaction.from_transaction(self, t)
-            wt.save()
+        wts = [HDWalletTransaction.from_transaction(self, t) for t in txs]
+        self.transactions_save_many(wts)
+        for wt in wts:
             utxos = [(to_hexstring(ti.prev_hash), ti.output_n_int) for ti in wt.inputs]
             utxo_set.update(utxos)
 
@@ -2838,8 +3009,146 @@ class HDWallet(object):
             for u in tos:
                 u.spent = True
         self._session.commit()
+        self._utxo_index_remove(utxo_set)
         # self._balance_update(account_id=account_id, network=network, key_id=key_id)
 
+    def transactions_save_many(self, txs):
+        """
+        Save a list of wallet transactions to the database. Existing transactions, inputs, outputs and the keys of all
+        addresses are loaded with a few IN queries and all changes are committed at once, which is a lot faster than
+        calling HDWalletTransaction.save() for each transaction.
+
+        :param txs: List of wallet transactions
+        :type txs: list of HDWalletTransaction
+
+        :return list of int: Database IDs of the transactions
+        """
+        sess = self._session
+        tx_hashes = list(set([t.hash for t in txs]))
+        addresses = list(set([i.address for t in txs for i in t.inputs + t.outputs if i.address]))
+        db_txs = {}
+        keys = {}
+        db_inputs = {}
+        db_outputs = {}
+        for i in range(0, len(tx_hashes), 500):
+            for db_tx in sess.query(DbTransaction).\
+                    filter(DbTransaction.wallet_id == self.wallet_id, DbTransaction.hash.in_(tx_hashes[i:i + 500])):
+                db_txs[db_tx.hash] = db_tx
+        unknown_hashes = [h for h in tx_hashes if h not in db_txs]
+        for i in range(0, len(unknown_hashes), 500):
+            for db_tx in sess.query(DbTransaction).\
+                    filter(DbTransaction.wallet_id.is_(None), DbTransaction.hash.in_(unknown_hashes[i:i + 500])):
+                if db_tx.hash not in db_txs:
+                    db_tx.wallet_id = self.wallet_id
+                    db_txs[db_tx.hash] = db_tx
+        for i in range(0, len(addresses), 500):
+            for key in sess.query(DbKey).\
+                    filter(DbKey.wallet_id == self.wallet_id, DbKey.address.in_(addresses[i:i + 500])):
+                keys[key.address] = key
+        tx_ids = dict([(db_tx.id, tx_hash) for tx_hash, db_tx in db_txs.items()])
+        tx_id_list = list(tx_ids.keys())
+        for i in range(0, len(tx_id_list), 500):
+            for tx_input in sess.query(DbTransactionInput).\
+                    filter(DbTransactionInput.transaction_id.in_(tx_id_list[i:i + 500])):
+                db_inputs[(tx_ids[tx_input.transaction_id], tx_input.index_n)] = tx_input
+            for tx_output in sess.query(DbTransactionOutput).\
+                    filter(DbTransactionOutput.transaction_id.in_(tx_id_list[i:i + 500])):
+                db_outputs[(tx_ids[tx_output.transaction_id], tx_output.output_n)] = tx_output
+
+        caches = []
+        index_utxos = []
+        index_spent = []
+        for t in txs:
+            # If tx_hash is unknown add it to database, else update
+            db_tx = db_txs.get(t.hash)
+            if not db_tx:
+                db_tx = DbTransaction(
+                    wallet_id=self.wallet_id, hash=t.hash, block_height=t.block_height, size=t.size,
+                    confirmations=t.confirmations, date=t.date, fee=t.fee, status=t.status,
+                    input_total=t.input_total, output_total=t.output_total, network_name=t.network.name,
+                    block_hash=t.block_hash, raw=t.rawtx, verified=t.verified)
+                sess.add(db_tx)
+                db_txs[t.hash] = db_tx
+            else:
+                db_tx.block_height = t.block_height if t.block_height else db_tx.block_height
+                db_tx.confirmations = t.confirmations if t.confirmations else db_tx.confirmations
+                db_tx.date = t.date if t.date else db_tx.date
+                db_tx.fee = t.fee if t.fee else db_tx.fee
+                db_tx.status = t.status if t.status else db_tx.status
+                db_tx.input_total = t.input_total if t.input_total else db_tx.input_total
+                db_tx.output_total = t.output_total if t.output_total else db_tx.output_total
+                db_tx.network_name = t.network.name if t.network.name else db_tx.network_name
+                db_tx.raw = t.rawtx if t.rawtx else db_tx.raw
+                db_tx.verified = t.verified
+
+            cache_inputs = []
+            cache_outputs = []
+            for ti in t.inputs:
+                tx_key = keys.get(ti.address)
+                key_id = None
+                if tx_key:
+                    key_id = tx_key.id
+                    tx_key.used = True
+                tx_input = db_inputs.get((t.hash, ti.index_n))
+                if not tx_input:
+                    tx_input = DbTransactionInput(
+                        transaction=db_tx, output_n=ti.output_n_int, key_id=key_id, value=ti.value,
+                        prev_hash=to_hexstring(ti.prev_hash), index_n=ti.index_n, double_spend=ti.double_spend,
+                        script=to_hexstring(ti.unlocking_script), script_type=ti.script_type)
+                    sess.add(tx_input)
+                    db_inputs[(t.hash, ti.index_n)] = tx_input
+                elif key_id:
+                    tx_input.key_id = key_id
+                    if ti.value:
+                        tx_input.value = ti.value
+                    if ti.prev_hash:
+                        tx_input.prev_hash = to_hexstring(ti.prev_hash)
+                    if ti.unlocking_script:
+                        tx_input.script = to_hexstring(ti.unlocking_script)
+                cache_inputs.append((tx_input.key_id, tx_input.value, tx_input.double_spend))
+            for to in t.outputs:
+                tx_key = keys.get(to.address)
+                key_id = None
+                if tx_key:
+                    key_id = tx_key.id
+                    tx_key.used = True
+                tx_output = db_outputs.get((t.hash, to.output_n))
+                if not tx_output:
+                    tx_output = DbTransactionOutput(
+                        transaction=db_tx, output_n=to.output_n, key_id=key_id, value=to.value, spent=to.spent,
+                        script=to_hexstring(to.lock_script), script_type=to.script_type)
+                    sess.add(tx_output)
+                    db_outputs[(t.hash, to.output_n)] = tx_output
+                elif key_id:
+                    tx_output.key_id = key_id
+                    tx_output.spent = to.spent if to.spent is not None else tx_output.spent
+                cache_outputs.append((tx_output.key_id, tx_output.spent))
+                if tx_key and tx_key.public:
+                    if tx_output.spent:
+                        index_spent.append((t.hash, to.output_n))
+                    else:
+                        index_utxos.append((tx_key.network_name, tx_key.account_id, {
+                            'tx_hash': t.hash, 'output_n': to.output_n, 'value': tx_output.value,
+                            'key_id': key_id, 'script_type': tx_output.script_type,
+                            'confirmations': db_tx.confirmations}))
+
+            # Store compact record of complete transactions to list them without reading inputs and outputs
+            cache = None
+            if t.status in ['confirmed', 'unconfirmed'] and t.txid == t.hash:
+                cache = transaction_cache_serialize(t.raw(), cache_inputs, cache_outputs)
+            caches.append((db_tx, cache))
+
+        # Set records after inputs and outputs are written, so they are not updated again when flushing
+        sess.flush()
+        tx_ids = []
+        for db_tx, cache in caches:
+            db_tx.cache = cache
+            tx_ids.append(db_tx.id)
+        sess.commit()
+        self._utxo_index_remove(index_spent)
+        self._utxo_index_add(index_utxos)
+        return tx_ids
+
     def transactions_update(self, account_id=None, used=None, network=None, key_id=None, depth=None, change=None,
                             max_txs=MAX_TRANSACTIONS):
         """
@@ -2873,35 +3182,41 @@ class HDWallet(object):
         # Update number of confirmations for already known blocks
         blockcount = srv.blockcount()
         # FIXME: this calls a lot of methods...
+        known_txs = []
         for t in self.transactions():
             if t.block_height:
                 t.confirmations = blockcount - t.block_height
                 t.status = 'confirmed'
-                t.save()
+                known_txs.append(t)
+        self.transactions_save_many(known_txs)
 
         # Get transactions for wallet's addresses
         txs = []
         addresslist = self.addresslist(
             account_id=account_id, used=used, network=network, key_id=key_id, change=change, depth=depth)
+        after_txids = [self.transaction_last(address) for address in addresslist]
         last_updated = datetime.datetime.now()
-        for address in addresslist:
-            txs += srv.gettransactions(address, max_txs=max_txs, after_txid=self.transaction_last(address))
-            if not srv.complete:
-                if txs and txs[-1].date < last_updated:
-                    last_updated = txs[-1].date
-            if txs and txs[-1].confirmations:
-                dbkey = self._session.query(DbKey).filter(DbKey.address == address, DbKey.wallet_id == self.wallet_id)
-                if not dbkey.update({DbKey.latest_txid: txs[-1].hash}):
-                    raise WalletError("Failed to update latest transaction id for key with address %s" % address)
-                self._session.commit()
-        if txs is False:
-            raise WalletError("No response from any service provider, could not update transactions")
+        latest_txids = []
+        address_txs_list = srv.gettransactions_many(addresslist, after_txids, max_txs=max_txs)
+        for address, address_txs in zip(addresslist, address_txs_list):
+            if address_txs is False:
+                raise WalletError("No response from any service provider, could not update transactions")
+            txs += address_txs
+            if len(address_txs) == max_txs and address_txs[-1].date < last_updated:
+                last_updated = address_txs[-1].date
+            if address_txs and address_txs[-1].confirmations:
+                latest_txids.append((address, address_txs[-1].hash))
+        for address, latest_txid in latest_txids:
+            dbkey = self._session.query(DbKey).filter(DbKey.address == address, DbKey.wallet_id == self.wallet_id)
+            if not dbkey.update({DbKey.latest_txid: latest_txid}):
+                raise WalletError("Failed to update latest transaction id for key with address %s" % address)
+        self._session.commit()
 
         # Update Transaction outputs to get list of unspent outputs (UTXO's)
         utxo_set = set()
-        for t in txs:
-            wt = HDWalletTransaction.from_transaction(self, t)
-            wt.save()
+        wts = [HDWalletTransaction.from_transaction(self, t) for t in txs]
+        self.transactions_save_many(wts)
+        for wt in wts:
             utxos = [(to_hexstring(ti.prev_hash), ti.output_n_int) for ti in wt.inputs]
             utxo_set.update(utxos)
         for utxo in list(utxo_set):
@@ -2913,7 +3228,10 @@ class HDWallet(object):
 
         self.last_updated = last_updated
         self._session.commit()
-        self._balance_update(account_id=account_id, network=network, key_id=key_id)
+        # Confirmations of known transactions are updated as well, so reload index of unspent outputs when needed to
+        # filter on the new values in select_inputs()
+        self._utxo_indexes = {}
+        self._balances_load()
 
         return len(txs)
 
@@ -2985,14 +3303,39 @@ class HDWallet(object):
                     u['value'] = -u['value']
                 else:
                     u['is_output'] = False
-            else:
-                if txid in tx_hashes:
-                    continue
+                res.append(u)
+            elif txid not in tx_hashes:
                 tx_hashes.append(txid)
-                u = self.transaction(txid)
-            res.append(u)
+        if not as_dict:
+            res = self._transactions_load(tx_hashes)
         return res
 
+    def _transactions_load(self, txids):
+        """
+        Get HDWalletTransaction objects for list of transaction IDs. Transactions with a compact record in the
+        database are created from this record, other transactions are read in bulk with
+        :meth:`HDWalletTransaction.from_txids`.
+
+        :param txids: List of transaction IDs as hexadecimal strings
+        :type txids: list of str
+
+        :return list of HDWalletTransaction: Transactions in order of the txids list
+        """
+        db_txs = {}
+        for i in range(0, len(txids), 500):
+            qr = self._session.query(
+                DbTransaction.hash, DbTransaction.cache, DbTransaction.network_name, DbTransaction.fee,
+                DbTransaction.size, DbTransaction.date, DbTransaction.confirmations, DbTransaction.block_height,
+                DbTransaction.block_hash, DbTransaction.input_total, DbTransaction.output_total, DbTransaction.raw,
+                DbTransaction.status, DbTransaction.coinbase, DbTransaction.verified). \
+                filter(DbTransaction.wallet_id == self.wallet_id, DbTransaction.hash.in_(txids[i:i + 500]),
+                       DbTransaction.cache.isnot(None))
+            db_txs.update(dict([(db_tx.hash, db_tx) for db_tx in qr.all()]))
+        wts = HDWalletTransaction.from_txids(self, [txid for txid in txids if txid not in db_txs])
+        wts = dict([(wt.hash, wt) for wt in wts])
+        return [HDWalletTransaction.from_cache(self, db_txs[txid]) if txid in db_txs else wts.get(txid)
+                for txid in txids]
+
     def transaction(self, txid):
         """
         Get HDWalletTransaction object for given transaction ID (transaction hash)
@@ -3039,12 +3382,171 @@ class HDWallet(object):
             raise WalletError("Input key type %s not supported" % key.key_type)
         return inp_keys, key
 
+    def _utxo_index(self, network, account_id):
+        """
+        Get index of spendable unspent outputs of an account sorted by value. The index is loaded from the database
+        once and updated when this wallet saves transactions, sends a transaction or updates its UTXO's, so
+        select_inputs() does not need any database queries.
+
+        UTXO's changed by other wallet objects or processes are only seen after an utxos_update() or
+        transactions_update() call.
+
+        :param network: Network name
+        :type network: str
+        :param account_id: Account ID
+        :type account_id: int
+
+        :return dict: Dictionary with sorted list of 'values', list of 'utxos' dictionaries in the same order and dictionary of 'outpoints' with the value of each (tx_hash, output_n)
+        """
+        index = self._utxo_indexes.get((network, account_id))
+        if index is None:
+            qr = self._session.query(DbTransaction.hash, DbTransactionOutput.output_n, DbTransactionOutput.value,
+                                     DbTransactionOutput.key_id, DbTransactionOutput.script_type,
+                                     DbTransaction.confirmations).\
+                join(DbTransaction).join(DbKey). \
+                filter(DbTransaction.wallet_id == self.wallet_id, DbKey.account_id == account_id,
+                       DbKey.network_name == network, DbKey.public != '',
+                       DbTransactionOutput.spent.is_(False))
+            utxos = sorted([{
+                'tx_hash': tx_hash, 'output_n': output_n, 'value': value, 'key_id': key_id,
+                'script_type': script_type, 'confirmations': confirmations
+            } for tx_hash, output_n, value, key_id, script_type, confirmations in qr.all()],
+                key=lambda u: u['value'])
+            index = {
+                'values': [u['value'] for u in utxos],
+                'utxos': utxos,
+                'outpoints': dict([((u['tx_hash'], u['output_n']), u['value']) for u in utxos])
+            }
+            self._utxo_indexes[(network, account_id)] = index
+        return index
+
+    def _utxo_index_add(self, utxos):
+        """
+        Add new or updated unspent outputs to the loaded UTXO indexes
+
+        :param utxos: List of tuples with network name, account ID and UTXO dictionary
+        :type utxos: list of tuple
+        """
+        for network, account_id, utxo in utxos:
+            index = self._utxo_indexes.get((network, account_id))
+            if index is None:
+                continue
+            self._utxo_index_remove([(utxo['tx_hash'], utxo['output_n'])])
+            pos = bisect_right(index['values'], utxo['value'])
+            index['values'].insert(pos, utxo['value'])
+            index['utxos'].insert(pos, utxo)
+            index['outpoints'][(utxo['tx_hash'], utxo['output_n'])] = utxo['value']
+
+    def _utxo_index_remove(self, outpoints):
+        """
+        Remove spent outputs from the loaded UTXO indexes
+
+        :param outpoints: List of (tx_hash, output_n) tuples
+        :type outpoints: list of tuple, set of tuple
+        """
+        for index in self._utxo_indexes.values():
+            for outpoint in outpoints:
+                value = index['outpoints'].pop(outpoint, None)
+                if value is None:
+                    continue
+                pos = bisect_left(index['values'], value)
+                while (index['utxos'][pos]['tx_hash'], index['utxos'][pos]['output_n']) != outpoint:
+                    pos += 1
+                del index['values'][pos]
+                del index['utxos'][pos]
+
+    def _select_utxos(self, amount, variance=None, input_key_id=None, account_id=None, network=None, min_confirms=0,
+                      max_utxos=None, coin_selection=None, fee_per_kb=None):
+        """
+        Select unspent outputs from the in-memory UTXO index without database queries. See select_inputs() for a
+        description of the arguments.
+
+        :return list of dict: List of selected UTXO's as dictionaries from the index
+        """
+
+        if network is None:
+            network = self.network.name
+        if account_id is None:
+            if network == self.network.name:
+                account_id = self.default_account_id
+            else:
+                network, account_id, _ = self._get_account_defaults(network)
+        if variance is None:
+            variance = self.network.dust_amount
+
+        index = self._utxo_index(network, account_id)
+        utxos = index['utxos']
+
+        def available(utxo):
+            if utxo['confirmations'] is None or utxo['confirmations'] < min_confirms:
+                return False
+            return not input_key_id or utxo['key_id'] == input_key_id
+
+        if coin_selection not in [None, 'default']:
+            if callable(coin_selection):
+                select = coin_selection
+            elif coin_selection in COIN_SELECTION_STRATEGIES:
+                select = COIN_SELECTION_STRATEGIES[coin_selection]
+            else:
+                raise WalletError("Unknown coin selection strategy '%s', use one of %s" %
+                                  (coin_selection, ', '.join(sorted(COIN_SELECTION_STRATEGIES.keys()))))
+            candidates = [u for u in utxos if available(u)]
+            if not candidates:
+                raise WalletError("Create transaction: No unspent transaction outputs found or no key available for "
+                                  "UTXO's")
+            input_fee = 0
+            change_fee = 0
+            if fee_per_kb:
+                input_fee = int(input_size(self.witness_type, self.multisig, self.multisig_n_required,
+                                           len(self.cosigner)) / 1024.0 * fee_per_kb)
+                change_fee = int(output_size(self.witness_type, self.multisig) / 1024.0 * fee_per_kb)
+            # Strategies add the fee for each selected input themselves
+            selected_utxos = select(candidates, max(amount - input_fee - change_fee, 0), input_fee, change_fee,
+                                    max_utxos)
+            if not selected_utxos:
+                return []
+        else:
+            # The smallest UTXO with a higher amount is also the one with the exact amount +/- variance, if available
+            pos = bisect_left(index['values'], amount)
+            selected_utxos = []
+            for i in range(pos, len(utxos)):
+                if available(utxos[i]):
+                    selected_utxos = [utxos[i]]
+                    break
+
+            if not selected_utxos:
+                if not any(available(utxos[i]) for i in range(pos)):
+                    raise WalletError("Create transaction: No unspent transaction outputs found or no key available "
+                                      "for UTXO's")
+                if max_utxos and max_utxos <= 1:
+                    _logger.info("No single UTXO found with requested amount, use higher 'max_utxo' setting to use "
+                                 "multiple UTXO's")
+                    return []
+
+                # Otherwise compose of 2 or more lesser outputs
+                total_amount = 0
+                for i in range(pos - 1, -1, -1):
+                    if total_amount >= amount or (max_utxos is not None and len(selected_utxos) >= max_utxos):
+                        break
+                    if available(utxos[i]):
+                        selected_utxos.append(utxos[i])
+                        total_amount += utxos[i]['value']
+                if total_amount < amount:
+                    return []
+        return selected_utxos
+
     def select_inputs(self, amount, variance=None, input_key_id=None, account_id=None, network=None, min_confirms=0,
-                      max_utxos=None, return_input_obj=True):
+                      max_utxos=None, return_input_obj=True, coin_selection=None, fee_per_kb=None):
         """
         Select available unspent transaction outputs (UTXO's) which can be used as inputs for a transaction for
         the specified amount.
 
+        UTXO's are selected from an in-memory index sorted by value, which is loaded from the database on first use.
+
+        The default strategy selects the smallest UTXO which covers the amount, or else the largest smaller UTXO's.
+        Other strategies are 'bnb' (branch and bound to avoid a change output), 'knapsack' and 'waste'. See the
+        coinselection module for details.
+
         :param amount: Total value of inputs in smallest denominator (sathosi) to select
         :type amount: int
         :param variance: Allowed difference in total input value. Default is dust amount of selected network.
@@ -3061,75 +3563,39 @@ class HDWallet(object):
         :type max_utxos: int
         :param return_input_obj: Return inputs as Input class object. Default is True
         :type return_input_obj: bool
+        :param coin_selection: Name of coin selection strategy or a function with the same arguments as the functions in the coinselection module. Default is None to use the default strategy
+        :type coin_selection: str, function
+        :param fee_per_kb: Fee per kilobyte used by the coin selection strategy to account for the fees of the inputs. The amount should include the fee for one input and a change output, as estimated by transaction_create
+        :type fee_per_kb: int
 
         :return: List of previous outputs
         :rtype: list of DbTransactionOutput, list of Input
         """
 
-        network, account_id, _ = self._get_account_defaults(network, account_id)
-        if variance is None:
-            variance = self.network.dust_amount
-
-        utxo_query = self._session.query(DbTransactionOutput).join(DbTransaction).join(DbKey). \
-            filter(DbTransaction.wallet_id == self.wallet_id, DbKey.account_id == account_id,
-                   DbKey.network_name == network, DbKey.public != '',
-                   DbTransactionOutput.spent.is_(False), DbTransaction.confirmations >= min_confirms)
-        if input_key_id:
-            utxo_query = utxo_query.filter(DbKey.id == input_key_id)
-        utxos = utxo_query.order_by(DbTransaction.confirmations.desc()).all()
-        if not utxos:
-            raise WalletError("Create transaction: No unspent transaction outputs found or no key available for UTXO's")
-
-        # TODO: Find 1 or 2 UTXO's with exact amount +/- self.network.dust_amount
-
-        # Try to find one utxo with exact amount
-        one_utxo = utxo_query.filter(DbTransactionOutput.spent.is_(False),
-                                     DbTransactionOutput.value >= amount,
-                                     DbTransactionOutput.value <= amount + variance).first()
-        selected_utxos = []
-        if one_utxo:
-            selected_utxos = [one_utxo]
-        else:
-            # Try to find one utxo with higher amount
-            one_utxo = utxo_query. \
-                filter(DbTransactionOutput.spent.is_(False), DbTransactionOutput.value >= amount).\
-                order_by(DbTransactionOutput.value).first()
-            if one_utxo:
-                selected_utxos = [one_utxo]
-            elif max_utxos and max_utxos <= 1:
-                _logger.info("No single UTXO found with requested amount, use higher 'max_utxo' setting to use "
-                             "multiple UTXO's")
-                return []
-
-        # Otherwise compose of 2 or more lesser outputs
+        selected_utxos = self._select_utxos(amount, variance, input_key_id, account_id, network, min_confirms,
+                                            max_utxos, coin_selection, fee_per_kb)
         if not selected_utxos:
-            lessers = utxo_query. \
-                filter(DbTransactionOutput.spent.is_(False), DbTransactionOutput.value < amount).\
-                order_by(DbTransactionOutput.value.desc()).all()
-            total_amount = 0
-            selected_utxos = []
-            for utxo in lessers[:max_utxos]:
-                if total_amount < amount:
-                    selected_utxos.append(utxo)
-                    total_amount += utxo.value
-            if total_amount < amount:
-                return []
+            return []
         if not return_input_obj:
-            return selected_utxos
+            # Load database records of selected outputs with a single query and return them in order of selection
+            tx_hashes = list(set([u['tx_hash'] for u in selected_utxos]))
+            qr = self._session.query(DbTransactionOutput, DbTransaction.hash).join(DbTransaction).\
+                filter(DbTransaction.wallet_id == self.wallet_id, DbTransaction.hash.in_(tx_hashes))
+            db_outputs = dict([((tx_hash, output.output_n), output) for output, tx_hash in qr])
+            return [db_outputs[(u['tx_hash'], u['output_n'])] for u in selected_utxos]
         else:
             inputs = []
             for utxo in selected_utxos:
-                # amount_total_input += utxo.value
-                inp_keys, key = self._objects_by_key_id(utxo.key_id)
+                inp_keys, key = self._objects_by_key_id(utxo['key_id'])
                 multisig = False if len(inp_keys) < 2 else True
-                script_type = get_unlocking_script_type(utxo.script_type, multisig=multisig)
-                inputs.append(Input(utxo.transaction.hash, utxo.output_n, keys=inp_keys, script_type=script_type,
+                script_type = get_unlocking_script_type(utxo['script_type'], multisig=multisig)
+                inputs.append(Input(utxo['tx_hash'], utxo['output_n'], keys=inp_keys, script_type=script_type,
                               sigs_required=self.multisig_n_required, sort=self.sort_keys,
-                              compressed=key.compressed, value=utxo.value))
+                              compressed=key.compressed, value=utxo['value']))
             return inputs
 
     def transaction_create(self, output_arr, input_arr=None, input_key_id=None, account_id=None, network=None, fee=None,
-                           min_confirms=0, max_utxos=None, locktime=0):
+                           min_confirms=0, max_utxos=None, locktime=0, coin_selection=None):
         """
         Create new transaction with specified outputs.
         Inputs can be specified but if not provided they will be selected from wallets utxo's.
@@ -3153,6 +3619,8 @@ class HDWallet(object):
         :type max_utxos: int
         :param locktime: Transaction level locktime. Locks the transaction until a specified block (value from 1 to 5 million) or until a certain time (Timestamp in seconds after 1-jan-1970). Default value is 0 for transactions without locktime
         :type locktime: int
+        :param coin_selection: Coin selection strategy to select UTXO's, see select_inputs(). Option is ignored if input_arr is provided.
+        :type coin_selection: str, function
 
         :return HDWalletTransaction: object
         """
@@ -3185,7 +3653,8 @@ class HDWallet(object):
         if fee is None:
             if not input_arr:
                 transaction.fee_per_kb = srv.estimatefee()
-                fee_estimate = (transaction.estimate_size(add_change_output=True) / 1024.0 * transaction.fee_per_kb)
+                vsize_estimate = (transaction.estimate_weight(add_change_output=True) + 3) // 4
+                fee_estimate = (vsize_estimate / 1024.0 * transaction.fee_per_kb)
                 if fee_estimate < self.network.fee_min:
                     fee_estimate = self.network.fee_min
             else:
@@ -3199,20 +3668,22 @@ class HDWallet(object):
             sequence = 0xfffffffe
         amount_total_input = 0
         if input_arr is None:
-            selected_utxos = self.select_inputs(amount_total_output + fee_estimate, self.network.dust_amount, input_key_id,
-                                                account_id, network, min_confirms, max_utxos, False)
+            selected_utxos = self._select_utxos(amount_total_output + fee_estimate, self.network.dust_amount,
+                                                input_key_id, account_id, network, min_confirms, max_utxos,
+                                                coin_selection, transaction.fee_per_kb)
             if not selected_utxos:
                 raise WalletError("Not enough unspent transaction outputs found")
             for utxo in selected_utxos:
-                amount_total_input += utxo.value
-                inp_keys, key = self._objects_by_key_id(utxo.key_id)
+                amount_total_input += utxo['value']
+                inp_keys, key = self._objects_by_key_id(utxo['key_id'])
                 multisig = False if isinstance(inp_keys, list) and len(inp_keys) < 2 else True
-                unlock_script_type = get_unlocking_script_type(utxo.script_type, self.witness_type, multisig=multisig)
-                transaction.add_input(utxo.transaction.hash, utxo.output_n, keys=inp_keys,
+                unlock_script_type = get_unlocking_script_type(utxo['script_type'], self.witness_type,
+                                                               multisig=multisig)
+                transaction.add_input(utxo['tx_hash'], utxo['output_n'], keys=inp_keys,
                                       script_type=unlock_script_type, sigs_required=self.multisig_n_required,
-                                      sort=self.sort_keys, compressed=key.compressed, value=utxo.value,
-                                      address=utxo.key.address, sequence=sequence,
-                                      key_path=utxo.key.path, witness_type=self.witness_type)
+                                      sort=self.sort_keys, compressed=key.compressed, value=utxo['value'],
+                                      address=key.address, sequence=sequence,
+                                      key_path=key.path, witness_type=self.witness_type)
                 # FIXME: Missing locktime_cltv=locktime_cltv, locktime_csv=locktime_csv (?)
         else:
             for inp in input_arr:
@@ -3289,7 +3760,7 @@ class HDWallet(object):
         # Calculate fees
         transaction.fee = fee
         fee_per_output = None
-        transaction.size = transaction.estimate_size(add_change_output=True)
+        transaction.size = (transaction.estimate_weight(add_change_output=True) + 3) // 4
         if fee is None:
             if not input_arr:
                 if not transaction.fee_per_kb:
@@ -3298,6 +3769,13 @@ class HDWallet(object):
                     transaction.fee_per_kb = self.network.fee_min
                 transaction.fee = int((transaction.size / 1024.0) * transaction.fee_per_kb)
                 fee_per_output = int((50 / 1024.0) * transaction.fee_per_kb)
+                if coin_selection not in [None, 'default']:
+                    # Coin selection strategies avoid change outputs which cost more to create and spend then they
+                    # are worth
+                    fee_per_output = int((input_size(self.witness_type, self.multisig, self.multisig_n_required,
+                                                     len(self.cosigner)) +
+                                          output_size(self.witness_type, self.multisig)) / 1024.0 *
+                                         transaction.fee_per_kb)
             else:
                 if amount_total_output and amount_total_input:
                     fee = False
@@ -3310,6 +3788,13 @@ class HDWallet(object):
         else:
             transaction.change = int(amount_total_input - (amount_total_output + transaction.fee))
 
+        # Without a change output the fee is lower, so inputs selected to avoid change may still cover the fee
+        if transaction.change < 0 and fee is None and not input_arr and coin_selection not in [None, 'default']:
+            fee_no_change = int((((transaction.estimate_weight() + 3) // 4) / 1024.0) * transaction.fee_per_kb)
+            if amount_total_input - amount_total_output >= fee_no_change:
+                transaction.fee = int(amount_total_input - amount_total_output)
+                transaction.change = 0
+
         # Skip change if amount is smaller then the dust limit or estimated fee
         if (fee_per_output and transaction.change < fee_per_output) or transaction.change <= self.network.dust_amount:
             transaction.fee += transaction.change
@@ -3322,7 +3807,7 @@ class HDWallet(object):
             transaction.outputs[on].key_id = ck.key_id
             amount_total_output += transaction.change
 
-        transaction.hash = to_hexstring(transaction.signature_hash()[::-1])
+        transaction.hash = transaction.txid
         if not transaction.fee_per_kb:
             transaction.fee_per_kb = int((transaction.fee * 1024.0) / transaction.size)
         if transaction.fee_per_kb < self.network.fee_min:
@@ -3352,7 +3837,6 @@ class HDWallet(object):
                 rt.size = t.size
             else:
                 rt.size = len(t.raw())
-            rt.vsize = rt.size
             rt.fee_per_kb = int((rt.fee / rt.size) * 1024)
             rt.block_height = t.block_height
             rt.confirmations = t.confirmations
@@ -3395,12 +3879,12 @@ class HDWallet(object):
         t_import = Transaction.import_raw(raw_tx, network=network)
         rt = self.transaction_create(t_import.outputs, t_import.inputs, network=network)
         rt.verify()
-        rt.size = rt.vsize = len(raw_tx)
+        rt.size = len(raw_tx)
         rt.fee_per_kb = int((rt.fee / rt.size) * 1024)
         return rt
 
     def send(self, output_arr, input_arr=None, input_key_id=None, account_id=None, network=None, fee=None,
-             min_confirms=0, priv_keys=None, max_utxos=None, locktime=0, offline=False):
+             min_confirms=0, priv_keys=None, max_utxos=None, locktime=0, offline=False, coin_selection=None):
         """
         Create new transaction with specified outputs and push it to the network.
         Inputs can be specified but if not provided they will be selected from wallets utxo's.
@@ -3428,6 +3912,8 @@ class HDWallet(object):
         :type locktime: int
         :param offline: Just return the transaction object and do not send it when offline = True. Default is False
         :type offline: bool
+        :param coin_selection: Coin selection strategy to select UTXO's, see select_inputs(). Option is ignored if input_arr is provided.
+        :type coin_selection: str, function
 
         :return HDWalletTransaction:
         """
@@ -3438,7 +3924,7 @@ class HDWallet(object):
                               (len(input_arr), max_utxos))
 
         transaction = self.transaction_create(output_arr, input_arr, input_key_id, account_id, network, fee,
-                                              min_confirms, max_utxos, locktime)
+                                              min_confirms, max_utxos, locktime, coin_selection)
         transaction.sign(priv_keys)
         # Calculate exact estimated fees and update change output if necessary
         if fee is None and transaction.fee_per_kb and transaction.change:
@@ -3449,16 +3935,16 @@ class HDWallet(object):
                              "Recreate transaction with correct fee" % (transaction.fee, fee_exact))
                 transaction = self.transaction_create(output_arr, input_arr, account_id=account_id, network=network,
                                                       fee=fee_exact, min_confirms=min_confirms, max_utxos=max_utxos,
-                                                      locktime=locktime)
+                                                      locktime=locktime, coin_selection=coin_selection)
                 transaction.sign(priv_keys)
 
         transaction.fee_per_kb = int((transaction.fee / transaction.size) * 1024)
-        transaction.hash = to_hexstring(transaction.signature_hash()[::-1])
+        transaction.hash = transaction.txid
         transaction.send(offline)
         return transaction
 
     def send_to(self, to_address, amount, input_key_id=None, account_id=None, network=None, fee=None, min_confirms=0,
-                priv_keys=None, locktime=0, offline=False):
+                priv_keys=None, locktime=0, offline=False, coin_selection=None):
         """
         Create transaction and send it with default Service objects sendrawtransaction method
 
@@ -3482,13 +3968,16 @@ class HDWallet(object):
         :type locktime: int
         :param offline: Just return the transaction object and do not send it when offline = True. Default is False
         :type offline: bool
+        :param coin_selection: Coin selection strategy to select UTXO's, see select_inputs()
+        :type coin_selection: str, function
 
         :return HDWalletTransaction:
         """
 
         outputs = [(to_address, amount)]
         return self.send(outputs, input_key_id=input_key_id, account_id=account_id, network=network, fee=fee,
-                         min_confirms=min_confirms, priv_keys=priv_keys, locktime=locktime, offline=offline)
+                         min_confirms=min_confirms, priv_keys=priv_keys, locktime=locktime, offline=offline,
+                         coin_selection=coin_selection)
 
     def sweep(self, to_address, account_id=None, input_key_id=None, network=None, max_utxos=999, min_confirms=0,
               fee_per_kb=None, fee=None, locktime=0, offline=False):
@@ -3644,7 +4133,7 @@ class HDWallet(object):
             print(" Private                        %s" % self.main_key.is_private)
             print(" Depth                          %s" % self.main_key.depth)
 
-        balances = self._balance_update()
+        balances = self._balances_load()
         if detail > 1:
             for nw in self.networks():
                 print("\n- NETWORK: %s -" % nw.name)
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+#
+#    BitcoinLib - Python Cryptocurrency Library
+#
+#    EXAMPLES - Simulate payments with different coin selection strategies
+#
+#    © 2020 - 1200 Web Development <http://1200wd.com/>
+#
+
+import random
+import time
+from bitcoinlib.coinselection import *
+
+
+WITNESS_TYPE = 'segwit'
+FEE_PER_KB = 20000
+UTXO_COUNT = 300
+PAYMENTS = 500
+DEPOSIT_EVERY = 5
+
+input_fee = int(input_size(WITNESS_TYPE) / 1024.0 * FEE_PER_KB)
+change_fee = int(output_size(WITNESS_TYPE) / 1024.0 * FEE_PER_KB)
+# Transaction overhead and payment output
+base_fee = int((12 + output_size(WITNESS_TYPE)) / 1024.0 * FEE_PER_KB)
+
+
+def simulate(strategy, seed=1):
+    """
+    Create a synthetic wallet with random UTXO's and make random payments with the given strategy. Every few
+    payments a deposit is received. Change outputs are added to the wallet.
+    """
+    rng = random.Random(seed)
+    utxos = [{'value': int(rng.lognormvariate(14, 1.5)) + 10000} for _ in range(UTXO_COUNT)]
+    payments = [int(rng.lognormvariate(14, 1.2)) + 10000 for _ in range(PAYMENTS)]
+    fees = 0
+    failed = 0
+    changes = 0
+    latencies = []
+    for n, payment in enumerate(payments):
+        if not n % DEPOSIT_EVERY:
+            utxos.append({'value': int(rng.lognormvariate(14, 1.5)) + 10000})
+        amount = payment + base_fee
+        start = time.time()
+        selection = strategy(utxos, amount, input_fee, change_fee)
+        latencies.append(time.time() - start)
+        if not selection:
+            failed += 1
+            continue
+        excess = sum([u['value'] - input_fee for u in selection]) - amount
+        selected = set([id(u) for u in selection])
+        utxos = [u for u in utxos if id(u) not in selected]
+        fee = base_fee + len(selection) * input_fee
+        if excess > change_fee + input_fee:
+            fee += change_fee
+            changes += 1
+            utxos.append({'value': excess - change_fee})
+        else:
+            fee += excess
+        fees += fee
+    return {
+        'fees': fees,
+        'failed': failed,
+        'changes': changes,
+        'utxos': len(utxos),
+        # Fees needed to spend the remaining UTXO's later on
+        'future_fees': len(utxos) * input_fee,
+        'latency_avg': sum(latencies) / len(latencies) * 1000,
+        'latency_max': max(latencies) * 1000,
+    }
+
+
+print("Simulate %d payments with %d %s UTXO's at %d satoshi per kB" %
+      (PAYMENTS, UTXO_COUNT, WITNESS_TYPE, FEE_PER_KB))
+print("%-10s %12s %12s %8s %8s %8s %12s %12s" %
+      ('strategy', 'fees', 'future fees', 'failed', 'changes', 'utxos', 'avg (ms)', 'max (ms)'))
+for name in sorted(COIN_SELECTION_STRATEGIES.keys()):
+    res = simulate(COIN_SELECTION_STRATEGIES[name])
+    print("%-10s %12d %12d %8d %8d %8d %12.3f %12.3f" %
+          (name, res['fees'], res['future_fees'], res['failed'], res['changes'], res['utxos'], res['latency_avg'],
+           res['latency_max']))
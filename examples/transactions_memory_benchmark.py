@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+#
+#    BitcoinLib - Python Cryptocurrency Library
+#
+#    EXAMPLES - Measure memory retained by deserialized transactions
+#
+#    © 2020 - 1200 Web Development <http://1200wd.com/>
+#
+
+import os
+import gc
+import json
+import tracemalloc
+from bitcoinlib.transactions import Transaction
+from bitcoinlib.encoding import to_bytes
+
+
+REPEAT = 10
+
+filename = os.path.join(os.path.dirname(__file__), '..', 'tests', 'transactions_raw.json')
+with open(filename, 'r') as f:
+    raws = [(to_bytes(t[1]), t[4]) for t in json.load(f)['transactions']] * REPEAT
+
+# Import once to load modules and network definitions before measuring
+Transaction.import_raw(raws[0][0], network=raws[0][1])
+gc.collect()
+
+tracemalloc.start()
+txs = [Transaction.import_raw(rawtx, network=network) for rawtx, network in raws]
+gc.collect()
+retained, peak = tracemalloc.get_traced_memory()
+tracemalloc.stop()
+
+inputs = sum(len(t.inputs) for t in txs)
+outputs = sum(len(t.outputs) for t in txs)
+print("Transactions: %d, inputs: %d, outputs: %d" % (len(txs), inputs, outputs))
+print("Retained memory: %.2f MB (peak %.2f MB)" % (retained / 1e6, peak / 1e6))
+print("Bytes per input or output: %d" % (retained // (inputs + outputs)))
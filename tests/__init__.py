@@ -23,5 +23,6 @@ import tests.test_keys
 import tests.test_mnemonic
 import tests.test_wallets
 import tests.test_transactions
+import tests.test_blocks
 import tests.test_services
 import tests.test_tools
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+#
+#    BitcoinLib - Python Cryptocurrency Library
+#    Unit Tests for Block Class
+#    © 2019 December - 1200 Web Development <http://1200wd.com/>
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+import struct
+import unittest
+import tempfile
+from bitcoinlib.blocks import *
+from bitcoinlib.blocks import _transaction_size
+
+
+GENESIS_HEADER = \
+    "0100000000000000000000000000000000000000000000000000000000000000000000003ba3edfd7a7b12b27ac72c3e67768f617fc81b" \
+    "c3888a51323a9fb8aa4b1e5e4a29ab5f49ffff001d1dac2b7c"
+GENESIS_COINBASE = \
+    "01000000010000000000000000000000000000000000000000000000000000000000000000ffffffff4d04ffff001d0104455468652054" \
+    "696d65732030332f4a616e2f32303039204368616e63656c6c6f72206f6e206272696e6b206f66207365636f6e64206261696c6f7574" \
+    "20666f722062616e6b73ffffffff0100f2052a01000000434104678afdb0fe5548271967f1a67130b7105cd6a828e03909a67962e0ea1f" \
+    "61deb649f6bc3f4cef38c4f35504e51ec112de5c384df7ba0b8d578a4c702b6bf11d5fac00000000"
+GENESIS_BLOCK = GENESIS_HEADER + "01" + GENESIS_COINBASE
+HEADERS = [
+    GENESIS_HEADER,
+    "010000006fe28c0ab6f1b372c1a6a246ae63f74f931e8365e15a089c68d6190000000000982051fd1e4ba744bbbe680e1fee14677ba1a3c"
+    "3540bf7b1cdb606e857233e0e61bc6649ffff001d01e36299",
+    "010000004860eb18bf1b1620e37e9490fc8a427514416fd75159ab86688e9a8300000000d5fdcc541e25de1c7a5addedf24858b8bb665c"
+    "9f36ef744ee42c316022c90f9bb0bc6649ffff001d08d2bd61",
+]
+SEGWIT_TX = \
+    "02000000000101b99ef54dd7695be7574ac6fb4a6d1a2dd98cb4ec7ee53b06117754da424a4c440100000000ffffffff0112d62d1e000000" \
+    "00160014f922634ea00272421ffdb6f187935602159e17500247304402204c040218c1a5dc87e0ba359706fbd0c9c36063fd89c6b4dd90" \
+    "0e03cd69de7fd602204c7ebe180a072cc415ba3337dd66d259a4c7de2b563269a90e055f91898bcf590121025477b3e0aa2619e1ed61b7" \
+    "734b31369c156d9ff7fcbcdc1b7e3c79ed657aab0f00000000"
+
+
+class TestBlocks(unittest.TestCase):
+
+    def test_block_from_raw_genesis(self):
+        b = Block.from_raw(GENESIS_BLOCK)
+        self.assertEqual(to_hexstring(b.block_hash),
+                         '000000000019d6689c085ae165831e934ff763ae46a2a6c172b3f1b60a8ce26f')
+        self.assertEqual(to_hexstring(b.merkle_root),
+                         '4a5e1e4baab89f3a32518a88c31bc87f618f76673e2cc77ab2127b7afdeda33b')
+        self.assertEqual(b.prev_block, b'\0' * 32)
+        self.assertEqual(b.version, 1)
+        self.assertEqual(b.time, 1231006505)
+        self.assertEqual(b.bits, 486604799)
+        self.assertEqual(b.nonce, 2083236893)
+        self.assertEqual(len(b), 1)
+        self.assertEqual(b.size, 285)
+        txs = list(b)
+        self.assertEqual(len(txs), 1)
+        self.assertEqual(txs[0].txid, '4a5e1e4baab89f3a32518a88c31bc87f618f76673e2cc77ab2127b7afdeda33b')
+        self.assertEqual(txs[0].block_hash, to_hexstring(b.block_hash))
+        self.assertEqual(b.as_dict()['tx_count'], 1)
+
+    def test_block_transaction_size_segwit(self):
+        raw = to_bytes(GENESIS_COINBASE + SEGWIT_TX)
+        coinbase_size = _transaction_size(raw)
+        self.assertEqual(coinbase_size, len(GENESIS_COINBASE) // 2)
+        self.assertEqual(_transaction_size(raw, coinbase_size), len(SEGWIT_TX) // 2)
+        self.assertRaisesRegexp(BlockError, "exceeds end of block data", _transaction_size, raw[:-1],
+                                coinbase_size)
+
+    def test_block_iterate_transactions_segwit(self):
+        b = Block.from_raw(GENESIS_HEADER + "02" + GENESIS_COINBASE + SEGWIT_TX)
+        txs = list(b)
+        self.assertEqual(len(txs), 2)
+        self.assertEqual(txs[0].txid, '4a5e1e4baab89f3a32518a88c31bc87f618f76673e2cc77ab2127b7afdeda33b')
+        self.assertEqual(txs[1].raw_hex(), SEGWIT_TX)
+
+    def test_block_iter_blk_file(self):
+        raw_block = to_bytes(GENESIS_BLOCK)
+        record = b'\xf9\xbe\xb4\xd9' + struct.pack('<L', len(raw_block)) + raw_block
+        with tempfile.NamedTemporaryFile(suffix='.dat', delete=False) as f:
+            f.write(record + record + b'\0' * 100)
+        try:
+            blocks = list(iter_blk_file(f.name))
+            self.assertEqual(len(blocks), 2)
+            self.assertEqual(to_hexstring(blocks[1].block_hash),
+                             '000000000019d6689c085ae165831e934ff763ae46a2a6c172b3f1b60a8ce26f')
+            self.assertEqual(len(list(blocks[1])), 1)
+            self.assertRaisesRegexp(BlockError, "Unexpected magic bytes", list,
+                                    iter_blk_file(f.name, magic='0b110907'))
+            with open(f.name, 'wb') as f2:
+                f2.write(record + record[:-10])
+            self.assertRaisesRegexp(BlockError, "exceeds end of file", list, iter_blk_file(f.name))
+        finally:
+            os.remove(f.name)
+
+
+class TestHeaderChain(unittest.TestCase):
+
+    def setUp(self):
+        f = tempfile.NamedTemporaryFile(suffix='.dat', delete=False)
+        f.close()
+        os.remove(f.name)
+        self.filename = f.name
+
+    def tearDown(self):
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+
+    def test_header_chain_append(self):
+        with HeaderChain(self.filename) as hc:
+            self.assertIsNone(hc.height)
+            self.assertEqual(hc.append(HEADERS[0]), 0)
+            self.assertEqual(hc.append_many(HEADERS[1:]), 2)
+            self.assertEqual(len(hc), 3)
+            self.assertEqual(to_hexstring(hc.block_hash(1)),
+                             '00000000839a8e6886ab5951d76f411475428afc90947ee320161bbf18eb6048')
+            self.assertEqual(hc.raw_header(2), to_bytes(HEADERS[2]))
+            self.assertEqual(hc.header(2).time, 1231469744)
+            self.assertEqual(hc.header(2).height, 2)
+            self.assertEqual(hc.confirmations(2), 1)
+            self.assertEqual(hc.confirmations(1), 2)
+            self.assertEqual(hc.confirmations(None), 0)
+            self.assertEqual(hc.confirmations(3), 0)
+            self.assertRaisesRegexp(BlockError, "Height 3 not in header chain", hc.raw_header, 3)
+        with HeaderChain(self.filename) as hc:
+            self.assertEqual(hc.height, 2)
+            self.assertRaisesRegexp(BlockError, "Previous block hash of header at height 3 does not match",
+                                    hc.append, HEADERS[1])
+
+    def test_header_chain_invalid_file_size(self):
+        with open(self.filename, 'wb') as f:
+            f.write(b'\0' * 100)
+        chains = []
+
+        class HeaderChainInit(HeaderChain):
+            def __init__(self, *args, **kwargs):
+                chains.append(self)
+                super(HeaderChainInit, self).__init__(*args, **kwargs)
+
+        self.assertRaisesRegexp(BlockError, "not a multiple of 80 bytes", HeaderChainInit, self.filename)
+        self.assertTrue(chains[0]._file.closed)
+        self.assertIsNone(chains[0]._mm)
+
+    def test_header_chain_validation(self):
+        with HeaderChain(self.filename) as hc:
+            invalid_nonce = HEADERS[0][:-8] + '00000000'
+            self.assertRaisesRegexp(BlockError, "does not meet proof-of-work target", hc.append, invalid_nonce)
+            self.assertRaisesRegexp(BlockError, "does not match", hc.append_many, [HEADERS[0], HEADERS[2]])
+            self.assertIsNone(hc.height)
+            self.assertRaisesRegexp(BlockError, "Block header must be 80 bytes", hc.append, HEADERS[0][:-2])
+        with HeaderChain(self.filename, check_pow=False, start_height=100) as hc:
+            self.assertEqual(hc.append(invalid_nonce), 100)
+
+    def test_header_chain_rollback(self):
+        with HeaderChain(self.filename) as hc:
+            hc.append_many(HEADERS)
+            self.assertEqual(hc.rollback(0), 2)
+            self.assertEqual(hc.height, 0)
+            self.assertEqual(hc.rollback(5), 0)
+            self.assertEqual(hc.append(HEADERS[1]), 1)
+        self.assertEqual(os.path.getsize(self.filename), 160)
+
+    def test_header_chain_bits_to_target(self):
+        self.assertEqual(bits_to_target(0x1d00ffff), 0xffff << 208)
+        self.assertEqual(bits_to_target(0x03123456), 0x123456)
+        self.assertEqual(bits_to_target(0x02123456), 0x1234)
+        self.assertEqual(target_to_bits(0xffff << 208), 0x1d00ffff)
+        self.assertEqual(target_to_bits(0x123456), 0x03123456)
+        self.assertEqual(target_to_bits(0x80), 0x02008000)
+        self.assertEqual(target_to_bits(bits_to_target(0x207fffff)), 0x207fffff)
+
+    def test_header_chain_retarget_bits(self):
+        # Test vectors from Bitcoin Core pow_tests
+        self.assertEqual(retarget_bits(0x1d00ffff, 1261130161, 1262152739), 0x1d00d86a)
+        self.assertEqual(retarget_bits(0x1d00ffff, 1231006505, 1233061996), 0x1d00ffff)
+        self.assertEqual(retarget_bits(0x1c05a3f4, 1279008237, 1279297671), 0x1c0168fd)
+        self.assertEqual(retarget_bits(0x1c387f6f, 1263163443, 1269211443), 0x1d00e1fd)
+        self.assertRaisesRegexp(BlockError, "No proof-of-work parameters available for network dash",
+                                retarget_bits, 0x1d00ffff, 0, 1, 'dash')
+
+    def test_header_chain_easy_target(self):
+        # Headers with a valid proof-of-work for a target above the network limit (bits 0x207fffff)
+        easy_header = '010000006fe28c0ab6f1b372c1a6a246ae63f74f931e8365e15a089c68d619000000000011111111111111111111' \
+                      '1111111111111111111111111111111111111111111161bc6649ffff7f2003000000'
+        easy_genesis = '0100000000000000000000000000000000000000000000000000000000000000000000001111111111111111111' \
+                       '11111111111111111111111111111111111111111111129ab5f49ffff7f2000000000'
+        with HeaderChain(self.filename) as hc:
+            self.assertRaisesRegexp(BlockError, "Target of header at height 0 is above the proof-of-work limit",
+                                    hc.append, easy_genesis)
+            self.assertRaisesRegexp(BlockError, "Header at height 0 does not match genesis block",
+                                    hc.append, HEADERS[1])
+            hc.append(HEADERS[0])
+            self.assertRaisesRegexp(BlockError, "Target of header at height 1 is above the proof-of-work limit",
+                                    hc.append, easy_header)
+            changed_bits = HEADERS[1][:144] + 'feff001d' + HEADERS[1][152:]
+            self.assertRaisesRegexp(BlockError, "Bits of header at height 1 should be 1d00ffff, found 1d00fffe",
+                                    hc.append, changed_bits)
+            self.assertEqual(hc.height, 0)
+        os.remove(self.filename)
+        with HeaderChain(self.filename, check_pow=False) as hc:
+            self.assertEqual(hc.append_many([easy_genesis]), 0)
+
+    def test_header_chain_checkpoint(self):
+        checkpoint_hash = '00000000839a8e6886ab5951d76f411475428afc90947ee320161bbf18eb6048'
+        with HeaderChain(self.filename, start_height=1) as hc:
+            self.assertRaisesRegexp(BlockError, "Please specify a checkpoint hash", hc.append, HEADERS[1])
+        with HeaderChain(self.filename, start_height=1, checkpoint_hash=checkpoint_hash[::-1]) as hc:
+            self.assertRaisesRegexp(BlockError, "does not match genesis block or checkpoint", hc.append, HEADERS[1])
+        with HeaderChain(self.filename, start_height=1, checkpoint_hash=checkpoint_hash) as hc:
+            self.assertEqual(hc.append_many(HEADERS[1:]), 2)
+        with HeaderChain(self.filename, start_height=1) as hc:
+            self.assertEqual(hc.height, 2)
+        self.assertRaisesRegexp(BlockError, "Proof-of-work validation is not available for network dash",
+                                HeaderChain, self.filename, network='dash')
+
+    def test_header_chain_retarget(self):
+        def create_headers(bits_list, times, prev_hash=b'\0' * 32):
+            headers = []
+            for bits, time in zip(bits_list, times):
+                headers.append(struct.pack('<L', 1) + prev_hash + b'\0' * 32 + struct.pack('<LLL', time, bits, 0))
+                prev_hash = double_sha256(headers[-1])
+            return headers
+
+        # First period mined in about half the target timespan, so difficulty almost doubles
+        times = [1231006505 + n * 300 for n in range(2016)]
+        headers = create_headers([0x1d00ffff] * 2016, times)
+        with HeaderChain(self.filename, check_pow=False) as hc:
+            hc.append_many(headers)
+        tip_hash = double_sha256(headers[-1])
+        next_time = times[-1] + 300
+        with HeaderChain(self.filename) as hc:
+            self.assertRaisesRegexp(BlockError, "Bits of header at height 2016 should be 1c7fef3f, found 1d00ffff",
+                                    hc.append, create_headers([0x1d00ffff], [next_time], tip_hash)[0])
+            self.assertRaisesRegexp(BlockError, "Hash of header at height 2016 does not meet proof-of-work target",
+                                    hc.append, create_headers([0x1c7fef3f], [next_time], tip_hash)[0])
+        os.remove(self.filename)
+
+        # Testnet allows minimum difficulty blocks 20 minutes after the previous block
+        headers = create_headers([0x1c7fff80, 0x1c7fff80, 0x1d00ffff], [1000, 2000, 4000])
+        with HeaderChain(self.filename, network='testnet', check_pow=False) as hc:
+            hc.append_many(headers)
+        tip_hash = double_sha256(headers[-1])
+        with HeaderChain(self.filename, network='testnet') as hc:
+            self.assertRaisesRegexp(BlockError, "Bits of header at height 3 should be 1c7fff80, found 1d00ffff",
+                                    hc.append, create_headers([0x1d00ffff], [4600], tip_hash)[0])
+            self.assertRaisesRegexp(BlockError, "does not meet proof-of-work target",
+                                    hc.append, create_headers([0x1d00ffff], [5300], tip_hash)[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
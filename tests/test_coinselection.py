@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+#
+#    BitcoinLib - Python Cryptocurrency Library
+#    Unit Tests for Coin Selection strategies
+#    © 2020 - 1200 Web Development <http://1200wd.com/>
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+import random
+import unittest
+
+from bitcoinlib.coinselection import *
+
+
+def _utxos(values):
+    return [{'value': v, 'output_n': n} for n, v in enumerate(values)]
+
+
+class TestCoinSelection(unittest.TestCase):
+
+    def test_coinselection_sizes(self):
+        self.assertEqual(input_size(), 147)
+        self.assertEqual(input_size('segwit'), 68)
+        self.assertEqual(input_size('legacy', multisig=True, sigs_required=2, keys_total=3), 295)
+        self.assertEqual(output_size(), 34)
+        self.assertEqual(output_size('segwit'), 31)
+
+    def test_coinselection_waste(self):
+        self.assertEqual(waste(_utxos([10000]), 9800, 100, 50), 100 + 100)
+        self.assertEqual(waste(_utxos([10000]), 5000, 100, 50), 100 + 150)
+        self.assertIsNone(waste(_utxos([10000]), 9950, 100, 50))
+
+    def test_coinselection_branch_and_bound(self):
+        utxos = _utxos([10000, 20000, 35000, 50000, 60000])
+        selection = select_branch_and_bound(utxos, 79800, 100, 50)
+        self.assertEqual(sorted([u['value'] for u in selection]), [20000, 60000])
+        self.assertEqual(select_branch_and_bound(utxos, 79800, 100, 50, max_utxos=1), [])
+        self.assertEqual(select_branch_and_bound(utxos, 150000, 100, 50), [])
+
+    def test_coinselection_branch_and_bound_limits(self):
+        # Even values never add up to an odd amount, so the search is only stopped by its limits
+        utxos = _utxos([100000 + i * 14 for i in range(200)])
+        self.assertEqual(select_branch_and_bound(utxos, 1000001, max_tries=1000), [])
+        self.assertEqual(select_branch_and_bound(utxos, 1000001, time_budget=0.01), [])
+
+    def test_coinselection_knapsack(self):
+        utxos = _utxos([10000, 20000, 35000, 50000, 60000])
+        selection = select_knapsack(utxos, 45000, rng=random.Random(1))
+        self.assertEqual(sorted([u['value'] for u in selection]), [10000, 35000])
+        selection = select_knapsack(utxos, 56500, change_fee=1000, rng=random.Random(1))
+        self.assertEqual([u['value'] for u in selection], [60000])
+        self.assertEqual(select_knapsack(utxos, 200000), [])
+
+    def test_coinselection_knapsack_limits(self):
+        class CountingRandom(random.Random):
+            calls = 0
+
+            def random(self):
+                CountingRandom.calls += 1
+                return super(CountingRandom, self).random()
+
+        # Even values never add up to an odd amount, so no exact match stops the search early
+        utxos = _utxos([100000 + i * 14 for i in range(5000)])
+        self.assertTrue(select_knapsack(utxos, 1000001, rng=CountingRandom(1)))
+        self.assertLessEqual(CountingRandom.calls, 2 * KNAPSACK_MAX_STEPS)
+        CountingRandom.calls = 0
+        utxos = _utxos([10000, 20000, 35000, 50000, 60000])
+        self.assertEqual(len(select_knapsack(utxos, 45000, rng=CountingRandom(1))), 2)
+        self.assertLess(CountingRandom.calls, 5 * KNAPSACK_ITERATIONS)
+
+    def test_coinselection_strategies(self):
+        utxos = _utxos([10000, 20000, 35000, 50000, 60000, 100000])
+        for name, strategy in COIN_SELECTION_STRATEGIES.items():
+            selection = strategy(utxos, 79000, 100, 50, max_utxos=2)
+            self.assertTrue(0 < len(selection) <= 2, msg="Strategy %s" % name)
+            self.assertGreaterEqual(sum([u['value'] - 100 for u in selection]), 79000, msg="Strategy %s" % name)
+            self.assertEqual(strategy(utxos, 300000, 100, 50), [], msg="Strategy %s" % name)
+        self.assertEqual([u['value'] for u in select_greedy(utxos, 79000, 100, 50)], [100000])
+        min_waste = waste(select_min_waste(utxos, 79000, 1000, 50), 79000, 1000, 50)
+        for strategy in [select_greedy, select_knapsack, select_bnb]:
+            self.assertLessEqual(min_waste, waste(strategy(utxos, 79000, 1000, 50), 79000, 1000, 50))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -166,6 +166,33 @@ class TestEncodingMethodsStructures(unittest.TestCase):
         self.assertEqual('e71a8dd83e79fbd62f72a3d0d8a81fddba535bd0f088fa8be14cd3467fe517ae5f6ca4894c53cd8e6d26f'
                          '799754eb6fc0e86f612d6de6a4c7c07dc5820a0e518', convert_der_sig(sig))
 
+    def test_der_decode_sig(self):
+        sig = '3045022100e71a8dd83e79fbd62f72a3d0d8a81fddba535bd0f088fa8be14cd3467fe517ae02205f6ca4894c53cd8e6d26f' \
+              '799754eb6fc0e86f612d6de6a4c7c07dc5820a0e518'
+        r, s = der_decode_sig(to_bytes(sig))
+        self.assertEqual(r, 0xe71a8dd83e79fbd62f72a3d0d8a81fddba535bd0f088fa8be14cd3467fe517ae)
+        self.assertEqual(s, 0x5f6ca4894c53cd8e6d26f799754eb6fc0e86f612d6de6a4c7c07dc5820a0e518)
+        self.assertEqual(to_hexstring(der_encode_sig(r, s)), sig)
+        self.assertEqual(to_hexstring(der_encode_sig(1, 0x80)), '300702010102020080')
+
+    def test_der_decode_sig_strict(self):
+        self.assertRaisesRegexp(EncodingError, "wrong sequence header or length", der_decode_sig,
+                                to_bytes('3007020104020102'))
+        self.assertRaisesRegexp(EncodingError, "wrong s value header or length", der_decode_sig,
+                                to_bytes('3006020104030102'))
+        self.assertRaisesRegexp(EncodingError, "negative r value", der_decode_sig, to_bytes('3006020184020102'),
+                                strict=True)
+        self.assertRaisesRegexp(EncodingError, "s value has unnecessary zero padding", der_decode_sig,
+                                to_bytes('300702010402020002'), strict=True)
+        self.assertEqual(der_decode_sig(to_bytes('300702010402020002')), (4, 2))
+        self.assertEqual(convert_der_sig(to_bytes('300702010402020002')), '%064x%064x' % (4, 2))
+        self.assertRaisesRegexp(EncodingError, "unnecessary zero padding", convert_der_sig,
+                                to_bytes('300702010402020002'), strict=True)
+        # Padded signature of 73 bytes from before BIP66
+        long_sig = to_bytes('3047' + '0221' + '00' * 32 + '04' + '0222' + '00' * 33 + '02')
+        self.assertEqual(der_decode_sig(long_sig), (4, 2))
+        self.assertRaisesRegexp(EncodingError, "longer than 72 bytes", der_decode_sig, long_sig, strict=True)
+
     def test_to_bytes_hex(self):
         self.assertEqual(b'\xde\xad\xbe\xef', to_bytes('deadbeef'))
 
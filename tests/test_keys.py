@@ -720,6 +720,33 @@ class TestKeysSignatures(unittest.TestCase):
             self.assertTrue(sig.verify())
             count += 1
 
+    def test_signature_from_str_der(self):
+        der_sig = '3044022070b55404702ffa86ecfa4e88e0f354004a0965a5eea5fbbd297436001ae920df02205da0917d7bd645c2a0967' \
+                  '1894375e3d3533138e8de09bc89cb251cbfae4cc523'
+        for hash_type in ['', '01', '03', '83']:
+            sig = Signature.from_str(der_sig + hash_type)
+            self.assertEqual(to_hexstring(sig.as_der_encoded()), der_sig)
+            self.assertEqual(sig.hex(), der_sig[8:72] + der_sig[76:])
+        self.assertEqual(Signature.from_str(sig.bytes()).as_der_encoded(), to_bytes(der_sig))
+        self.assertRaisesRegexp(BKeyError, "negative s value", Signature.from_str, der_sig[:76] + 'f' + der_sig[77:],
+                                strict=True)
+
+    def test_signature_pre_bip66(self):
+        # Signatures in blocks before BIP66 may contain unnecessary zero padding
+        tx_hash = 'c77545c8084b6178366d4e9a06cf99a28d7b5ff94ba8bd76bbbce66ba8cdef70'
+        k = HDKey('c9b5d8a8e1c4b9a1f1d5e4c3b2a1908f7e6d5c4b3a29180f0e0d0c0b0a090807')
+        sig = sign(tx_hash, k)
+        der_sig = sig.as_der_encoded()
+        r_len = ord(der_sig[3:4])
+        padded_sig = b'\x30' + bytes(bytearray([len(der_sig) - 1])) + b'\x02' + bytes(bytearray([r_len + 1])) + \
+            b'\x00' + der_sig[4:]
+        sig2 = Signature.from_str(padded_sig + b'\x01')
+        self.assertEqual((sig2.r, sig2.s), (sig.r, sig.s))
+        self.assertEqual(sig2.as_der_encoded(), padded_sig)
+        self.assertTrue(verify(tx_hash, padded_sig, k.public(), strict=False))
+        self.assertRaisesRegexp(BKeyError, "unnecessary zero padding", verify, tx_hash, padded_sig, k.public())
+        self.assertRaisesRegexp(BKeyError, "unnecessary zero padding", Signature.from_str, padded_sig, strict=True)
+
     def test_rfc6979(self):
         if not USE_FASTECDSA:
             # This test are only usefull when fastecdsa library is used
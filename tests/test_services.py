@@ -21,6 +21,7 @@
 import unittest
 import datetime
 from bitcoinlib.services.services import *
+from bitcoinlib.keys import HDKey
 from tests.test_custom import CustomAssertions
 
 MAXIMUM_ESTIMATED_FEE_DIFFERENCE = 3.00  # Maximum difference from average estimated fee before test_estimatefee fails.
@@ -632,6 +633,16 @@ class TestService(unittest.TestCase, CustomAssertions):
         self.assertRaisesRegexp(ServiceError, "Provider 'unknown_provider' not found in provider definitions",
                                 Service, providers='unknown_provider')
 
+    def test_service_getutxos_many(self):
+        addresses = [HDKey(network='bitcoinlib_test').address() for _ in range(6)]
+        srv = Service(network='bitcoinlib_test')
+        expected = [srv.getutxos(address) for address in addresses]
+        self.assertEqual(srv.getutxos_many(addresses, workers=3), expected)
+        self.assertTrue(srv.complete)
+        self.assertEqual(srv.resultcount, 6)
+        self.assertEqual(srv.getutxos_many(addresses, [''] * 6, max_txs=2, workers=1), expected)
+        self.assertFalse(srv.complete)
+
     def test_service_mempool(self):
         txid = 'ed7e0ecceb6c4d6f10ca935d8dc037921f9855fd46a2e51d82f76dd5ec564a3a'
         srv = Service(min_providers=10, timeout=TIMEOUT_TEST)
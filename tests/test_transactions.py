@@ -19,7 +19,9 @@
 #
 
 import unittest
+import threading
 from bitcoinlib.transactions import *
+from bitcoinlib.transactions import _ScriptCache
 from bitcoinlib.keys import HDKey, BKeyError
 from tests.test_custom import CustomAssertions
 
@@ -272,6 +274,79 @@ class TestTransactions(unittest.TestCase):
         t.sign(pk2.private_byte, 1)
         self.assertTrue(t.verify())
 
+    def test_transactions_signature_legacy_skeleton(self):
+        k = Key('241e4ec8680a77404bfd8ec8618c5db99dcb6c3eadd913d28a5e85bf28a29d92')
+        utxo_hash = '0177ac29fa8b2960051321c730c6f15017503aa5b9c1dd2d61e7286e366fbaba'
+        t = Transaction()
+        for n in range(3):
+            t.add_input(utxo_hash, n, keys=k.public_byte)
+        t.add_output(900000, '1J3pt9koWJZTo2jarg98RL89iJqff9Kobp')
+        expected = b'\1\0\0\0\3'
+        for i in t.inputs:
+            expected += i.prev_hash[::-1] + i.output_n[::-1]
+            expected += varstr(i.unlocking_script_unsigned) if i.index_n == 1 else b'\0'
+            expected += b'\xff\xff\xff\xff'
+        expected += b'\1' + struct.pack('<Q', 900000) + varstr(t.outputs[0].lock_script) + b'\0' * 4 + b'\1\0\0\0'
+        self.assertEqual(t.raw(1), expected)
+
+        sighash = t.signature_hash(1)
+        t.outputs.append(Output(150000, address='1Ht9iDJ3FjwweQNuj451QVL6RAP5qxadFb'))
+        self.assertIsNone(t._sighash_legacy_skeleton)
+        self.assertNotEqual(t.signature_hash(1), sighash)
+        del t.outputs[1]
+        self.assertEqual(t.signature_hash(1), sighash)
+        t.sign(k)
+        self.assertTrue(t.verify())
+
+    def test_transactions_signature_legacy_skeleton_item_changed(self):
+        k = Key('241e4ec8680a77404bfd8ec8618c5db99dcb6c3eadd913d28a5e85bf28a29d92')
+        utxo_hash = '0177ac29fa8b2960051321c730c6f15017503aa5b9c1dd2d61e7286e366fbaba'
+
+        def create_transaction(value=900000, sequences=(0xffffffff, 0xffffffff)):
+            t = Transaction()
+            for n, sequence in enumerate(sequences):
+                t.add_input(utxo_hash, n, keys=k.public_byte, sequence=sequence)
+            t.add_output(value, '1J3pt9koWJZTo2jarg98RL89iJqff9Kobp')
+            return t
+
+        t = create_transaction()
+        sighash = t.signature_hash(1)
+        t.outputs[0].value = 800000
+        self.assertNotEqual(t.signature_hash(1), sighash)
+        self.assertEqual(t.signature_hash(1), create_transaction(800000).signature_hash(1))
+        t.inputs[0].sequence = 0xfffffffe
+        self.assertEqual(t.signature_hash(1), create_transaction(800000, (0xfffffffe, 0xffffffff)).signature_hash(1))
+        lock_script = t.outputs[0].lock_script
+        t.outputs[0].lock_script = Output(800000, '1Ht9iDJ3FjwweQNuj451QVL6RAP5qxadFb').lock_script
+        self.assertNotEqual(t.signature_hash(1), sighash)
+        t.outputs[0].lock_script = lock_script
+        t.outputs[0].value = 900000
+        t.inputs[0].sequence = 0xffffffff
+        self.assertEqual(t.signature_hash(1), sighash)
+        t.sign(k)
+        self.assertTrue(t.verify())
+
+    def test_transactions_signature_legacy_skeleton_index_changed(self):
+        k = Key('241e4ec8680a77404bfd8ec8618c5db99dcb6c3eadd913d28a5e85bf28a29d92')
+        utxo_hash = '0177ac29fa8b2960051321c730c6f15017503aa5b9c1dd2d61e7286e366fbaba'
+        t = Transaction()
+        for n in range(2):
+            t.add_input(utxo_hash, n, keys=k.public_byte)
+        t.add_output(900000, '1J3pt9koWJZTo2jarg98RL89iJqff9Kobp')
+        sighash = t.signature_hash(1)
+        t.inputs[0].index_n, t.inputs[1].index_n = 1, 0
+        self.assertIsNone(t._sighash_legacy_skeleton)
+        expected = b'\1\0\0\0\2'
+        for i in t.inputs:
+            expected += i.prev_hash[::-1] + i.output_n[::-1]
+            expected += varstr(i.unlocking_script_unsigned) if i.index_n == 1 else b'\0'
+            expected += b'\xff\xff\xff\xff'
+        expected += b'\1' + struct.pack('<Q', 900000) + varstr(t.outputs[0].lock_script) + b'\0' * 4 + b'\1\0\0\0'
+        self.assertEqual(t.raw(1), expected)
+        self.assertNotEqual(t.signature_hash(1), sighash)
+        t.inputs[0].index_n, t.inputs[1].index_n = 0, 1
+        self.assertEqual(t.signature_hash(1), sighash)
+
     def test_transactions_estimate_size_p2pkh(self):
         t = Transaction()
         t.add_output(2710000, '12ooWd8Xag7hsgP9PBPnmyGe36VeUrpMSH')
@@ -991,6 +1066,120 @@ class TestTransactions(unittest.TestCase):
         self.assertRaisesRegexp(TransactionError, "Please specify a valid witness type: legacy or segwit",
                                 Transaction, witness_type='error')
 
+    def test_transaction_import_raw_many(self):
+        rawtxs = [r[1] for r in self.rawtxs if r[4] == 'bitcoin']
+        txids = [Transaction.import_raw(r).txid for r in rawtxs]
+        self.assertEqual([t.txid for t in Transaction.import_raw_many(rawtxs, workers=1, as_dict=False)], txids)
+        res = Transaction.import_raw_many((r for r in rawtxs), workers=2, chunksize=1)
+        self.assertEqual([t['hash'] for t in res], txids)
+        res = list(Transaction.import_raw_many(rawtxs[:2], network=Network('bitcoin'), workers=2, as_dict=False))
+        self.assertEqual(res[1].txid, txids[1])
+        self.assertEqual(res[1].as_dict(), Transaction.import_raw(rawtxs[1]).as_dict())
+        self.assertRaisesRegexp(TransactionError, "Input transaction hash not found", list,
+                                Transaction.import_raw_many([rawtxs[0], '0100000002'], workers=2))
+
+    def test_transaction_import_raw_lazy(self):
+        rawtx = '0100000001a3919372c9807d92507289d71bdd38f10682a49c47e50dc0136996b43d8aa54e010000006a47304402201f6e18' \
+                'f4532e14f328bc820cb78c53c57c91b1da9949fecb8cf42318b791fb38022045e78c9e55df1cf3db74bfd52ff2add2b59ba63e' \
+                '068680f0023e6a80ac9f51f401210239a18d586c34e51238a7c9a27a342abfb35e3e4aa5ac6559889db1dab2816e9dfeffffff' \
+                '023ef59804000000001976a914af8e14a2cecd715c363b3a72b55b59a31e2acac988ac90940d00000000001976a914f0d349' \
+                '49650af161e7cb3f0325a1a8833075165088acb7740f00'
+        t = Transaction.import_raw(rawtx)
+        tl = Transaction.import_raw(rawtx, lazy=True)
+        self.assertEqual(tl.txid, t.txid)
+        self.assertEqual(tl.raw_hex(), rawtx)
+        self.assertEqual([o.value for o in tl.outputs], [77133118, 890000])
+        self.assertEqual(tl.inputs[0].output_n_int, 1)
+        self.assertIn('_lazy', tl.inputs[0].__dict__)
+        self.assertIn('_lazy', tl.outputs[0].__dict__)
+        tl.inputs[0].value = 81168846
+        self.assertEqual(tl.outputs[1].address, '1NxNHU6SQg2F3eT4hi9GLWLw1YdSEG3ebn')
+        self.assertEqual(tl.inputs[0].address, t.inputs[0].address)
+        self.assertNotIn('_lazy', tl.inputs[0].__dict__)
+        self.assertEqual(tl.inputs[0].value, 81168846)
+        tl.inputs[0].value = 0
+        self.assertEqual(tl.as_dict(), t.as_dict())
+        self.assertTrue(tl.verify())
+        self.assertRaises(AttributeError, getattr, tl.inputs[0], 'unknown_attribute')
+
+    def test_transaction_import_raw_lazy_segwit(self):
+        p2sh_p2wpkh = \
+            '010000000001016768c8454c2d561957e13baabf9641382337f89e5854343895b46ab368bbd6350000000017160014d60b21752a' \
+            'dc62eb3117b0b2bd00b0126d8e0157ffffffff024aae8b060000000017a914d966f0e3e05e3ab1209524338ff61b32eb2aa58887' \
+            'be5d9b00000000001600148ceebc8944c8bb2af9f6714d60c88860191032f302473044022025a38facc3e83e532a6ad5a09ff2cc' \
+            '5e10bf1b09249169b233c5a3ffc21003de022031715687bc57778f7564924861a2d821b4eb6d15b1957ef8955fd7d6f93df7bd01' \
+            '21034168c3df0c9db74c8159388b270a6dbb30778b8ac74e6b456ad1ebb8c4bb344f00000000'
+        p2sh_p2wsh = \
+            '01000000000101335427ecc759eaf49914e3b2ec7221ed2ce783880c2c796cbb420428983405b70100000023220020c2049b3677' \
+            'fd7827e4d0c228464deedfb56cd7cff2cd3382f56c3a2796d33dacffffffff01e8fd000000000000220020047f8d5d5304b8a178' \
+            'bffbd7c1c0c7c2546fc94fc3b2910adb9d6219857b5d9f040047304402204640b10c4cebeddc5c6ea4976eaa7d3486c6d8dedb85' \
+            'd0067dbb404a1518228402205f735f6fd80df486b822401c2ceeabc1d89f2be3894c1b6a34598eedd0d929a90148304502210087' \
+            'd8f0dca184648952b0c3488371ab72df783858cf5a7894495d1927ba7ce4bb022020b342cb298575ad3598414dd1b7e65773ecb4' \
+            '489eb0b650ad617e1e780975aa01475221022515d9f1b788e7a8d359a72616d4fdad96f6eeba1247869197c7128ca21b2e032102' \
+            'aaf82fb13f33b19d0c816859c9d9302c47b8d7b55b7513fe30e4145bbe59557752ae00000000'
+        for rawtx, network in [(p2sh_p2wpkh, 'litecoin'), (p2sh_p2wsh, 'bitcoin')]:
+            t = Transaction.import_raw(rawtx, network=network)
+            tl = Transaction.import_raw(rawtx, network=network, lazy=True)
+            self.assertEqual(tl.txid, t.txid)
+            self.assertEqual(tl.wtxid, t.wtxid)
+            self.assertEqual(tl.vsize, t.vsize)
+            self.assertIn('_lazy', tl.inputs[0].__dict__)
+            self.assertEqual(tl.as_dict(), t.as_dict())
+            self.assertNotIn('_lazy', tl.inputs[0].__dict__)
+
+    def test_transaction_import_raw_lazy_error(self):
+        # Segwit multisig transaction with an invalid redeemscript in the witness
+        rawtx = '01000000000101c2f54901df3f74e7999f505b629f5229a2cafcf8cc6325bb2a1f216748cb9fcb0200000000ffffffff03' \
+                '40a4b600000000001976a91437883c91fbfbd90330fadec0d1b38ee2e5de449488ac00735500000000001976a914c77d15' \
+                '052e9a8cce5cea9bb41e1edd6bd93dd8d988ac78bb9d0200000000220020701a8d401c84fb13e6baf169d59684e17abd9f' \
+                'a216c8cc5b9fc63d622ff8c58d0400473044022042f474d354a3d406b01748bdb08ff771abb85b2de6dc220956b342eca6' \
+                'c6ea00022030fce68b5db9ad760dfff39389a0e9c340f77fd95e9b256b01f2220192143f9e01483045022100b68f7f4848' \
+                'b145197cfd38a204e46a443646fe292d5c553184e8adc6b1ed14f802206c2548d8b9a4901ab18fc26c11d249e62e716500' \
+                '305a5152cd4ad1377a2286a1016952210375e00eb72e29da82b89367947f29ef34afb75e8654f6ea368e0acdfd92976b7c' \
+                '2103a1b26313f430c4b15bb1fdce663207659d8cac749a0e53d70eff01874496feff2103c96d495bfdd5ba4145e3e046fe' \
+                'e45e84a8a48ad05bd8dbb395c011a32cf9f88053ad00000000'
+        self.assertRaisesRegexp(TransactionError, "Multisig redeemscript expected", Transaction.import_raw, rawtx)
+        tl = Transaction.import_raw(rawtx, lazy=True)
+        self.assertEqual(tl.outputs[0].value, 11969600)
+        for _ in range(2):
+            self.assertRaisesRegexp(TransactionError, "Multisig redeemscript expected", getattr, tl.inputs[0],
+                                    'address')
+            self.assertIn('_lazy', tl.inputs[0].__dict__)
+
+    def test_transaction_merkle_root(self):
+        # Transactions from block 100000
+        txids = ['8c14f0db3df150123e6f3dbbf30f8b955a8249b62ac1d1ff16284aefa3d06d87',
+                 'fff2525b8931402dd09222c50775608f75787bd2b87e56995a7bdd30f79702c4',
+                 '6359f0868171b1d194cbee1af2f16ea598ae8fad666d9b012c8ed2b79a236ec4',
+                 'e9a66845e05d5abc0ad04ec80f774a7e585c6e8db975962d069a522137b80c1d']
+        root = 'f3e94742aca4b5ef85488dc37c06c3282295ffec960994b2c0d5ac2a25a95766'
+        self.assertEqual(merkle_root(txids), root)
+        self.assertEqual(merkle_root([to_bytes(t) for t in txids], as_hex=False), to_bytes(root))
+        self.assertEqual(merkle_root(txids[:1]), txids[0])
+        self.assertEqual(merkle_root(txids[:3]), merkle_root(txids[:3] + txids[2:3]))
+        self.assertRaisesRegexp(TransactionError, "empty transaction list", merkle_root, [])
+
+    def test_transaction_merkle_proofs_batch(self):
+        txids = [double_sha256(struct.pack('<L', n), as_hex=True) for n in range(7)]
+        root = merkle_root(txids)
+        proofs = [(txid, merkle_proof(txids, n), n, root) for n, txid in enumerate(txids)]
+        self.assertEqual(verify_merkle_proofs_batch(proofs), [True] * 7)
+        wrong_proofs = [(txids[0], proofs[0][1], 1, root), (txids[0], proofs[0][1], 8, root),
+                        (txids[1], proofs[0][1], 0, root), (txids[0], proofs[0][1], 0, txids[0])]
+        self.assertEqual(verify_merkle_proofs_batch(wrong_proofs), [False] * 4)
+
+        t = Transaction()
+        t.add_input('82b48b128232256d1d5ce0c6ae7f7897f2b464d44456c25d7cf2be51626530d9', 0)
+        t.add_output(2710000, '12ooWd8Xag7hsgP9PBPnmyGe36VeUrpMSH')
+        t.block_hash = '000000000003ba27aa200b1cecaad478d2b00432346c3f1f3986da1afd33e506'
+        txids[4] = t.txid
+        root = merkle_root(txids)
+        branch = merkle_proof(txids, 4)
+        self.assertTrue(t.verify_merkle_proof(branch, 4, root))
+        self.assertFalse(t.verify_merkle_proof(branch, 3, root))
+        self.assertEqual(verify_merkle_proofs_batch([(t, branch, 4, None)], {t.block_hash: root}), [True])
+        self.assertEqual(verify_merkle_proofs_batch([(t, branch, 4, None)]), [False])
+
 
 class TestTransactionsScripts(unittest.TestCase, CustomAssertions):
 
@@ -1173,6 +1362,67 @@ class TestTransactionsScripts(unittest.TestCase, CustomAssertions):
         sd = script_deserialize('00c9' + redeemscript)
         self.assertEqual(to_hexstring(sd['redeemscript']), redeemscript)
 
+    def test_transaction_script_deserialize_standard(self):
+        scripts = [
+            ('p2pkh', '76a914af8e14a2cecd715c363b3a72b55b59a31e2acac988ac'),
+            ('p2sh', 'a914748284390f9e263a4b766a75d0633c50426eb87587'),
+            ('p2wpkh', '0014f922634ea00272421ffdb6f187935602159e1750'),
+            ('p2wsh', '0020701a8d401c84fb13e6baf169d59684e17abd9fa216c8cc5b9fc63d622ff8c58d'),
+            ('p2pk', '210239a18d586c34e51238a7c9a27a342abfb35e3e4aa5ac6559889db1dab2816e9dac'),
+            ('sig_pubkey', '47304402201f6e18f4532e14f328bc820cb78c53c57c91b1da9949fecb8cf42318b791fb38022045e78c9e55df1cf3db'
+                           '74bfd52ff2add2b59ba63e068680f0023e6a80ac9f51f401210239a18d586c34e51238a7c9a27a342abfb35e3e4a'
+                           'a5ac6559889db1dab2816e9d'),
+        ]
+        for script_type, script in scripts:
+            # Specifying script types forces the generic script template parser
+            self.assertEqual(script_deserialize(script), script_deserialize(script, script_types=[script_type]))
+            self.assertEqual(script_deserialize(script)['script_type'], script_type)
+        self.assertEqual(script_deserialize(scripts[0][1], locking_script=False)['result'],
+                         'Could not parse script, unrecognized script')
+        self.assertEqual(script_deserialize(scripts[5][1], locking_script=True)['result'],
+                         'Could not parse script, unrecognized script')
+
+    def test_transaction_script_deserialize_cache(self):
+        redeemscript = '524104a882d414e478039cd5b52a92ffb13dd5e6bd4515497439dffd691a0f12af9575fa349b5694ed3155b136f09e63' \
+                       '975a1700c9f4d4df849323dac06cf3bd6458cd41046ce31db9bdd543e72fe3039a1f1c047dab87037c36a669ff90e2' \
+                       '8da1848f640de68c2fe913d363a51154a0c62d7adea1b822d05035077418267b1a1379790187410411ffd36c707765' \
+                       '38d079fbae117dc38effafb33304af83ce4894589747aee1ef992f63280567f52f5ba870678b4ab4ff6c8ea600bd21' \
+                       '7870a8b4f1f09f3a8e8353ae'
+        script_deserialize_cache_clear()
+        sd = script_deserialize(redeemscript)
+        self.assertEqual(script_deserialize_cache_info()['hits'], 0)
+        sd['signatures'].append(b'modified')
+        sd2 = script_deserialize(redeemscript)
+        self.assertEqual(sd2['script_type'], 'multisig')
+        self.assertEqual(len(sd2['signatures']), 3)
+        self.assertEqual(script_deserialize(redeemscript, locking_script=True)['script_type'], 'multisig')
+        info = script_deserialize_cache_info()
+        self.assertEqual(info['hits'], 1)
+        self.assertEqual(info['size'], 2)
+        self.assertEqual(info['hit_rate'], 1 / 3.0)
+        script_deserialize_cache_clear()
+        self.assertEqual(script_deserialize_cache_info()['size'], 0)
+
+    def test_transaction_script_deserialize_cache_threads(self):
+        cache = _ScriptCache(maxsize=4)
+
+        def worker(n):
+            for i in range(2000):
+                key = (n + i) % 8
+                if cache.get(key) is None:
+                    cache.set(key, {'keys': [key]})
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        info = cache.info()
+        self.assertEqual(info['hits'] + info['misses'], 16000)
+        self.assertEqual(info['size'], 4)
+        for key in range(8):
+            self.assertIn(cache.get(key), [None, {'keys': [key]}])
+
 
 class TestTransactionsMultisigSoroush(unittest.TestCase):
     # Source: Example from
@@ -1436,6 +1686,8 @@ class TestTransactionsSegwit(unittest.TestCase, CustomAssertions):
         t = Transaction.import_raw(raw_tx)
         self.assertEqual(t.inputs[0].address, 'bc1qwqdg6squsna38e46795at95yu9atm8azzmyvckulcc7kytlcckxswvvzej')
         self.assertEqual(t.outputs[2].address, 'bc1qwqdg6squsna38e46795at95yu9atm8azzmyvckulcc7kytlcckxswvvzej')
+        self.assertEqual(t.raw_hex(), raw_tx)
+        self.assertEqual(Transaction.import_raw(raw_tx, lazy=True).raw_hex(), raw_tx)
         t.inputs[0].value = 61501176
         self.assertTrue(t.verify())
 
@@ -1451,6 +1703,115 @@ class TestTransactionsSegwit(unittest.TestCase, CustomAssertions):
         t.inputs[0].value = 506323064
         self.assertTrue(t.verify())
 
+    def test_transaction_segwit_raw_sections_cache(self):
+        raw_tx = "02000000000101b99ef54dd7695be7574ac6fb4a6d1a2dd98cb4ec7ee53b06117754da424a4c440100000000ffffffff01" \
+                 "12d62d1e00000000160014f922634ea00272421ffdb6f187935602159e17500247304402204c040218c1a5dc87e0ba3597" \
+                 "06fbd0c9c36063fd89c6b4dd900e03cd69de7fd602204c7ebe180a072cc415ba3337dd66d259a4c7de2b563269a90e055f" \
+                 "91898bcf590121025477b3e0aa2619e1ed61b7734b31369c156d9ff7fcbcdc1b7e3c79ed657aab0f00000000"
+        t = Transaction.import_raw(raw_tx)
+        t.size = None
+        self.assertEqual(t.raw_hex(), raw_tx)
+        self.assertEqual(t.size, 191)
+        self.assertEqual(t.vsize, 110)
+        self.assertEqual(t.raw_hex(witness_type='legacy'),
+                         "0200000001b99ef54dd7695be7574ac6fb4a6d1a2dd98cb4ec7ee53b06117754da424a4c440100000000ffffffff"
+                         "0112d62d1e00000000160014f922634ea00272421ffdb6f187935602159e175000000000")
+        t.add_output(1000, 'bc1qly3xxn4qqfeyy8lakmcc0y6kqg2eu96srjzycu')
+        self.assertIsNone(t._raw_sections_cache)
+        self.assertEqual(Transaction.import_raw(t.raw()).outputs[1].value, 1000)
+
+        txid = t.txid
+        t.outputs[1].value = 2000
+        self.assertNotEqual(t.txid, txid)
+        t2 = Transaction.import_raw(t.raw())
+        self.assertEqual(t2.outputs[1].value, 2000)
+        self.assertEqual(t2.txid, t.txid)
+        self.assertEqual(t2.vsize, t.vsize)
+        txid = t.txid
+        size = len(t.raw())
+        t.inputs[0].witnesses = []
+        self.assertEqual(t.txid, txid)
+        self.assertEqual(t.raw()[-5:], b'\0' * 5)
+        self.assertEqual(len(t.raw()), size - 106)
+
+    def test_transaction_segwit_raw_sections_cache_input_changed(self):
+        raw_tx = "02000000000101b99ef54dd7695be7574ac6fb4a6d1a2dd98cb4ec7ee53b06117754da424a4c440100000000ffffffff01" \
+                 "12d62d1e00000000160014f922634ea00272421ffdb6f187935602159e17500247304402204c040218c1a5dc87e0ba3597" \
+                 "06fbd0c9c36063fd89c6b4dd900e03cd69de7fd602204c7ebe180a072cc415ba3337dd66d259a4c7de2b563269a90e055f" \
+                 "91898bcf590121025477b3e0aa2619e1ed61b7734b31369c156d9ff7fcbcdc1b7e3c79ed657aab0f00000000"
+
+        # Witnesses are not serialized for legacy inputs
+        t = Transaction.import_raw(raw_tx)
+        self.assertEqual(t.raw_hex(), raw_tx)
+        t.inputs[0].witness_type = 'legacy'
+        self.assertEqual(t.raw()[-5:], b'\0' * 5)
+        t.inputs[0].witness_type = 'segwit'
+        self.assertEqual(t.raw_hex(), raw_tx)
+
+        # Witnesses are watched on assignment, not when the list is changed in place
+        t = Transaction.import_raw(raw_tx)
+        self.assertEqual(t.raw_hex(), raw_tx)
+        witnesses = t.inputs[0].witnesses
+        t.inputs[0].witnesses = witnesses + [b'\1']
+        self.assertEqual(len(t.raw()), len(raw_tx) // 2 + 2)
+        self.assertEqual(t.raw()[-6:-4], b'\1\1')
+        t.inputs[0].witnesses = witnesses
+        self.assertEqual(t.raw_hex(), raw_tx)
+
+    def test_transaction_segwit_txid_weight(self):
+        raw_tx = "02000000000101b99ef54dd7695be7574ac6fb4a6d1a2dd98cb4ec7ee53b06117754da424a4c440100000000ffffffff01" \
+                 "12d62d1e00000000160014f922634ea00272421ffdb6f187935602159e17500247304402204c040218c1a5dc87e0ba3597" \
+                 "06fbd0c9c36063fd89c6b4dd900e03cd69de7fd602204c7ebe180a072cc415ba3337dd66d259a4c7de2b563269a90e055f" \
+                 "91898bcf590121025477b3e0aa2619e1ed61b7734b31369c156d9ff7fcbcdc1b7e3c79ed657aab0f00000000"
+        t = Transaction.import_raw(raw_tx)
+        self.assertEqual(t.txid, '299dab85f10c37c6296d4fb10eaa323fb456a5e7ada9adf41389c447daa9c0e4')
+        self.assertEqual(t.hash, t.txid)
+        self.assertEqual(t.wtxid, to_hexstring(double_sha256(to_bytes(raw_tx))[::-1]))
+        self.assertEqual(t.weight, 437)
+        self.assertEqual(t.vsize, 110)
+        t.add_output(1000, 'bc1qly3xxn4qqfeyy8lakmcc0y6kqg2eu96srjzycu')
+        self.assertEqual(t.weight, 437 + 31 * 4)
+        self.assertNotEqual(t.txid, '299dab85f10c37c6296d4fb10eaa323fb456a5e7ada9adf41389c447daa9c0e4')
+        t.hash = 'fixed'
+        self.assertEqual(str(t), 'fixed')
+
+    def test_transaction_estimate_weight(self):
+        prev_hash = '55d721dffa90208d8ab7ae3411c42db3e7de860f3a76ab18f7c237bf2390a666'
+        k1 = HDKey()
+        k2 = HDKey()
+        for witness_type in ['legacy', 'segwit', 'p2sh-segwit']:
+            t = Transaction(witness_type='legacy' if witness_type == 'legacy' else 'segwit')
+            t.add_input(prev_hash, 0, k1, witness_type=witness_type, value=200000)
+            t.add_input(prev_hash, 1, [k1, k2.public()], script_type='p2sh_multisig', sigs_required=2,
+                        witness_type=witness_type, value=200000)
+            t.add_output(100000, '12ooWd8Xag7hsgP9PBPnmyGe36VeUrpMSH')
+            weight_estimate = t.estimate_weight()
+            self.assertEqual(t._size_estimates[('weight', False, t.witness_type)], weight_estimate)
+            change_size = {'legacy': 34, 'segwit': 31, 'p2sh-segwit': 32}[witness_type]
+            self.assertEqual(t.estimate_weight(add_change_output=True), weight_estimate + change_size * 4)
+            t.sign(k1, 0)
+            t.sign([k1, k2], 1)
+            self.assertTrue(t.verify())
+            self.assertEqual(t.estimate_weight(), t.weight)
+            self.assertGreaterEqual(weight_estimate, t.weight)
+            self.assertLessEqual(weight_estimate - t.weight, 3 * 2 * 4)
+
+    def test_transaction_estimate_weight_no_inputs(self):
+        t = Transaction(witness_type='segwit')
+        t.add_output(100000, 'bc1qly3xxn4qqfeyy8lakmcc0y6kqg2eu96srjzycu')
+        self.assertEqual(t.estimate_weight(), t.weight + 41 * 4 + 109)
+
+    def test_transaction_legacy_txid_vsize(self):
+        t = Transaction()
+        t.add_input('82b48b128232256d1d5ce0c6ae7f7897f2b464d44456c25d7cf2be51626530d9', 0)
+        t.add_output(2710000, '12ooWd8Xag7hsgP9PBPnmyGe36VeUrpMSH')
+        self.assertEqual(t.txid, t.wtxid)
+        self.assertEqual(t.vsize, len(t.raw()))
+        self.assertEqual(t.weight, t.vsize * 4)
+        txid = t.txid
+        t.locktime = 500000
+        self.assertNotEqual(t.txid, txid)
+
     def test_transaction_segwit_p2wpkh(self):
         pk_input1 = 'bbc27228ddcb9209d7fd6f36b02f7dfa6252af40bb2f1cbc7a557da8027ff866'
         pk_input2 = '619c335025c7f4012e556c2a58b2506e30b8511b53ade95ea316fd8c3286feb9'
@@ -1560,6 +1921,28 @@ class TestTransactionsSegwit(unittest.TestCase, CustomAssertions):
         self.assertEqual(to_hexstring(t2.signature_hash(0)),
                          '12ca412ed631d17d757a298f0d98e1b971d660b2e90a73b2ce6af3bb92ac342e')
 
+    def test_transaction_segwit_signature_midstates_cache(self):
+        key1 = Key('241e4ec8680a77404bfd8ec8618c5db99dcb6c3eadd913d28a5e85bf28a29d92')
+        prev_tx = 'b7053498280442bb6c792c0c8883e72ced2172ecb2e31499f4ea59c7ec275433'
+        t = Transaction(witness_type='segwit')
+        for n in range(3):
+            t.add_input(prev_tx, n, keys=key1.public_byte, value=10000, witness_type='segwit')
+        t.add_output(20000, 'bc1qs5q679tac0uvfunt0gdwuymves5re7v7q8fntv')
+        sighash_before = t.signature_hash(1)
+        self.assertIn(SIGHASH_ALL, t._sighash_midstates)
+
+        t.add_output(5000, 'bc1qs5q679tac0uvfunt0gdwuymves5re7v7q8fntv')
+        self.assertEqual(t._sighash_midstates, {})
+        sighash_add_output = t.signature_hash(1)
+        self.assertNotEqual(sighash_before, sighash_add_output)
+
+        t.outputs.pop()
+        self.assertEqual(t.signature_hash(1), sighash_before)
+        t.inputs[2] = Input(prev_tx, 5, keys=key1.public_byte, value=10000, witness_type='segwit', index_n=2)
+        t2 = Transaction(t.inputs, t.outputs, witness_type='segwit')
+        self.assertEqual(t.signature_hash(1), t2.signature_hash(1))
+        self.assertNotEqual(t.signature_hash(1), sighash_before)
+
     def test_transaction_segwit_addresses(self):
         pk = 'Ky4o5RNziUHUuDjUaAKuHnfMt2hRsX4y4itaGPGNMPDhR11faGtA'
         inp = Input('prev', 0, pk, script_type='p2sh_p2wpkh')
@@ -25,6 +25,7 @@ import psycopg2
 from parameterized import parameterized_class
 from psycopg2 import sql
 from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+from sqlalchemy import event, func, inspect, select
 from sqlalchemy.orm import close_all_sessions
 from bitcoinlib.wallets import *
 from bitcoinlib.encoding import USE_FASTECDSA
@@ -889,6 +890,369 @@ class TestWalletBitcoinlibTestnet(TestWalletMixin, unittest.TestCase):
         self.assertRaisesRegexp(WalletError, "Cannot sweep wallet, no UTXO's found",
                                 w.sweep, '21DBmFUMQMP7A6KeENXgZQ4wJdSCeGc2zFo')
 
+    def test_wallet_bitcoinlib_testnet_utxos_update_import(self):
+        w = HDWallet.create(
+            network='bitcoinlib_test',
+            name='test_wallet_bitcoinlib_testnet_utxos_update_import',
+            db_uri=self.DATABASE_URI)
+        k1, k2 = w.get_key(number_of_keys=2)
+        tx_hash1 = '9df91f89a3eb4259ce04af66ad4caf3c9a297feea5e0b3bc506898b6728c5003'
+        tx_hash2 = '9f5d4004c7cc5a31a735bddea6ff517e52f1cd700df208d2c39ddc536670f1fe'
+        utxos = [
+            {'address': k1.address, 'script': '', 'confirmations': 0, 'output_n': 0, 'tx_hash': tx_hash1,
+             'value': 1000},
+            {'address': k2.address, 'script': '', 'confirmations': 0, 'output_n': 1, 'tx_hash': tx_hash1,
+             'value': 2000},
+            {'address': k1.address, 'script': '', 'confirmations': 3, 'output_n': 0, 'tx_hash': tx_hash2,
+             'value': 3000},
+        ]
+        self.assertEqual(w.utxos_update(utxos=utxos), 3)
+        self.assertEqual(w.balance(), 6000)
+        self.assertEqual(w._session.query(DbTransaction).filter_by(wallet_id=w.wallet_id).count(), 2)
+        self.assertEqual(sorted([(u['tx_hash'], u['output_n']) for u in w.utxos()]),
+                         [(tx_hash1, 0), (tx_hash1, 1), (tx_hash2, 0)])
+
+        utxos[0]['confirmations'] = utxos[1]['confirmations'] = 5
+        self.assertEqual(w.utxos_update(utxos=utxos, rescan_all=False), 0)
+        db_tx = w._session.query(DbTransaction).filter_by(wallet_id=w.wallet_id, hash=tx_hash1).one()
+        self.assertEqual((db_tx.status, db_tx.confirmations), ('confirmed', 5))
+        self.assertEqual(w.balance(), 6000)
+
+        utxos.append({'address': '21DBmFUMQMP7A6KeENXgZQ4wJdSCeGc2zFo', 'script': '', 'confirmations': 1,
+                      'output_n': 2, 'tx_hash': tx_hash1, 'value': 4000})
+        self.assertRaisesRegexp(WalletError, "Key with address 21DBmFUMQMP7A6KeENXgZQ4wJdSCeGc2zFo not found",
+                                w.utxos_update, utxos=utxos)
+
+    def test_wallet_bitcoinlib_testnet_utxos_update_rescan(self):
+        w = HDWallet.create(
+            network='bitcoinlib_test',
+            name='test_wallet_bitcoinlib_testnet_utxos_update_rescan',
+            db_uri=self.DATABASE_URI)
+        k = w.get_key()
+        utxos = [{'address': k.address, 'script': '', 'confirmations': 1, 'output_n': n,
+                  'tx_hash': '9df91f89a3eb4259ce04af66ad4caf3c9a297feea5e0b3bc506898b6728c5003', 'value': 1000}
+                 for n in range(3)]
+        w.utxos_update(utxos=utxos)
+        self.assertEqual(len(w.utxos()), 3)
+        w.utxos_update(utxos=utxos[:1])
+        self.assertEqual([u['output_n'] for u in w.utxos()], [0])
+        self.assertEqual(w.balance(), 1000)
+
+        # Failed rescan should not leave wallet with all UTXO's marked as spent
+        utxos[1]['address'] = '21DBmFUMQMP7A6KeENXgZQ4wJdSCeGc2zFo'
+        self.assertRaisesRegexp(WalletError, "not found in this wallet", w.utxos_update, utxos=utxos)
+        self.assertEqual([u['output_n'] for u in w.utxos()], [0])
+
+    def test_wallet_bitcoinlib_testnet_utxos_update_rescan_uncommitted(self):
+        w = HDWallet.create(
+            network='bitcoinlib_test',
+            name='test_wallet_bitcoinlib_testnet_utxos_update_rescan_uncommitted',
+            db_uri=self.DATABASE_URI)
+        k = w.get_key()
+        utxos = [{'address': k.address, 'script': '', 'confirmations': 1, 'output_n': n,
+                  'tx_hash': '9df91f89a3eb4259ce04af66ad4caf3c9a297feea5e0b3bc506898b6728c5003', 'value': 1000}
+                 for n in range(4)]
+        w.utxos_update(utxos=utxos[:3])
+
+        # Connections with the READ UNCOMMITTED isolation level see the uncommitted changes of the rescan, check the
+        # balance they would see after each statement
+        balance_query = select([func.coalesce(func.sum(DbTransactionOutput.value), 0)]).\
+            where(DbTransactionOutput.key_id == k.key_id).where(DbTransactionOutput.spent.is_(False))
+        uncommitted_balances = []
+
+        def listener(conn, cursor, statement, *args):
+            if statement.startswith('SELECT'):
+                return
+            uncommitted_balances.append(conn.execute(balance_query).scalar())
+
+        event.listen(w._engine, 'after_cursor_execute', listener)
+        try:
+            w.utxos_update(utxos=utxos[1:])
+        finally:
+            event.remove(w._engine, 'after_cursor_execute', listener)
+        self.assertTrue(uncommitted_balances)
+        self.assertNotIn(0, uncommitted_balances)
+        self.assertEqual(sorted([u['output_n'] for u in w.utxos()]), [1, 2, 3])
+        self.assertEqual(w.balance(), 3000)
+        self.assertEqual(w.balance_ledger_check(), [])
+
+    def test_wallet_bitcoinlib_testnet_balance_update(self):
+        w = HDWallet.create(
+            network='bitcoinlib_test',
+            name='test_wallet_bitcoinlib_testnet_balance_update',
+            db_uri=self.DATABASE_URI)
+        k1, k2 = w.get_key(number_of_keys=2)
+        utxos = [{'address': k.address, 'script': '', 'confirmations': 1, 'output_n': n,
+                  'tx_hash': '9df91f89a3eb4259ce04af66ad4caf3c9a297feea5e0b3bc506898b6728c5003', 'value': value}
+                 for n, (k, value) in enumerate([(k1, 1000), (k1, 2000), (k2, 4000)])]
+        w.utxos_update(utxos=utxos)
+        self.assertEqual(w.balance(), 7000)
+        key_balances = w._session.query(DbKey.balance).filter(DbKey.id.in_([k1.key_id, k2.key_id])).order_by(DbKey.id)
+        self.assertEqual([b for b, in key_balances], [3000, 4000])
+        self.assertEqual(w._balances,
+                         [{'network': 'bitcoinlib_test', 'account_id': 0, 'balance': 7000}])
+        w.utxos_update(utxos=utxos[:1])
+        self.assertEqual(w.balance(), 1000)
+        self.assertEqual([b for b, in key_balances], [1000, 0])
+
+    def test_wallet_bitcoinlib_testnet_balance_unknown_confirmations(self):
+        w = HDWallet.create(
+            network='bitcoinlib_test',
+            name='test_wallet_bitcoinlib_testnet_balance_unknown_confirmations',
+            db_uri=self.DATABASE_URI)
+        k = w.get_key()
+        utxos = [{'address': k.address, 'script': '', 'confirmations': confirmations, 'output_n': 0,
+                  'tx_hash': '%064x' % (n + 1), 'value': value}
+                 for n, (confirmations, value) in enumerate([(None, 1000), (0, 2000), (3, 4000)])]
+        w.utxos_update(utxos=utxos)
+
+        # Outputs of transactions with an unknown number of confirmations are included in the balance ledger
+        self.assertEqual(w.balance(), 7000)
+        self.assertEqual(w.balance_ledger_check(), [])
+        self.assertEqual(w._balance_update(min_confirms=0)[0]['balance'], 7000)
+        self.assertEqual(w._balance_update(min_confirms=1)[0]['balance'], 4000)
+
+    def test_wallet_bitcoinlib_testnet_balance_ledger(self):
+        w = HDWallet.create(
+            network='bitcoinlib_test',
+            name='test_wallet_bitcoinlib_testnet_balance_ledger',
+            db_uri=self.DATABASE_URI)
+        w.get_key(number_of_keys=3)
+        w.utxos_update()
+        self.assertEqual(w.balance(), 600000000)
+        self.assertEqual(w.balance_ledger_check(), [])
+
+        t = w.send_to('21DBmFUMQMP7A6KeENXgZQ4wJdSCeGc2zFo', 150000000, fee=10000)
+        self.assertTrue(t.pushed)
+        self.assertEqual(w.balance(), 600000000 - 150000000 - 10000)
+        self.assertEqual(w.balance_ledger_check(), [])
+        self.assertEqual(w._balances, [{'network': 'bitcoinlib_test', 'account_id': 0, 'balance': w.balance()}])
+
+        w.utxos_update()
+        self.assertEqual(w.balance(), 600000000)
+        self.assertEqual(w.balance_ledger_check(), [])
+
+        w._session.query(DbBalance).filter_by(wallet_id=w.wallet_id).update({DbBalance.balance: 1})
+        w._session.commit()
+        self.assertEqual(w.balance(), 1)
+        self.assertEqual(w.balance_ledger_check(fix=True),
+                         [{'network': 'bitcoinlib_test', 'account_id': 0, 'balance': 1, 'expected': 600000000}])
+        self.assertEqual(w.balance(), 600000000)
+        self.assertEqual(w.balance_ledger_check(), [])
+
+    def test_wallet_bitcoinlib_testnet_select_inputs_index(self):
+        w = HDWallet.create(
+            network='bitcoinlib_test',
+            name='test_wallet_bitcoinlib_testnet_select_inputs_index',
+            db_uri=self.DATABASE_URI)
+        w.get_key(number_of_keys=3)
+        w.utxos_update()
+        self.assertEqual(len(w.select_inputs(150000000, return_input_obj=False)), 2)
+
+        # Selection uses the index, only the database records of the selected outputs are loaded
+        queries = []
+        event.listen(w._engine, 'before_cursor_execute', lambda *args: queries.append(args[2]))
+        selected = w.select_inputs(250000000, return_input_obj=False)
+        self.assertTrue(all([isinstance(u, DbTransactionOutput) for u in selected]))
+        self.assertEqual(sum([u.value for u in selected]), 300000000)
+        self.assertEqual(len(queries), 1)
+        del queries[:]
+        self.assertEqual(w.select_inputs(700000000, return_input_obj=False), [])
+        self.assertEqual(queries, [])
+
+        t = w.send_to('21DBmFUMQMP7A6KeENXgZQ4wJdSCeGc2zFo', 150000000, fee=10000)
+        self.assertTrue(t.pushed)
+        self.assertEqual(sorted([(u['tx_hash'], u['output_n']) for u in w._utxo_index('bitcoinlib_test', 0)['utxos']]),
+                         sorted([(u['tx_hash'], u['output_n']) for u in w.utxos()]))
+        del queries[:]
+        selected = w.select_inputs(40000000, return_input_obj=False)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual([(u.transaction.hash, u.value) for u in selected], [(t.hash, 49990000)])
+
+    def test_wallet_bitcoinlib_testnet_select_inputs_index_confirmations(self):
+        w = HDWallet.create(
+            network='bitcoinlib_test',
+            name='test_wallet_bitcoinlib_testnet_select_inputs_index_confirmations',
+            db_uri=self.DATABASE_URI)
+        k = w.get_key()
+        utxos = [{'address': k.address, 'script': '', 'confirmations': 0, 'output_n': 0,
+                  'tx_hash': '9df91f89a3eb4259ce04af66ad4caf3c9a297feea5e0b3bc506898b6728c5003', 'value': 100000}]
+        w.utxos_update(utxos=utxos)
+        self.assertRaisesRegexp(WalletError, "No unspent transaction outputs found", w.select_inputs, 50000,
+                                min_confirms=1)
+        utxos[0]['confirmations'] = 2
+        w.utxos_update(utxos=utxos, rescan_all=False)
+        self.assertEqual([u.value for u in w.select_inputs(50000, min_confirms=1, return_input_obj=False)],
+                         [100000])
+
+    def test_wallet_bitcoinlib_testnet_coin_selection(self):
+        w = HDWallet.create(
+            network='bitcoinlib_test',
+            name='test_wallet_bitcoinlib_testnet_coin_selection',
+            db_uri=self.DATABASE_URI)
+        keys = w.get_key(number_of_keys=4)
+        utxos = [{'address': keys[i].address, 'script': '', 'confirmations': 3, 'output_n': 0,
+                  'tx_hash': '%064x' % (i + 1), 'value': value}
+                 for i, value in enumerate([30000000, 20000000, 45000000, 60000000])]
+        w.utxos_update(utxos=utxos)
+
+        t = w.send_to('21DBmFUMQMP7A6KeENXgZQ4wJdSCeGc2zFo', 49985000, offline=True)
+        self.assertEqual([i.value for i in t.inputs], [60000000])
+        self.assertEqual(len(t.outputs), 2)
+        t = w.send_to('21DBmFUMQMP7A6KeENXgZQ4wJdSCeGc2zFo', 49985000, coin_selection='bnb', offline=True)
+        self.assertEqual(sorted([i.value for i in t.inputs]), [20000000, 30000000])
+        self.assertEqual(len(t.outputs), 1)
+        self.assertEqual(t.fee, 15000)
+        self.assertRaisesRegexp(WalletError, "Unknown coin selection strategy", w.send_to,
+                                '21DBmFUMQMP7A6KeENXgZQ4wJdSCeGc2zFo', 49985000, coin_selection='unknown')
+
+    def test_wallet_bitcoinlib_testnet_coin_selection_default(self):
+        w = HDWallet.create(
+            network='bitcoinlib_test',
+            name='test_wallet_bitcoinlib_testnet_coin_selection_default',
+            db_uri=self.DATABASE_URI)
+        k = w.get_key()
+        w.utxos_update(utxos=[{'address': k.address, 'script': '', 'confirmations': 3, 'output_n': 0,
+                               'tx_hash': '%064x' % 1, 'value': 100000000}])
+        to_address = '21DBmFUMQMP7A6KeENXgZQ4wJdSCeGc2zFo'
+        self.assertRaisesRegexp(WalletError, "Not enough unspent transaction outputs found", w.transaction_create,
+                                [(to_address, 99993000)])
+        t = w.transaction_create([(to_address, 99992000)])
+        self.assertEqual((t.fee, len(t.outputs)), (8000, 1))
+        t = w.transaction_create([(to_address, 99990000)])
+        self.assertEqual((t.fee, len(t.outputs)), (7389, 2))
+
+    def test_wallet_bitcoinlib_testnet_address_set(self):
+        w = HDWallet.create(
+            network='bitcoinlib_test',
+            name='test_wallet_bitcoinlib_testnet_address_set',
+            db_uri=self.DATABASE_URI)
+        keys = w.get_key(number_of_keys=3)
+        self.assertEqual(w._address_set(), frozenset(w.addresslist()))
+
+        queries = []
+        event.listen(w._engine, 'before_cursor_execute', lambda *args: queries.append(args[2]))
+        inputs = [Input('%064x' % (i + 1), 0, address=keys[i].address, network='bitcoinlib_test') for i in range(3)]
+        for _ in range(10):
+            self.assertTrue(HDWalletTransaction(w, inputs=inputs, network='bitcoinlib_test').outgoing_tx)
+        inputs = [Input('%064x' % 4, 0, address='21DBmFUMQMP7A6KeENXgZQ4wJdSCeGc2zFo', network='bitcoinlib_test')]
+        self.assertFalse(HDWalletTransaction(w, inputs=inputs, network='bitcoinlib_test').outgoing_tx)
+        self.assertEqual(queries, [])
+
+        k = w.new_key()
+        self.assertIn(k.address, w._address_set())
+        self.assertEqual(w._address_set(), frozenset(w.addresslist()))
+
+    def test_wallet_bitcoinlib_testnet_transactions_bulk_load(self):
+        w = HDWallet.create(
+            network='bitcoinlib_test',
+            name='test_wallet_bitcoinlib_testnet_transactions_bulk_load',
+            db_uri=self.DATABASE_URI)
+        w.get_key(number_of_keys=3)
+        w.utxos_update()
+        w.send_to('21DBmFUMQMP7A6KeENXgZQ4wJdSCeGc2zFo', 150000000, fee=10000)
+
+        def load_transactions():
+            # Remove compact transaction records, so all transactions are read from the database tables
+            w._session.query(DbTransaction).update({DbTransaction.cache: None})
+            w._session.commit()
+            queries = []
+            listener = lambda *args: queries.append(args[2])
+            event.listen(w._engine, 'before_cursor_execute', listener)
+            txs = w.transactions()
+            event.remove(w._engine, 'before_cursor_execute', listener)
+            return txs, len(queries)
+
+        txs, query_count = load_transactions()
+        self.assertEqual(len(txs), 7)
+        self.assertLessEqual(query_count, 10)
+        for t in txs:
+            t2 = HDWalletTransaction.from_txid(w, t.hash)
+            self.assertEqual(t.raw_hex(), t2.raw_hex())
+            self.assertEqual([o.address for o in t.outputs], [o.address for o in t2.outputs])
+        self.assertEqual([t.hash for t in HDWalletTransaction.from_txids(w, [txs[1].hash, 'ff' * 32, txs[0].hash])],
+                         [txs[1].hash, txs[0].hash])
+
+        w.get_key(number_of_keys=3)
+        w.utxos_update()
+        txs, query_count2 = load_transactions()
+        self.assertGreater(len(txs), 7)
+        self.assertEqual(query_count, query_count2)
+
+    def test_wallet_bitcoinlib_testnet_transactions_save_many(self):
+        w = HDWallet.create(
+            network='bitcoinlib_test',
+            name='test_wallet_bitcoinlib_testnet_transactions_save_many',
+            db_uri=self.DATABASE_URI)
+        w.utxos_update()
+        k = w.get_key()
+        t1 = w.transaction_create([(k.address, 10000)], fee=1000)
+        t1.sign()
+        t2 = w.transaction_create([('21DBmFUMQMP7A6KeENXgZQ4wJdSCeGc2zFo', 20000)], fee=1000)
+        t2.sign()
+        tx_ids = w.transactions_save_many([t1, t2])
+        self.assertEqual(len(set(tx_ids)), 2)
+        addresslist = w.addresslist()
+        for tx_id, t in zip(tx_ids, [t1, t2]):
+            db_tx = w._session.query(DbTransaction).filter_by(id=tx_id).one()
+            self.assertEqual(db_tx.hash, t.hash)
+            self.assertEqual(len(db_tx.inputs), len(t.inputs))
+            self.assertEqual([(o.value, o.key.address if o.key else None) for o in db_tx.outputs],
+                             [(o.value, o.address if o.address in addresslist else None) for o in t.outputs])
+
+        self.assertEqual(w.transactions_save_many([t2, t1]), tx_ids[::-1])
+        self.assertEqual(t1.save(), tx_ids[0])
+        self.assertEqual(w._session.query(DbTransactionOutput).
+                         filter(DbTransactionOutput.transaction_id.in_(tx_ids)).count(),
+                         len(t1.outputs) + len(t2.outputs))
+
+    def test_wallet_bitcoinlib_testnet_transactions_cache(self):
+        w = HDWallet.create(
+            network='bitcoinlib_test',
+            name='test_wallet_bitcoinlib_testnet_transactions_cache',
+            db_uri=self.DATABASE_URI)
+        w.utxos_update()
+        to_address = w.get_key().address
+        t = w.send_to(to_address, 50000, fee=1000)
+        self.assertTrue(t.pushed)
+        db_tx = w._session.query(DbTransaction).filter_by(wallet_id=w.wallet_id, hash=t.hash).one()
+        rawtx, inputs, outputs = transaction_cache_deserialize(db_tx.cache)
+        self.assertEqual(rawtx, t.raw())
+        self.assertEqual([i[1] for i in inputs], [i.value for i in t.inputs])
+        self.assertEqual(outputs, [(o.key_id, False) for o in db_tx.outputs])
+
+        db_tx.outputs[1].spent = True
+        w._session.commit()
+        wt = [tx for tx in w.transactions() if tx.hash == t.hash][0]
+        wt_db = HDWalletTransaction.from_txid(w, t.hash)
+        self.assertEqual(wt.raw(), wt_db.raw())
+        self.assertTrue(wt.outgoing_tx)
+        self.assertEqual([(o.value, o.address, o.spent) for o in wt.outputs],
+                         [(o.value, o.address, o.spent) for o in wt_db.outputs])
+        self.assertEqual([(o.value, o.address, o.spent) for o in wt.outputs],
+                         [(50000, to_address, False), (t.outputs[1].value, t.outputs[1].address, True)])
+        self.assertEqual([i.value for i in wt.inputs], [i.value for i in wt_db.inputs])
+
+    def test_wallet_bitcoinlib_testnet_transactions_cache_migration(self):
+        if self.SCHEMA != 'sqlite':
+            return
+        db_file = os.path.join(BCL_DATABASE_DIR, 'bitcoinlib.unittest_migration.sqlite')
+        if os.path.isfile(db_file):
+            os.remove(db_file)
+        db = DbInit(db_file)
+        db.session.close()
+        db.engine.execute("ALTER TABLE transactions DROP COLUMN cache")
+        db.engine.execute("UPDATE config SET value='0.4.9' WHERE variable='version'")
+        db.engine.dispose()
+
+        db = DbInit(db_file)
+        self.assertIn('cache', [c['name'] for c in inspect(db.engine).get_columns('transactions')])
+        self.assertEqual(db.session.query(DbConfig.value).filter_by(variable='version').scalar(),
+                         BITCOINLIB_VERSION)
+        db.session.close()
+        db.engine.dispose()
+        os.remove(db_file)
+
 
 @parameterized_class(*params)
 class TestWalletMultisig(TestWalletMixin, unittest.TestCase):
@@ -951,6 +1315,29 @@ class TestWalletMultisig(TestWalletMixin, unittest.TestCase):
         t.send()
         self.assertIsNone(t.error)
 
+    def test_wallet_multisig_bitcoinlib_testnet_transaction_from_txids(self):
+        self.db_remove()
+        key_list = [HDKey(network='bitcoinlib_test'), HDKey(network='bitcoinlib_test'),
+                    HDKey(network='bitcoinlib_test')]
+        wl = HDWallet.create_multisig('multisig_test_from_txids', key_list, sigs_required=2,
+                                      network='bitcoinlib_test', cosigner_id=0, db_uri=self.DATABASE_URI)
+        k = wl.new_key()
+        wl.utxos_update(key_id=k.key_id)
+        t = wl.send_to('21DBmFUMQMP7A6KeENXgZQ4wJdSCeGc2zFo', 150000000, fee=10000)
+        self.assertIsNone(t.error)
+        self.assertEqual(len(t.inputs), 2)
+        self.assertEqual(set([inp.address for inp in t.inputs]), {k.address})
+
+        # Both inputs use the same multisig key, each input needs its own list of keys
+        wl._session.query(DbTransaction).update({DbTransaction.cache: None})
+        wl._session.commit()
+        t2 = HDWalletTransaction.from_txids(wl, [t.hash])[0]
+        self.assertIsNot(t2.inputs[0].keys, t2.inputs[1].keys)
+        self.assertEqual([len(inp.keys) for inp in t2.inputs], [3, 3])
+        self.assertEqual([len(inp.signatures) for inp in t2.inputs], [2, 2])
+        self.assertEqual(t2.raw_hex(), t.raw_hex())
+        self.assertTrue(t2.verify())
+
     def test_wallet_multisig_bitcoin_transaction_send_offline(self):
         self.db_remove()
         pk2 = HDKey('e2cbed99ad03c500f2110f1a3c90e0562a3da4ba0cff0e74028b532c3d69d29d')